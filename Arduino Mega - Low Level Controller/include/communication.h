@@ -12,11 +12,31 @@ extern bool ros2_connected;
 extern unsigned long last_heartbeat;
 extern String inputString;
 extern boolean stringComplete;
+extern bool binary_telemetry;
+extern unsigned long telemetry_interval;
+
+// ======================
+// Binary telemetry frames (negotiated with PROTO:BIN)
+// ======================
+// 0xAA 0x55 | length | payload[length] | CRC16 (little-endian)
+// The CRC is CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF) over length and
+// payload. Frames are only written between complete text lines.
+#define FRAME_SYNC_1 0xAA
+#define FRAME_SYNC_2 0x55
+#define FRAME_TELEMETRY 0x01
+// Telemetry payload, little-endian:
+//   type, sequence, flags (bit0 emergency, bit1 soft brake, bit2 hard brake,
+//   bit3 ROS2), millis (uint32), then per motor (left, right):
+//   speed, target, direction (0 STOPPED, 1 FORWARD, 2 REVERSE, 3 COASTING),
+//   braking, pulses (int16), rpm x10, mph x100, kph x100 (uint16)
+#define TELEMETRY_PAYLOAD_SIZE 31
 
 // Function declarations
 void processSerialCommand(String command);
 void processROSCommand(String command);
 void processPIDCommand(String command);
+void processProtocolCommand(String command);
+uint16_t crc16(const uint8_t *data, size_t length);
 void processPIDTuning(String params, PIDController &pid, const String &name);
 bool isNumeric(String str);
 void printDiagnostics();
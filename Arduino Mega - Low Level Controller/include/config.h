@@ -57,6 +57,7 @@
 // ======================
 #define SPEED_TIMEOUT 500000       // Time used to determine wheel is not spinning (µs)
 #define UPDATE_TIME 500            // Time used to output serial data (ms)
+#define MIN_UPDATE_TIME 10         // Fastest telemetry interval PROTO:BIN:<ms> accepts (ms)
 #define WHEEL_DIAMETER_IN 6.5      // Motor wheel diameter (inches)
 #define WHEEL_CIRCUMFERENCE_IN 22.25 // Motor wheel circumference (inches)
 #define WHEEL_DIAMETER_CM 16.5     // Motor wheel diameter (centimeters)
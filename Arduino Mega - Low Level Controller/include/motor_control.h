@@ -42,6 +42,7 @@ void blinkStatusLED(int times, int delay_ms);
 // Speed measurement functions
 void readSpeed(int motor_num);
 void writeToSerial();
+void writeTelemetryFrame();
 
 // Hall sensor interrupt handlers
 void recordPulseL();
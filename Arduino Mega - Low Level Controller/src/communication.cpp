@@ -19,6 +19,8 @@ extern bool ros2_connected;
 extern unsigned long last_heartbeat;
 extern String inputString;
 extern boolean stringComplete;
+extern bool binary_telemetry;
+extern unsigned long telemetry_interval;
 
 // PID controllers (declared in main.cpp)
 // extern PIDController pidL;
@@ -34,6 +36,13 @@ void processSerialCommand(String command)
     return;
   }
 
+  // Protocol negotiation is allowed at any time, including during an emergency stop
+  if (command.startsWith("PROTO:"))
+  {
+    processProtocolCommand(command);
+    return;
+  }
+
   if (emergency_stop && command != "C" && command != "CLEAR")
   {
     Serial.println("🚨 EMERGENCY STOP ACTIVE - Use 'C' to clear");
@@ -351,6 +360,55 @@ void processPIDCommand(String command)
   }
 }
 
+// Switch telemetry between text lines and binary frames
+// PROTO:BIN[:<interval ms>] replies PROTO:BIN:OK:<interval>, PROTO:TEXT replies PROTO:TEXT:OK
+void processProtocolCommand(String command)
+{
+  String mode = command.substring(6);
+  String intervalStr = "";
+  int colon = mode.indexOf(':');
+  if (colon != -1)
+  {
+    intervalStr = mode.substring(colon + 1);
+    mode = mode.substring(0, colon);
+  }
+
+  if (mode == "BIN")
+  {
+    if (isNumeric(intervalStr))
+    {
+      telemetry_interval = max((unsigned long)intervalStr.toInt(), (unsigned long)MIN_UPDATE_TIME);
+    }
+    binary_telemetry = true;
+    Serial.println("PROTO:BIN:OK:" + String(telemetry_interval));
+  }
+  else if (mode == "TEXT")
+  {
+    binary_telemetry = false;
+    telemetry_interval = UPDATE_TIME;
+    Serial.println("PROTO:TEXT:OK");
+  }
+  else
+  {
+    Serial.println("❌ Unknown protocol: '" + mode + "'");
+  }
+}
+
+// CRC-16/CCITT-FALSE, matching binascii.crc_hqx(data, 0xFFFF) on the Python side
+uint16_t crc16(const uint8_t *data, size_t length)
+{
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < length; i++)
+  {
+    crc ^= (uint16_t)data[i] << 8;
+    for (byte bit = 0; bit < 8; bit++)
+    {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
 // Process PID tuning parameters
 void processPIDTuning(String params, PIDController &pid, const String &name)
 {
@@ -482,6 +540,8 @@ void printHelp() {
   Serial.println("  PID           - PID control commands (type 'PID' for help)");
   Serial.println("  HELP, ?       - Show this help");
   Serial.println("  ROS:COMMAND   - Simulate ROS2 command");
+  Serial.println("  PROTO:BIN[:ms] - Binary telemetry frames (optional interval)");
+  Serial.println("  PROTO:TEXT    - Text telemetry lines");
   Serial.println();
 }
 
@@ -22,6 +22,8 @@ bool ros2_connected = false;
 unsigned long last_heartbeat = 0;
 String inputString = "";
 boolean stringComplete = false;
+bool binary_telemetry = false;               // switched by PROTO:BIN / PROTO:TEXT
+unsigned long telemetry_interval = UPDATE_TIME;
 
 // PID controllers (definitions)
 PIDController pidL, pidR;
@@ -154,10 +156,17 @@ void loop()
     lastBrakeUpdate = millis();
   }
 
-  // Output speed data to serial (every 500ms)
-  if (millis() - lastSerialUpdate >= UPDATE_TIME)
+  // Output speed data to serial (every 500ms unless PROTO:BIN:<ms> changed it)
+  if (millis() - lastSerialUpdate >= telemetry_interval)
   {
-    writeToSerial();
+    if (binary_telemetry)
+    {
+      writeTelemetryFrame();
+    }
+    else
+    {
+      writeToSerial();
+    }
     lastSerialUpdate = millis();
   }
 
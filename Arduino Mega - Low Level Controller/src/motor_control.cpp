@@ -5,6 +5,7 @@
 #include <Arduino.h>
 #include "config.h"
 #include "motor_control.h"
+#include "communication.h"
 // Global variables initialization
 // MotorState motorL = {0, 0, "STOPPED", false, 0, 0, PULSES_PER_ROTATION_L, 0, 0, 0};
 // MotorState motorR = {0, 0, "STOPPED", false, 0, 0, PULSES_PER_ROTATION_R, 0, 0, 0};
@@ -269,6 +270,60 @@ void writeToSerial() {
     Serial.print("KPH:"); Serial.println(motorR.kph);
 
     // Calculate next update time
-    updateTime = millis() + UPDATE_TIME;
+    updateTime = millis() + telemetry_interval;
   }
-}
\ No newline at end of file
+}
+
+static uint8_t directionCode(const String &direction) {
+  if (direction == "FORWARD") return 1;
+  if (direction == "REVERSE") return 2;
+  if (direction == "COASTING") return 3;
+  return 0;  // STOPPED
+}
+
+static uint8_t *putUint16(uint8_t *out, uint16_t value) {
+  *out++ = value & 0xFF;
+  *out++ = value >> 8;
+  return out;
+}
+
+static uint8_t *packMotor(uint8_t *out, MotorState &motor) {
+  noInterrupts();
+  int pulses = motor.pulse_count;  // 16-bit read must not be torn by recordPulse
+  interrupts();
+
+  *out++ = constrain(motor.current_speed, 0, 255);
+  *out++ = constrain(motor.target_speed, 0, 255);
+  *out++ = directionCode(motor.direction);
+  *out++ = motor.is_braking ? 1 : 0;
+  out = putUint16(out, (uint16_t)pulses);
+  out = putUint16(out, (uint16_t)constrain(motor.rpm * 10.0, 0, 65535));
+  out = putUint16(out, (uint16_t)constrain(motor.mph * 100.0, 0, 65535));
+  out = putUint16(out, (uint16_t)constrain(motor.kph * 100.0, 0, 65535));
+  return out;
+}
+
+// Binary counterpart of writeToSerial(), layout documented in communication.h
+void writeTelemetryFrame() {
+  static uint8_t sequence = 0;
+  uint8_t frame[TELEMETRY_PAYLOAD_SIZE + 5];
+  uint8_t *out = frame;
+
+  *out++ = FRAME_SYNC_1;
+  *out++ = FRAME_SYNC_2;
+  *out++ = TELEMETRY_PAYLOAD_SIZE;
+  *out++ = FRAME_TELEMETRY;
+  *out++ = sequence++;
+  *out++ = (emergency_stop ? 0x01 : 0) | (soft_brake_active ? 0x02 : 0) |
+           (hard_brake_active ? 0x04 : 0) | (ros2_connected ? 0x08 : 0);
+  unsigned long now = millis();
+  for (byte i = 0; i < 4; i++) {
+    *out++ = (now >> (8 * i)) & 0xFF;
+  }
+  out = packMotor(out, motorL);
+  out = packMotor(out, motorR);
+
+  uint16_t crc = crc16(frame + 2, TELEMETRY_PAYLOAD_SIZE + 1);
+  putUint16(out, crc);
+  Serial.write(frame, sizeof(frame));
+}
@@ -0,0 +1,196 @@
+# bench_async_runtime.py
+"""Flask on threads vs the asyncio runtime, serving the same robot
+
+Each runtime runs as its own process, app.py or async_runtime.py, on a
+firmware-emulating fake Arduino streaming binary frames at --rate-hz (or a
+simulate-mode controller with --simulate). While --clients SSE clients
+hold /stream open and one WebSocket client reads /ws (asyncio only), the
+benchmark polls GET /status and sends a speed command every 50 ms. It
+reports the server's threads, CPU and context switches per second (all
+threads, from wait4() once it exits), the client-side /status latency and
+the server-side HTTP->ACK time from /latency.
+
+Usage: python benchmarks/bench_async_runtime.py [--duration 10] [--clients 4] [--rate-hz 100] [--simulate]
+"""
+import argparse
+import base64
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from bench_utils import write_config, summarize, format_summary
+from fake_arduino import FakeArduino
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RUNTIMES = {
+    'flask + threads': ['src/app.py', '--flask-port'],
+    'asyncio': ['src/async_runtime.py', '--http-port']
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get_json(url, data=None):
+    request = urllib.request.Request(url, data=json.dumps(data).encode('utf-8') if data else None,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def cpu_seconds(pid):
+    """utime + stime of every thread, living or exited"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def thread_count(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                return int(line.split()[1])
+
+
+def sse_client(url, stop, received):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            while not stop.is_set():
+                chunk = response.read1(65536)
+                if not chunk:
+                    return
+                received.append(len(chunk))
+    except (OSError, http.client.HTTPException):
+        pass  # server stopped
+
+
+def websocket_client(host, port, stop, received):
+    """Bare RFC 6455 client: handshake, then count text frames"""
+    try:
+        _websocket_frames(host, port, stop, received)
+    except OSError:
+        pass  # server stopped
+
+
+def _websocket_frames(host, port, stop, received):
+    with socket.create_connection((host, port), timeout=5) as sock:
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        sock.sendall((f'GET /ws HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n').encode('ascii'))
+        stream = sock.makefile('rb')
+        if b'101' not in stream.readline():
+            return
+        while stream.readline() not in (b'\r\n', b''):
+            pass
+        while not stop.is_set():
+            header = stream.read(2)
+            if len(header) < 2:
+                return
+            length = header[1] & 0x7F
+            if length == 126:
+                length = int.from_bytes(stream.read(2), 'big')
+            elif length == 127:
+                length = int.from_bytes(stream.read(8), 'big')
+            payload = stream.read(length)
+            if header[0] & 0x0F == 0x1:
+                received.append(len(payload))
+
+
+def run(name, config, simulate, clients, duration):
+    script, port_flag = RUNTIMES[name]
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    command = [sys.executable, script, '--config', config, port_flag, str(port)] + (['--simulate'] if simulate else [])
+    server = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    launched = time.perf_counter()
+    try:
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            try:
+                if get_json(base_url + '/status')['system']['serial_connected']:
+                    break
+            except (OSError, ValueError, KeyError):
+                pass
+            time.sleep(0.2)
+        time.sleep(1.0)
+
+        stop = threading.Event()
+        streamed, frames = [], []
+        readers = [threading.Thread(target=sse_client, args=(base_url + '/stream', stop, streamed), daemon=True)
+                   for _ in range(clients)]
+        if name == 'asyncio':
+            readers.append(threading.Thread(target=websocket_client, args=('127.0.0.1', port, stop, frames),
+                                            daemon=True))
+        for reader in readers:
+            reader.start()
+        time.sleep(0.5)
+
+        threads = thread_count(server.pid)
+        start_cpu, start = cpu_seconds(server.pid), time.perf_counter()
+        samples = []
+        speed = 0
+        next_command = start
+        while time.perf_counter() - start < duration:
+            sent = time.perf_counter()
+            get_json(base_url + '/status')
+            samples.append((time.perf_counter() - sent) * 1000.0)
+            if sent >= next_command:
+                speed = speed % 250 + 1
+                get_json(base_url + '/command', {'command': 'both_speed', 'params': {'speed': speed}})
+                next_command += 0.05
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - start
+        cpu = (cpu_seconds(server.pid) - start_cpu) / elapsed * 100
+        threads = max(threads, thread_count(server.pid))
+        acked = get_json(base_url + '/latency')['stages']['total']
+        stop.set()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        _, status, usage = os.wait4(server.pid, 0)
+        server.returncode = status
+    lifetime = time.perf_counter() - launched
+
+    switches = (usage.ru_nvcsw + usage.ru_nivcsw) / lifetime
+    print(f"{name:<18} threads={threads:3}  cpu={cpu:5.1f}%  ctxsw={switches:7,.0f}/s  "
+          f"SSE {sum(streamed) / elapsed / 1024:6.1f} KiB/s over {clients} clients"
+          + (f", WebSocket {len(frames) / elapsed:5.1f} msg/s" if name == 'asyncio' else ''))
+    print(format_summary('  GET /status', summarize(samples)))
+    print(f"  HTTP -> ACK (server)   n={acked.get('count', 0):<6} p50={acked.get('p50_ms', 0):7.3f}ms "
+          f"p99={acked.get('p99_ms', 0):7.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Threaded vs asyncio runtime benchmark')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per runtime')
+    parser.add_argument('--clients', type=int, default=4, help='SSE clients holding /stream open')
+    parser.add_argument('--rate-hz', type=float, default=100, help='Telemetry rate of the fake Arduino')
+    parser.add_argument('--simulate', action='store_true', help='Use a simulate-mode controller instead of a fake Arduino')
+    args = parser.parse_args()
+
+    interval_ms = max(10, round(1000 / args.rate_hz))
+    device = None
+    if args.simulate:
+        config = write_config('SIMULATED', extra={'simulation': {'rate_hz': args.rate_hz}})
+    else:
+        device = FakeArduino(firmware=True, physics_hz=200).start()
+        config = write_config(device.port, {'protocol': 'binary', 'telemetry_interval_ms': interval_ms})
+    try:
+        for name in RUNTIMES:
+            run(name, config, args.simulate, args.clients, args.duration)
+    finally:
+        if device is not None:
+            device.stop()
+
+
+if __name__ == '__main__':
+    main()
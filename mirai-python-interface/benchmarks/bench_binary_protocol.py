@@ -0,0 +1,106 @@
+# bench_binary_protocol.py
+"""Text lines vs binary telemetry frames: wire size, link-limited rate and host decode cost
+
+The text numbers use what the firmware prints for one telemetry sample (the
+combined speed line plus a STATUS line per motor, which is what the host
+needs for the same fields a frame carries). The last part negotiates
+PROTO:BIN with the pty fake Arduino and streams frames through
+SerialInterface end to end.
+
+Usage: python benchmarks/bench_binary_protocol.py [--samples 20000] [--frames 2000]
+"""
+import argparse
+import random
+import time
+
+from bench_utils import write_config
+from fake_arduino import FakeArduino
+from binary_protocol import FrameReader, encode_telemetry
+from serial_interface import SerialInterface
+from telemetry_parser import TelemetryRecord, parse_line
+
+BAUDRATE = 115200
+
+
+def random_record(rng):
+    def side():
+        rpm = rng.uniform(0, 400)
+        return [rng.randint(0, 255), rng.randint(0, 255), rng.choice(['FORWARD', 'REVERSE']), False,
+                rng.randint(-300, 300), round(rpm, 1), round(rpm * 0.066, 2), round(rpm * 0.0565, 2)]
+    return TelemetryRecord(rng.randint(0, 255), rng.randint(0, 10 ** 6), False, False, False, *side(), *side())
+
+
+def text_lines(record):
+    return [
+        f"Left - RPM:{record.left_rpm:.2f} MPH:{record.left_mph:.2f} KPH:{record.left_kph:.2f} | "
+        f"Right - RPM:{record.right_rpm:.2f} MPH:{record.right_mph:.2f} KPH:{record.right_kph:.2f}",
+        f"STATUS:ML:{record.left_direction}:{record.left_speed}",
+        f"STATUS:MR:{record.right_direction}:{record.right_speed}"
+    ]
+
+
+def decode_rate(samples, records):
+    text = b''.join(''.join(line + '\r\n' for line in text_lines(record)).encode() for record in records)
+    frames = b''.join(encode_telemetry(record) for record in records)
+
+    start = time.perf_counter()
+    for raw in text.split(b'\n'):
+        line = raw.decode('utf-8').strip()
+        if line:
+            parse_line(line)
+    text_rate = samples / (time.perf_counter() - start)
+
+    reader = FrameReader()
+    start = time.perf_counter()
+    for offset in range(0, len(frames), 4096):  # arrives in read_chunk_size pieces
+        reader.feed(frames[offset:offset + 4096])
+    binary_rate = samples / (time.perf_counter() - start)
+    assert reader.frames == samples and reader.bad_frames == 0
+    return len(text) / samples, len(frames) / samples, text_rate, binary_rate
+
+
+def end_to_end(frames, records):
+    device = FakeArduino(binary=True).start()
+    interface = SerialInterface(write_config(device.port, {'protocol': 'binary', 'telemetry_interval_ms': 10}))
+    interface.start()
+    try:
+        if not interface.binary_mode:
+            return None
+        start = time.perf_counter()
+        for index in range(frames):
+            device.write_bytes(encode_telemetry(records[index % len(records)], sequence=index))
+        received = 0
+        deadline = time.monotonic() + 10
+        while received < frames and time.monotonic() < deadline:
+            received += sum(1 for item in interface.get_all_data() if type(item) is TelemetryRecord)
+            time.sleep(0.001)
+        return received, frames / (time.perf_counter() - start), interface.frame_reader.bad_frames
+    finally:
+        interface.stop()
+        device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binary telemetry protocol benchmark')
+    parser.add_argument('--samples', type=int, default=20000, help='Samples for the decode comparison')
+    parser.add_argument('--frames', type=int, default=2000, help='Frames streamed through the pty')
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    records = [random_record(rng) for _ in range(args.samples)]
+    text_bytes, frame_bytes, text_rate, binary_rate = decode_rate(args.samples, records)
+    link = BAUDRATE / 10.0  # bytes/sec, 8N1
+    print(f"bytes/sample       text={text_bytes:6.1f}  binary={frame_bytes:6.1f}  ({text_bytes / frame_bytes:.1f}x smaller)")
+    print(f"max samples/sec    text={link / text_bytes:6.0f}  binary={link / frame_bytes:6.0f}  at {BAUDRATE} baud")
+    print(f"host decode/sec    text={text_rate:10,.0f}  binary={binary_rate:10,.0f}  ({binary_rate / text_rate:.1f}x)")
+
+    result = end_to_end(args.frames, records)
+    if result is None:
+        print("end-to-end         PROTO:BIN negotiation failed")
+    else:
+        received, rate, bad = result
+        print(f"end-to-end         negotiated binary, {received}/{args.frames} frames at {rate:,.0f} frames/sec, {bad} bad")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# bench_command_latency.py
+"""Command latency from SerialInterface.send_command() to the wire and to the fake Arduino
+
+Usage: python benchmarks/bench_command_latency.py [--commands 500] [--burst 5] [--rate 50]
+"""
+import argparse
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from fake_arduino import FakeArduino
+from serial_interface import SerialInterface
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial command latency benchmark (pty fake Arduino)')
+    parser.add_argument('--commands', type=int, default=500, help='Total commands to send')
+    parser.add_argument('--burst', type=int, default=5, help='Commands queued back-to-back per burst')
+    parser.add_argument('--rate', type=float, default=50.0, help='Bursts per second')
+    args = parser.parse_args()
+
+    device = FakeArduino().start()
+    interface = SerialInterface(write_config(device.port))
+    interface.start()
+    try:
+        sent = {}
+        for i in range(args.commands):
+            command = f"PIDL:{i},0.7,0.001,50"  # unique and never coalesced
+            sent[command] = time.perf_counter()
+            interface.send_command(command)
+            if (i + 1) % args.burst == 0:
+                time.sleep(1.0 / args.rate)
+        time.sleep(0.5)
+
+        delivered = [(arrived - sent[command]) * 1000
+                     for arrived, command in device.received if command in sent]
+        wire = interface.get_command_latency_stats()
+        print(format_summary('enqueue->device', summarize(delivered)))
+        if wire['count']:
+            print(f"{'enqueue->wire':<24} n={wire['count']:<6} mean={wire['mean_ms']:7.3f}ms "
+                  f"p50={wire['p50_ms']:7.3f}ms p99={wire['p99_ms']:7.3f}ms max={wire['max_ms']:7.3f}ms")
+    finally:
+        interface.stop()
+        device.stop()
+
+
+if __name__ == '__main__':
+    main()
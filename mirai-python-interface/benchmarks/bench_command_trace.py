@@ -0,0 +1,93 @@
+# bench_command_trace.py
+"""Button press to telemetry: per-stage command latency through the web app
+
+A client posts /command requests (both_speed, forward, stop, ...) to the
+Flask app over real HTTP, as index.html does, and afterwards reads /latency.
+Each scenario prints the HTTP response time seen by the client and the
+tracer's per-stage histograms: request -> enqueue -> wire -> firmware reply
+-> first telemetry showing the change.
+
+Scenarios: simulate mode (in-process motor simulator), and the
+firmware-emulating fake Arduino over a pty with binary frames at 100 Hz
+and with the firmware's default 2 Hz text telemetry (which carries no
+targets, so stops at the reply).
+
+Usage: python benchmarks/bench_command_trace.py [--commands 200]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+from bench_utils import write_config, summarize, format_summary
+import app as web
+from fake_arduino import FakeArduino
+from motor_controller import MotorController
+
+SEQUENCE = [('both_speed', {'speed': 120}), ('forward', {}), ('both_speed', {'speed': 200}),
+            ('reverse', {}), ('softbrake', {}), ('stop', {}), ('coast', {}), ('both_speed', {'speed': 60})]
+
+
+def post(base_url, command, params):
+    body = json.dumps({'command': command, 'params': params}).encode()
+    request = urllib.request.Request(base_url + '/command', body, {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def run(name, controller, commands):
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    web.motor_controller = controller
+    server = make_server('127.0.0.1', 0, web.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    controller.start()
+    time.sleep(1.0)
+
+    http = []
+    try:
+        for index in range(commands):
+            command, params = SEQUENCE[index % len(SEQUENCE)]
+            start = time.perf_counter()
+            post(base_url, command, params)
+            http.append((time.perf_counter() - start) * 1000.0)
+            time.sleep(0.05)
+        time.sleep(1.0)  # let the last replies and telemetry arrive
+        with urllib.request.urlopen(base_url + '/latency', timeout=5) as response:
+            stats = json.loads(response.read())
+    finally:
+        server.shutdown()
+        controller.stop()
+
+    print(f"--- {name}: {stats['counts']}")
+    print(format_summary('client POST /command', summarize(http)))
+    for stage, summary in stats['stages'].items():
+        if summary['count']:
+            print(f"  {stage:<11} n={summary['count']:<5} mean={summary['mean_ms']:8.3f}ms "
+                  f"p50={summary['p50_ms']:8.3f}ms p90={summary['p90_ms']:8.3f}ms "
+                  f"p99={summary['p99_ms']:8.3f}ms max={summary['max_ms']:8.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Command latency tracing benchmark')
+    parser.add_argument('--commands', type=int, default=200, help='Commands per scenario')
+    args = parser.parse_args()
+
+    controller = MotorController(write_config('SIMULATED', extra={'simulation': {'rate_hz': 1000}}), simulate=True)
+    run('simulate mode, 1 kHz records', controller, args.commands)
+
+    for name, serial_overrides in (('fake Arduino, binary 100 Hz', {'protocol': 'binary', 'telemetry_interval_ms': 10}),
+                                   ('fake Arduino, text 2 Hz', {'protocol': 'text'})):
+        device = FakeArduino(firmware=True).start()
+        try:
+            run(name, MotorController(write_config(device.port, serial_overrides)), args.commands)
+        finally:
+            device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+# bench_dashboard_fps.py
+"""Frame time of the pygame dashboard for each plot engine, live and idle
+
+Compares the legacy ax.clear() redraw, the blitting matplotlib backend and
+the native pygame backend (visualization.plot_backend). Every live frame
+ingests one new telemetry sample, then updates the plots and renders the
+dashboard as DataVisualizer's loop does at 30 FPS. The legacy row also
+repaints the whole window and re-renders all text each frame, as the
+dashboard did before it tracked dirty widgets.
+
+The idle rows render frames with no new telemetry, first with a full
+repaint, then with dirty-region tracking, and finally the real
+visualization loop's CPU use while nothing changes.
+
+Runs headless (SDL dummy video driver).
+
+Usage: python benchmarks/bench_dashboard_fps.py [--frames 150] [--idle-seconds 3]
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import pygame  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+
+from bench_utils import write_config, summarize, format_summary  # noqa: E402
+from data_visualizer import DataVisualizer  # noqa: E402
+from motor_controller import MotorController  # noqa: E402
+from plot_renderer import create_plot_renderer  # noqa: E402
+
+
+class LegacyPlots:
+    """DataVisualizer's plotting before plot_renderer: clear, replot and rescale every frame"""
+
+    def __init__(self, visualizer):
+        self.visualizer = visualizer
+        plt.style.use('dark_background')
+        self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(10, 8))
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.fig.patch.set_facecolor((0.15, 0.15, 0.2))
+        plt.tight_layout()
+
+    def update_plots(self):
+        history = self.visualizer.motor_controller.get_history_window(100)
+        timestamps = history['timestamp'] - history['timestamp'][-1]
+        status = self.visualizer.motor_controller.get_status()
+        for ax, title, series in (
+                (self.ax1, 'Motor Speeds', (('left_speed', 'red', '-'), ('right_speed', 'green', '-'))),
+                (self.ax2, 'Target vs Actual Speeds', (('left_target', 'red', '--'), ('left_speed', 'red', '-'),
+                                                        ('right_target', 'green', '--'), ('right_speed', 'green', '-'))),
+                (self.ax3, 'Motor RPM', (('left_rpm', 'red', '-'), ('right_rpm', 'green', '-')))):
+            ax.clear()
+            for column, color, linestyle in series:
+                ax.plot(timestamps, history[column], label=column, color=color, linestyle=linestyle, linewidth=2)
+            ax.set_title(title, color='white', fontsize=12)
+            ax.legend(facecolor=(0.2, 0.2, 0.2), edgecolor='white', labelcolor='white')
+            ax.grid(True, alpha=0.3)
+            ax.tick_params(colors='white')
+            ax.set_facecolor((0.1, 0.1, 0.1))
+        self.ax4.clear()
+        self.ax4.bar(['Emergency', 'Braking', 'ROS', 'Serial'],
+                     [float(status['system'][key]) for key in ('emergency_stop', 'braking', 'ros_connected', 'serial_connected')],
+                     color=['red', 'orange', 'blue', 'green'], alpha=0.7)
+        self.ax4.set_ylim(0, 1)
+        self.canvas.draw()
+        self.canvas.flush_events()
+
+    def draw_plots(self, rect, plot_version):
+        buf = self.canvas.buffer_rgba()
+        plot_surface = pygame.image.frombuffer(buf, self.canvas.get_width_height(), 'RGBA')
+        self.visualizer.screen.blit(pygame.transform.smoothscale(plot_surface, rect.size), rect.topleft)
+
+
+def ingest(controller, index):
+    with controller._state_lock:
+        controller._process_data(f"STATUS:ML:FORWARD:{(index * 3) % 256}")
+        controller._process_data(f"Left - RPM:{index % 300}.00 MPH:1.00 KPH:1.60 | "
+                                 f"Right - RPM:{(index * 2) % 300}.00 MPH:1.00 KPH:1.60")
+        controller._publish()
+
+
+def run(name, visualizer, frames, full=False, live=True):
+    """full: repaint everything with no text cache, like the pre-retained dashboard"""
+    controller = visualizer.motor_controller
+    for index in range(20):
+        ingest(controller, index)
+    samples = []
+    for index in range(frames):
+        if live:
+            ingest(controller, index)
+        start = time.perf_counter()
+        visualizer.update_plots()
+        if full:
+            visualizer.text_cache.clear()
+            visualizer.render_dashboard(force=True)
+            pygame.display.flip()
+        else:
+            dirty = visualizer.render_dashboard()
+            if dirty:
+                pygame.display.update(dirty)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    stats = summarize(samples[5:])  # skip warm-up frames
+    print(format_summary(name, stats) + f" fps={1000.0 / stats['mean']:6.1f}")
+
+
+def idle_cpu(visualizer, seconds):
+    """CPU share of the real visualization loop (30 FPS) while no telemetry arrives"""
+    visualizer.start()
+    time.sleep(3.5)  # loading screen
+    cpu_start = time.process_time()
+    time.sleep(seconds)
+    cpu = (time.process_time() - cpu_start) / seconds * 100.0
+    visualizer.running = False
+    visualizer.visualization_thread.join(timeout=5)
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dashboard plot frame time benchmark (headless pygame)')
+    parser.add_argument('--frames', type=int, default=150, help='Frames per renderer')
+    parser.add_argument('--idle-seconds', type=float, default=3.0, help='Seconds of idle loop CPU measurement')
+    args = parser.parse_args()
+
+    controller = MotorController(write_config('SIMULATED'), simulate=True)
+    visualizer = DataVisualizer(controller)
+    plot_size = visualizer.plot_rect().size
+
+    legacy = LegacyPlots(visualizer)
+    update_plots, draw_plots = visualizer.update_plots, visualizer.draw_plots
+    visualizer.update_plots, visualizer.draw_plots = legacy.update_plots, legacy.draw_plots
+    run('legacy clear+redraw', visualizer, args.frames, full=True)
+    visualizer.update_plots, visualizer.draw_plots = update_plots, draw_plots
+    for backend in ('matplotlib', 'pygame'):
+        visualizer.plot_renderer = create_plot_renderer(backend, plot_size)
+        visualizer.render_dashboard(force=True)
+        run(f"plot_backend={backend}", visualizer, args.frames)
+    run('idle full repaint', visualizer, args.frames, full=True, live=False)
+    visualizer.render_dashboard(force=True)
+    run('idle dirty widgets', visualizer, args.frames, live=False)
+    print(f"idle loop cpu={idle_cpu(visualizer, args.idle_seconds):5.1f}% (plot_backend=pygame)")
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
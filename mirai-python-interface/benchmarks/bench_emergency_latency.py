@@ -0,0 +1,81 @@
+# bench_emergency_latency.py
+"""Emergency-stop latency while the normal command lane is flooded
+
+Floods SerialInterface with non-coalescable PID commands from several
+threads, fires E/C pairs on a timer and reports how long the emergency
+lane takes to reach the wire and the fake Arduino. The device consumes
+bytes at the configured baud rate so the link backs up like the real one.
+
+Usage: python benchmarks/bench_emergency_latency.py [--stops 50] [--flooders 4] [--batch-bytes 64,1024]
+"""
+import argparse
+import threading
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from command_scheduler import PRIORITY_EMERGENCY, PRIORITY_NORMAL
+from fake_arduino import FakeArduino
+from serial_interface import SerialInterface
+
+
+def run(batch_bytes, stops, flooders, baudrate, drain):
+    device = FakeArduino(baudrate=baudrate).start()
+    overrides = {'max_write_batch_bytes': batch_bytes or None, 'drain_writes': drain}
+    interface = SerialInterface(write_config(device.port, overrides))
+    interface.start()
+    flooding = True
+
+    def flood():
+        i = 0
+        while flooding:
+            interface.send_command(f"PIDL:0.{i % 1000:03d},0.7,0.001,50")
+            i += 1
+            time.sleep(0.0005)
+
+    threads = [threading.Thread(target=flood, daemon=True) for _ in range(flooders)]
+    for thread in threads:
+        thread.start()
+    try:
+        time.sleep(0.5)  # let the normal lane back up
+        sent = []
+        for _ in range(stops):
+            sent.append(time.perf_counter())
+            interface.send_command('E')
+            time.sleep(0.05)
+            interface.send_command('C')
+            time.sleep(0.05)
+        flooding = False
+        time.sleep(0.5)
+
+        arrivals = [arrived for arrived, command in device.received if command == 'E']
+        delivered = [(arrived - start) * 1000 for start, arrived in zip(sent, arrivals)]
+        wire = interface.get_command_latency_stats(PRIORITY_EMERGENCY)
+        backlog = interface.command_queue.qsize(PRIORITY_NORMAL)
+        return summarize(delivered), wire, backlog
+    finally:
+        flooding = False
+        interface.stop()
+        device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emergency lane latency under a flooded normal lane')
+    parser.add_argument('--stops', type=int, default=50, help='E/C pairs to send')
+    parser.add_argument('--flooders', type=int, default=4, help='Threads flooding the normal lane')
+    parser.add_argument('--baudrate', type=int, default=115200, help='Emulated UART speed of the device')
+    parser.add_argument('--batch-bytes', default='64,1024',
+                        help='Comma separated max_write_batch_bytes values to compare (0 = unbounded)')
+    parser.add_argument('--no-drain', action='store_true', help='Do not wait for writes to leave the port')
+    args = parser.parse_args()
+
+    for batch_bytes in (int(value) for value in args.batch_bytes.split(',')):
+        stats, wire, backlog = run(batch_bytes, args.stops, args.flooders, args.baudrate, not args.no_drain)
+        label = f"batch={batch_bytes or 'unbounded'}"
+        print(format_summary(f"E enqueue->device {label}", stats))
+        if wire['count']:
+            print(f"{'E enqueue->wire':<24} max={wire['max_ms']:7.3f}ms p99={wire['p99_ms']:7.3f}ms "
+                  f"normal backlog at end={backlog}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# bench_fleet.py
+"""Many robots in one process: per-robot threads vs the shared fleet I/O loop
+
+For each fleet size, FleetManager runs N simulated robots (each its own
+MotorSimulator at --rate-hz) either with every controller's own read,
+write and update threads (shared_loop=False, what N separate
+MotorControllers cost) or on one SerialEventLoop thread. Reports threads,
+process CPU, telemetry items/sec reaching the history stores against what
+the simulators produce, and the time from set_both_speeds() on a random
+robot to a history sample carrying the new target.
+
+With --serial N it also runs N firmware-emulating fake Arduinos (one
+process each, binary frames at --rate-hz) over ptys, so the selector path
+and the worker-pool connects are exercised with real descriptors.
+
+With --unplugged M (and --serial) it then starts M robots whose port does
+not exist ahead of the fake Arduinos, on the default two connect workers,
+and times how long the connectable robots take to connect, then how long
+one unplugged robot takes to connect after its board is plugged in.
+
+Usage: python benchmarks/bench_fleet.py [--robots 1 8 32 64] [--rate-hz 50] [--duration 5] [--serial 8] [--unplugged 4]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from fake_arduino import FakeArduino
+from fleet import FleetManager
+
+
+def command_delay(controller, speed):
+    """Seconds from set_both_speeds() until a history sample carries the target"""
+    sent = time.perf_counter()
+    controller.set_both_speeds(speed)
+    while time.perf_counter() - sent < 1.0:
+        cursor = controller.get_snapshot().cursor
+        if cursor and controller.data_history.read(cursor - 1, cursor)['left_target'][-1] == speed:
+            break
+        time.sleep(0.0005)
+    return time.perf_counter() - sent
+
+
+def run(name, robots, config, shared_loop, rate_hz, duration, settle=1.0):
+    fleet = FleetManager(config, robots=robots, shared_loop=shared_loop)
+    fleet.start()
+    controllers = list(fleet.controllers.values())
+    deadline = time.perf_counter() + 30
+    while not all(c.get_snapshot().cursor for c in controllers) and time.perf_counter() < deadline:
+        time.sleep(0.1)  # ports still connecting
+    time.sleep(settle)
+
+    threads = threading.active_count()
+    start_items = sum(c.data_history.total for c in controllers)
+    start_cpu, start = time.process_time(), time.perf_counter()
+    delays = []
+    rng = random.Random(0)
+    while time.perf_counter() - start < duration:
+        delays.append(command_delay(rng.choice(controllers), rng.randint(1, 250)) * 1000.0)
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    cpu = (time.process_time() - start_cpu) / elapsed * 100
+    items = sum(c.data_history.total for c in controllers) - start_items
+    fleet.stop()
+
+    expected = len(robots) * rate_hz
+    print(f"{name:<28} threads={threads:4}  cpu={cpu:5.1f}%  {items / elapsed:8,.0f}/{expected:,.0f} items/s")
+    print(format_summary('  command -> history', summarize(delays)))
+
+
+def wait_connected(controllers, timeout=30.0):
+    """Seconds until every controller has stored telemetry, or None"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if all(c.get_snapshot().cursor for c in controllers):
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    return None
+
+
+def run_unplugged(count, unplugged, config, shared_loop):
+    """Connect time of `count` fake Arduinos next to `unplugged` robots without a board, and a hot-plug"""
+    links = [os.path.join(tempfile.mkdtemp(prefix='mirai-bench-'), 'ttyMIRAI') for _ in range(unplugged)]
+    devices = [FakeArduino(firmware=True, physics_hz=200).start() for _ in range(count)]
+    robots = ([{'id': f'missing{index}', 'port': link} for index, link in enumerate(links)]
+              + [{'id': f'dev{index}', 'port': device.port} for index, device in enumerate(devices)])
+    fleet = FleetManager(config, robots=robots, shared_loop=shared_loop)
+    late = FakeArduino(firmware=True, physics_hz=200, link=links[0])
+    mode = 'shared loop' if shared_loop else 'threads'
+    try:
+        fleet.start()
+        connected = wait_connected([fleet.get(f'dev{index}') for index in range(count)])
+        time.sleep(1.0)  # the missing ports' backoff grows
+        late.start()
+        plugged = wait_connected([fleet.get('missing0')])
+        print(f"{count} fake Arduinos + {unplugged} unplugged, {mode:<12} "
+              + (f"connected in {connected:6.3f} s" if connected is not None else "not all connected in 30 s")
+              + ", plug-in -> telemetry " + (f"{plugged:6.3f} s" if plugged is not None else "none in 30 s"))
+    finally:
+        fleet.stop()
+        late.stop()
+        for device in devices:
+            device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fleet scaling benchmark')
+    parser.add_argument('--robots', type=int, nargs='+', default=[1, 8, 32, 64], help='Fleet sizes (simulated robots)')
+    parser.add_argument('--rate-hz', type=float, default=50, help='Telemetry rate per robot')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run')
+    parser.add_argument('--serial', type=int, default=8, help='Fake Arduinos for the serial runs, 0 to skip')
+    parser.add_argument('--unplugged', type=int, default=4, help='Robots without a board next to the fake Arduinos, 0 to skip')
+    args = parser.parse_args()
+
+    config = write_config('SIMULATED', extra={'simulation': {'rate_hz': args.rate_hz}})
+    for count in args.robots:
+        robots = [{'id': f'sim{index}', 'simulate': True, 'simulation': {'seed': index}} for index in range(count)]
+        for shared_loop in (False, True):
+            mode = 'shared loop' if shared_loop else 'threads'
+            run(f"{count} simulated, {mode}", robots, config, shared_loop, args.rate_hz, args.duration)
+
+    if args.serial:
+        interval_ms = max(10, round(1000 / args.rate_hz))
+        config = write_config('unused', {'protocol': 'binary', 'telemetry_interval_ms': interval_ms},
+                              extra={'fleet': {'workers': args.serial}})
+        for shared_loop in (False, True):
+            devices = [FakeArduino(firmware=True, physics_hz=200).start() for _ in range(args.serial)]
+            robots = [{'id': f'dev{index}', 'port': device.port} for index, device in enumerate(devices)]
+            try:
+                mode = 'shared loop' if shared_loop else 'threads'
+                run(f"{args.serial} fake Arduinos, {mode}", robots, config, shared_loop,
+                    1000 / interval_ms, args.duration)
+            finally:
+                for device in devices:
+                    device.stop()
+
+    if args.serial and args.unplugged:
+        config = write_config('unused', {'protocol': 'binary', 'telemetry_interval_ms': interval_ms})
+        for shared_loop in (False, True):
+            run_unplugged(args.serial, args.unplugged, config, shared_loop)
+
+
+if __name__ == '__main__':
+    main()
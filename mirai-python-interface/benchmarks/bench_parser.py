@@ -0,0 +1,92 @@
+# bench_parser.py
+"""Telemetry parser throughput on a recorded capture, legacy vs table-driven
+
+Usage: python benchmarks/bench_parser.py [--capture benchmarks/data/telemetry_capture.log] [--repeat 20]
+"""
+import argparse
+import copy
+import os
+import time
+
+import bench_utils  # noqa: F401  (puts src/ on sys.path)
+from telemetry_parser import parse_line, update_motor_data
+
+DEFAULT_CAPTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'telemetry_capture.log')
+
+MOTOR_DATA = {
+    'left': {'speed': 0, 'target': 0, 'direction': 'STOPPED', 'pulses': 0, 'rpm': 0, 'mph': 0, 'kph': 0},
+    'right': {'speed': 0, 'target': 0, 'direction': 'STOPPED', 'pulses': 0, 'rpm': 0, 'mph': 0, 'kph': 0}
+}
+
+
+def legacy_process(motor_data, data):
+    """The startswith/split chain MotorController._process_data used before telemetry_parser
+
+    Kept verbatim for comparison, including its bug of letting the right
+    motor's fields overwrite the left ones on a combined speed line.
+    """
+    if data.startswith('Left - ') or data.startswith('Right - '):
+        if 'Left -' in data:
+            parts = data.split('Left - ')[1].split()
+            for part in parts:
+                if 'RPM:' in part:
+                    motor_data['left']['rpm'] = float(part.split(':')[1])
+                elif 'MPH:' in part:
+                    motor_data['left']['mph'] = float(part.split(':')[1])
+                elif 'KPH:' in part:
+                    motor_data['left']['kph'] = float(part.split(':')[1])
+        if 'Right -' in data:
+            parts = data.split('Right - ')[1].split()
+            for part in parts:
+                if 'RPM:' in part:
+                    motor_data['right']['rpm'] = float(part.split(':')[1])
+                elif 'MPH:' in part:
+                    motor_data['right']['mph'] = float(part.split(':')[1])
+                elif 'KPH:' in part:
+                    motor_data['right']['kph'] = float(part.split(':')[1])
+    elif data.startswith('STATUS:'):
+        parts = data.split(':')
+        if len(parts) >= 4:
+            motor = 'left' if parts[1] == 'ML' else 'right'
+            motor_data[motor]['direction'] = parts[2]
+            motor_data[motor]['speed'] = int(parts[3])
+    elif data.startswith('PULSES:'):
+        parts = data.split(':')
+        if len(parts) >= 3:
+            motor_data['left']['pulses'] = int(parts[1])
+            motor_data['right']['pulses'] = int(parts[2])
+
+
+def table_process(motor_data, data):
+    update_motor_data(motor_data, parse_line(data))
+
+
+def measure(process, lines, repeat):
+    motor_data = copy.deepcopy(MOTOR_DATA)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            process(motor_data, line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best, motor_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Telemetry parser microbenchmark')
+    parser.add_argument('--capture', default=DEFAULT_CAPTURE, help='Capture file, one serial line per line')
+    parser.add_argument('--repeat', type=int, default=20, help='Passes over the capture (best is reported)')
+    args = parser.parse_args()
+
+    with open(args.capture, encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    legacy_rate, _ = measure(legacy_process, lines, args.repeat)
+    table_rate, _ = measure(table_process, lines, args.repeat)
+    print(f"capture: {len(lines)} lines")
+    print(f"legacy _process_data chain  {legacy_rate:12,.0f} lines/sec")
+    print(f"telemetry_parser            {table_rate:12,.0f} lines/sec ({table_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
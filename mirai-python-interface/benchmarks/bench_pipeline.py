@@ -0,0 +1,136 @@
+# bench_pipeline.py
+"""Telemetry pipeline: batch handoff, stage costs and slow sinks
+
+- handoff: ns per item to move reads of N items from the reader to the
+  update stage, one Queue.put()/get_nowait() per item (before) against one
+  IngestBuffer.put_batch()/get_batch() per read
+- stages: per-item cost of parse and store on the recorded capture, and
+  how long the state lock is held per batch when parsing happens inside
+  it (before) and outside it
+- sinks: a simulate-mode controller at --rate-hz with a sink that takes
+  --sink-delay seconds per batch, inline and threaded (drop_oldest).
+  Reports items/s per stage, the sink's drops and backlog, and
+  process_pending() time, which a threaded sink must leave untouched.
+
+Usage: python benchmarks/bench_pipeline.py [--capture benchmarks/data/telemetry_capture.log] [--rate-hz 1000] [--duration 5]
+"""
+import argparse
+import os
+import time
+import timeit
+from queue import Queue
+
+from bench_utils import write_config, summarize, format_summary
+from motor_controller import MotorController
+from telemetry_pipeline import IngestBuffer
+
+DEFAULT_CAPTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'telemetry_capture.log')
+
+
+def queue_handoff(reads):
+    queue = Queue()
+    for read in reads:
+        for item in read:
+            queue.put(item)
+    data = []
+    while not queue.empty():
+        data.append(queue.get_nowait())
+    return data
+
+
+def buffer_handoff(reads):
+    buffer = IngestBuffer(limit=float('inf'))
+    for read in reads:
+        buffer.put_batch(read)
+    return buffer.get_batch()
+
+
+def handoff(lines):
+    for size in (1, 10, 100):
+        reads = [lines[index:index + size] for index in range(0, 1000, size)]
+        count = sum(len(read) for read in reads)
+        before = min(timeit.repeat(lambda: queue_handoff(reads), number=20, repeat=3)) / 20 / count
+        after = min(timeit.repeat(lambda: buffer_handoff(reads), number=20, repeat=3)) / 20 / count
+        print(f"handoff, {size:3} items/read   Queue {before * 1e9:6.0f} ns/item   "
+              f"IngestBuffer {after * 1e9:6.0f} ns/item   ({before / after:4.1f}x)")
+
+
+def stages(lines, batch=100):
+    controller = MotorController(write_config('SIMULATED'), simulate=True)
+    batches = [lines[index:index + batch] for index in range(0, len(lines) - batch, batch)]
+
+    def parse_all():
+        return [[controller._parse(line) for line in items] for items in batches]
+    records = parse_all()
+
+    def store_all():
+        for items, parsed in zip(batches, records):
+            for item, record in zip(items, parsed):
+                if record is not None:
+                    controller._store(item, record)
+
+    def inline_all():
+        for items in batches:
+            for item in items:
+                controller._process_data(item)
+
+    count = len(batches) * batch
+    parse = min(timeit.repeat(parse_all, number=5, repeat=3)) / 5 / count
+    store = min(timeit.repeat(store_all, number=5, repeat=3)) / 5 / count
+    inline = min(timeit.repeat(inline_all, number=5, repeat=3)) / 5 / count
+    print(f"parse {parse * 1e9:6.0f} ns/item, store {store * 1e9:6.0f} ns/item on the capture")
+    print(f"state lock held per {batch}-item batch: {inline * batch * 1e6:6.1f} us parsing inside (before), "
+          f"{store * batch * 1e6:6.1f} us parsing outside")
+
+
+def sinks(rate_hz, duration, delay):
+    config = write_config('SIMULATED', extra={'simulation': {'rate_hz': rate_hz},
+                                              'pipeline': {'sink_max_items': 2000}})
+    for name, threaded in (('no sink', None), ('slow sink, inline', False), ('slow sink, threaded', True)):
+        controller = MotorController(config, simulate=True)
+        if threaded is not None:
+            controller.add_sink('slow', lambda batch: time.sleep(delay), threaded=threaded)
+        timings = []
+        process = controller.process_pending
+
+        def timed_process():
+            start = time.perf_counter()
+            count = process()
+            if count:
+                timings.append((time.perf_counter() - start) * 1000.0)
+            return count
+        controller.process_pending = timed_process
+        controller.start()
+        time.sleep(0.5)
+        before = controller.pipeline.get_stats()['stages']
+        timings.clear()
+        time.sleep(duration)
+        stats = controller.pipeline.get_stats()
+        controller.stop()
+
+        rates = '  '.join(f"{stage} {(counts['items'] - before[stage]['items']) / duration:6,.0f}"
+                          for stage, counts in stats['stages'].items())
+        print(f"{name:<20} items/s: {rates}")
+        sink = stats['sinks'].get('slow')
+        if sink and sink['threaded']:
+            print(f"  sink: {sink['dropped']:,} items dropped ({sink['policy']}), {sink['queued']:,} queued")
+        print(format_summary('  process_pending()', summarize(timings)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Telemetry pipeline benchmark')
+    parser.add_argument('--capture', default=DEFAULT_CAPTURE, help='Recorded telemetry lines')
+    parser.add_argument('--rate-hz', type=float, default=1000, help='Simulated telemetry rate for the sink runs')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per sink run')
+    parser.add_argument('--sink-delay', type=float, default=0.05, help='Seconds the slow sink takes per batch')
+    args = parser.parse_args()
+
+    with open(args.capture, 'r', encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    handoff(lines)
+    stages(lines)
+    sinks(args.rate_hz, args.duration, args.sink_delay)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# bench_read_latency.py
+"""Telemetry latency from the fake Arduino's write() to SerialInterface.data_queue
+
+Usage: python benchmarks/bench_read_latency.py [--lines 500] [--rate 50] [--modes poll,event]
+"""
+import argparse
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from fake_arduino import FakeArduino
+from serial_interface import SerialInterface
+
+
+def run_mode(mode, lines, rate, idle_seconds):
+    device = FakeArduino().start()
+    interface = SerialInterface(write_config(device.port, {'read_mode': mode}))
+    interface.start()
+    try:
+        # Idle CPU: nothing on the wire, just the reader thread waiting
+        cpu_start = time.process_time()
+        time.sleep(idle_seconds)
+        idle_cpu = (time.process_time() - cpu_start) / idle_seconds * 100.0
+
+        latencies = []
+        interval = 1.0 / rate
+        for _ in range(lines):
+            device.write_line(f"DIAG:T:{time.perf_counter_ns()}")
+            batch = interface.data_queue.get_batch(timeout=2.0)
+            arrived = time.perf_counter_ns()
+            for line in batch:
+                if line.startswith('DIAG:T:'):
+                    latencies.append((arrived - int(line[7:])) / 1e6)
+            time.sleep(interval)
+        return summarize(latencies), idle_cpu
+    finally:
+        interface.stop()
+        device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial read latency benchmark (pty fake Arduino)')
+    parser.add_argument('--lines', type=int, default=500, help='Telemetry lines per mode')
+    parser.add_argument('--rate', type=float, default=50.0, help='Lines per second')
+    parser.add_argument('--idle', type=float, default=2.0, help='Seconds of idle CPU sampling')
+    parser.add_argument('--modes', default='poll,event', help='Comma separated read modes')
+    args = parser.parse_args()
+
+    for mode in args.modes.split(','):
+        stats, idle_cpu = run_mode(mode, args.lines, args.rate, args.idle)
+        print(format_summary(f"read_mode={mode}", stats) + f" idle_cpu={idle_cpu:5.2f}%")
+
+
+if __name__ == '__main__':
+    main()
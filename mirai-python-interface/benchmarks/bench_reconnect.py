@@ -0,0 +1,123 @@
+# bench_reconnect.py
+"""Reconnect after a cable bump or a replug, on each serial runtime
+
+A firmware-emulating fake Arduino sits behind a stable symlink (like
+udev's /dev/serial/by-id names) and boots --boot-time seconds after it is
+plugged in: then it prints the setup() banner and streams text telemetry
+at --telemetry-hz. For the port's own threads, the fleet's shared
+SerialEventLoop and the asyncio loop it measures:
+
+- connect: start() until the first telemetry is stored, the board booting
+  as the port opens
+- for each of --gaps: pull the cable, plug it back in after that many
+  seconds and time the blind spell from the pull to the first telemetry
+  after it, and from the replug to that telemetry (which includes the
+  boot). Also the connection attempts, the process CPU while unplugged
+  (backoff and hot-plug watching) and the process's thread count, which
+  must not grow: the same read and write threads carry on.
+
+Usage: python benchmarks/bench_reconnect.py [--gaps 0.1 1 5] [--boot-time 1.0] [--telemetry-hz 50] [--runtime threads]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from bench_utils import write_config
+from fake_arduino import FakeArduino
+from motor_controller import MotorController
+from fleet import SerialEventLoop
+from async_runtime import AsyncSerialLoop
+from telemetry_parser import is_telemetry
+
+RUNTIMES = {
+    'threads': lambda: None,
+    'shared loop': SerialEventLoop,
+    'asyncio': AsyncSerialLoop
+}
+
+
+def wait_for_telemetry(stored, after, timeout=30.0):
+    """perf_counter time of the first telemetry batch stored after `after`, or None"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if stored and stored[-1] > after:
+            return next(t for t in stored if t > after)
+        time.sleep(0.002)
+    return None
+
+
+def run(name, args):
+    link = os.path.join(tempfile.mkdtemp(prefix='mirai-bench-'), 'ttyMIRAI')
+    device = FakeArduino(firmware=True, telemetry_hz=args.telemetry_hz, physics_hz=200, link=link,
+                         boot_time=args.boot_time)
+    controller = MotorController(write_config(link))
+    interface = controller.serial_interface
+    stored = []
+
+    def on_batch(batch):
+        if any(is_telemetry(item) for item in batch.items):
+            stored.append(time.perf_counter())
+    controller.add_sink('telemetry', on_batch)
+    attempts = [0]
+    connect = interface.connect
+
+    def counted_connect():
+        attempts[0] += 1
+        return connect()
+    interface.connect = counted_connect
+
+    loop = RUNTIMES[name]()
+    if loop is not None:
+        loop.start()
+    try:
+        device.start()
+        started = time.perf_counter()
+        controller.start(loop)
+        first = wait_for_telemetry(stored, started)
+        print(f"{name:<12} connect with a {args.boot_time:.1f} s boot: "
+              + (f"{first - started:6.3f} s to first telemetry" if first else "no telemetry"))
+        time.sleep(0.5)
+        threads = threading.active_count()
+        for gap in args.gaps:
+            before = attempts[0]
+            pulled = time.perf_counter()
+            cpu = time.process_time()
+            device.unplug()
+            time.sleep(gap)
+            cpu = (time.process_time() - cpu) / gap * 100
+            plugged = time.perf_counter()
+            device.replug()
+            back = wait_for_telemetry(stored, plugged)
+            if back is None:
+                print(f"  unplugged {gap:4.1f} s: no telemetry within 30 s of the replug")
+                continue
+            print(f"  unplugged {gap:4.1f} s: blind {back - pulled:6.3f} s, replug -> telemetry {back - plugged:6.3f} s, "
+                  f"{attempts[0] - before:3} attempts, cpu unplugged {cpu:5.1f}%")
+            time.sleep(0.5)
+        outages = interface.outages
+        print(f"  threads {threads} -> {threading.active_count()}, {interface.reconnects.value} reconnects, "
+              f"port lost -> open and ready max {outages.max:.3f} s (mirai_serial_outage_seconds)")
+    finally:
+        controller.stop()
+        if loop is not None:
+            loop.stop()
+        device.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial reconnect and hot-plug benchmark')
+    parser.add_argument('--gaps', type=float, nargs='+', default=[0.1, 1.0, 5.0],
+                        help='Seconds the cable stays unplugged, one bump each')
+    parser.add_argument('--boot-time', type=float, default=1.0, help='Seconds from plug-in to the banner')
+    parser.add_argument('--telemetry-hz', type=float, default=50, help='Text telemetry rate of the fake Arduino')
+    parser.add_argument('--runtime', choices=list(RUNTIMES), action='append', help='Runtime(s) to run (default all)')
+    args = parser.parse_args()
+
+    for name in args.runtime or RUNTIMES:
+        run(name, args)
+
+
+if __name__ == '__main__':
+    main()
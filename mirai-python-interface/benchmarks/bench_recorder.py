@@ -0,0 +1,94 @@
+# bench_recorder.py
+"""Cost of continuous recording for the update loop, with a healthy and a stalled disk
+
+A simulated controller records into a temporary directory while a feeder
+thread injects telemetry lines at a fixed rate. Every record() call the
+update loop makes is timed: it must stay in the microseconds whatever the
+disk does. The stalled run makes every recorder write take --stall seconds,
+so the bounded queue fills and batches are dropped instead of blocking.
+Small segments exercise rotation and retention.
+
+Usage: python benchmarks/bench_recorder.py [--rate 500] [--duration 5] [--stall 0.5]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from motor_controller import MotorController
+
+
+def feed(controller, rate, stop_event):
+    queue = controller.serial_interface.data_queue
+    interval = 1.0 / rate
+    count = 0
+    next_time = time.perf_counter()
+    while not stop_event.is_set():
+        queue.put(f"Left - RPM:{count % 300}.00 MPH:1.00 KPH:1.60 | Right - RPM:{(count * 2) % 300}.00 MPH:1.00 KPH:1.60")
+        count += 1
+        next_time += interval
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+def run(name, rate, duration, stall, buffer_items):
+    directory = tempfile.mkdtemp(prefix='mirai-bench-rec-')
+    config = write_config('SIMULATED', extra={'recording': {
+        'enabled': True, 'directory': directory, 'segment_seconds': 2, 'segment_max_mb': 0.05,
+        'max_total_mb': 0.3, 'buffer_items': buffer_items, 'chunk_rows': 1024
+    }, 'simulation': {'rate_hz': 2}})  # the feeder supplies the load
+    controller = MotorController(config, simulate=True)
+    recorder = controller.recorder
+
+    latencies = []
+    record = recorder.record
+
+    def timed_record(items, samples):
+        start = time.perf_counter()
+        result = record(items, samples)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        return result
+    recorder.record = timed_record
+
+    if stall:
+        write = recorder._write
+
+        def slow_write(batches):
+            time.sleep(stall)
+            write(batches)
+        recorder._write = slow_write
+
+    stop_event = threading.Event()
+    feeder = threading.Thread(target=feed, args=(controller, rate, stop_event), daemon=True)
+    controller.start()
+    feeder.start()
+    time.sleep(duration)
+    stop_event.set()
+    feeder.join()
+    time.sleep(0.2)
+    controller.stop()
+
+    stats = recorder.get_stats()
+    kept = sorted(os.listdir(directory))
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in kept)
+    print(format_summary(name, summarize(latencies)))
+    print(f"{'':24} recorded={stats['recorded']} dropped={stats['dropped']} segments={stats['segments']} "
+          f"kept={len(kept) // 2} ({size / 1024:.0f} KiB) write_errors={stats['write_errors']}")
+    shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Background telemetry recorder benchmark')
+    parser.add_argument('--rate', type=float, default=500.0, help='Telemetry lines per second')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run')
+    parser.add_argument('--stall', type=float, default=0.5, help='Seconds each write takes in the stalled run')
+    args = parser.parse_args()
+
+    run('record() healthy disk', args.rate, args.duration, 0, 100000)
+    run('record() stalled disk', args.rate, args.duration, args.stall, 100)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# bench_recording.py
+"""save_data JSON export vs .mrec recordings: size, write/read time and writer memory
+
+The telemetry is synthetic but shaped like the real thing: 20 Hz samples,
+speeds and targets that hold for seconds at a time, steadily counting
+encoder pulses and noisy RPM readings. The JSON numbers use the legacy
+save_data() encoding (indented, stringified datetimes), which needs the
+whole history in memory; the recording is streamed sample by sample.
+
+Usage: python benchmarks/bench_recording.py [--samples 200000] [--chunk-rows 4096]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import bench_utils  # noqa: F401  (puts src/ on sys.path)
+from telemetry_history import COLUMN_NAMES
+from telemetry_recording import RecordingReader, RecordingWriter, convert_json
+
+
+def synthetic_shift(samples, seed=1):
+    rng = np.random.default_rng(seed)
+    timestamps = 1.7e9 + np.arange(samples) * 0.05 + rng.normal(0, 0.002, samples)
+    columns = {'timestamp': timestamps}
+    for side in ('left', 'right'):
+        target = np.repeat(rng.integers(0, 256, samples // 100 + 1), 100)[:samples]
+        speed = np.clip(target + rng.integers(-3, 4, samples), 0, 255)
+        rpm = speed * 1.2 + rng.normal(0, 2, samples)
+        columns[f'{side}_target'] = target.astype(np.int32)
+        columns[f'{side}_speed'] = speed.astype(np.int32)
+        columns[f'{side}_pulses'] = np.cumsum((rpm * 44 / 60 * 0.05).astype(np.int64))
+        columns[f'{side}_rpm'] = rpm.astype(np.float32)
+    return columns
+
+
+def write_json(path, columns):
+    history = {name: columns[name].tolist() for name in COLUMN_NAMES}
+    history['timestamp'] = [str(datetime.fromtimestamp(ts)) for ts in history['timestamp']]
+    with open(path, 'w') as f:
+        json.dump({'metadata': {'data_points': len(history['timestamp'])}, 'data': history}, f, indent=2, default=str)
+
+
+def write_recording(path, rows, chunk_rows):
+    with RecordingWriter(path, chunk_rows=chunk_rows) as writer:
+        for row in rows:  # one append per sample, as a live recorder would
+            writer.append(*row)
+
+
+def writer_peak_memory(path, rows, chunk_rows):
+    tracemalloc.start()
+    write_recording(path, rows, chunk_rows)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recording format benchmark')
+    parser.add_argument('--samples', type=int, default=200000, help='Samples (20 Hz: 72000 per hour)')
+    parser.add_argument('--chunk-rows', type=int, default=4096, help='Samples per chunk')
+    args = parser.parse_args()
+
+    columns = synthetic_shift(args.samples)
+    workdir = tempfile.mkdtemp(prefix='mirai-bench-')
+    json_path = os.path.join(workdir, 'export.json')
+    mrec_path = os.path.join(workdir, 'export.mrec')
+
+    _, json_write = timed(write_json, json_path, columns)
+    _, json_read = timed(lambda: json.load(open(json_path)))
+    rows = list(zip(*(columns[name].tolist() for name in COLUMN_NAMES)))
+    _, mrec_write = timed(write_recording, mrec_path, rows, args.chunk_rows)
+    peak = writer_peak_memory(os.path.join(workdir, 'traced.mrec'), rows, args.chunk_rows)
+    with RecordingReader(mrec_path) as reader:
+        _, mrec_read = timed(reader.read)
+        middle = float(columns['timestamp'][args.samples // 2])
+        window, mrec_range = timed(reader.read, middle, middle + 60)
+    converted, convert_time = timed(convert_json, json_path, os.path.join(workdir, 'converted.mrec'))
+
+    json_size, mrec_size = os.path.getsize(json_path), os.path.getsize(mrec_path)
+    hours = args.samples / 20 / 3600
+    print(f"{args.samples} samples ({hours:.1f} h at 20 Hz)")
+    print(f"json   size={json_size / 1e6:8.2f} MB ({json_size / args.samples:5.1f} B/sample) "
+          f"write={json_write:6.2f}s read={json_read:6.2f}s")
+    print(f"mrec   size={mrec_size / 1e6:8.2f} MB ({mrec_size / args.samples:5.1f} B/sample) "
+          f"write={mrec_write:6.2f}s read={mrec_read:6.3f}s  ({json_size / mrec_size:.0f}x smaller)")
+    print(f"mrec   60 s range query={mrec_range * 1000:6.2f} ms ({len(window['timestamp'])} samples), "
+          f"writer peak memory={peak / 1e6:.2f} MB")
+    print(f"convert json -> mrec {convert_time:6.2f}s, {os.path.getsize(converted) / 1e6:.2f} MB")
+    shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
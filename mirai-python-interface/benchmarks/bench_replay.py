@@ -0,0 +1,104 @@
+# bench_replay.py
+"""Replay timing accuracy and end-to-end replay throughput
+
+A synthetic session (telemetry every 20 ms with jitter and a few pauses)
+is recorded with TelemetryRecorder, then replayed:
+
+- through ReplaySource alone at 1x and 10x, measuring how far each item's
+  release strays from its recorded offset divided by the speed factor
+- through a full MotorController at max speed, twice, reporting items/sec
+  into the history store and whether both runs produced identical history
+
+Usage: python benchmarks/bench_replay.py [--seconds 5] [--items 100000]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench_utils import write_config, summarize, format_summary
+from motor_controller import MotorController
+from replay_source import ReplaySource, recording_events
+from telemetry_history import HISTORY_COLUMNS, COLUMN_NAMES
+from telemetry_recorder import TelemetryRecorder
+
+
+def make_recording(directory, items):
+    """Record `items` synthetic lines at ~50 Hz, a batch per sample, and return the segment path"""
+    rng = random.Random(1)
+    recorder = TelemetryRecorder(directory, segment_seconds=10 ** 6, segment_max_bytes=2 ** 40,
+                                 buffer_items=items + 1)
+    recorder.start()
+    timestamp = 1.7e9
+    for index in range(items):
+        timestamp += 0.02 + rng.uniform(-0.003, 0.003) + (1.0 if index % 2000 == 1999 else 0.0)
+        speed = (index // 50) % 256
+        if index % 2:
+            line = f"STATUS:ML:FORWARD:{speed}"
+        else:
+            line = f"Left - RPM:{speed * 1.2:.2f} MPH:1.00 KPH:1.60 | Right - RPM:{speed * 1.1:.2f} MPH:1.00 KPH:1.60"
+        samples = {name: np.zeros(1, dtype=dtype) for name, dtype in HISTORY_COLUMNS}
+        samples['timestamp'][0] = timestamp
+        recorder.record([line], samples)
+    recorder.stop(timeout=60)
+    return recorder.directory
+
+
+def timing(path, speed, seconds):
+    events = [timestamp for timestamp, _ in recording_events(path)]
+    source = ReplaySource(path, speed)
+    errors = []
+    index = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline and not source.finished:
+        items = source.read(timeout=0.1)
+        now = time.perf_counter()
+        recorded_start, started = source._origin
+        for _ in items:
+            expected = started + (events[index] - recorded_start) / speed
+            errors.append((now - expected) * 1000.0)
+            index += 1
+    return errors
+
+
+def end_to_end(path, items):
+    config = write_config('SIMULATED', extra={'visualization': {'history_length': items}})
+    source = ReplaySource(path, speed=0)
+    controller = MotorController(config, source=source)
+    start = time.perf_counter()
+    controller.start()
+    while controller.get_snapshot().cursor < items and time.perf_counter() - start < 120:
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    controller.stop()
+    history = controller.data_history.read(0, controller.data_history.total)
+    return controller.data_history.total / elapsed, {name: history[name] for name in COLUMN_NAMES[1:]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay engine benchmark')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Wall time per timed replay')
+    parser.add_argument('--items', type=int, default=100000, help='Items in the synthetic session')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='mirai-bench-replay-')
+    try:
+        path = make_recording(directory, args.items)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"recorded {args.items} items, {size / 1024:.0f} KiB")
+        for speed in (1, 10):
+            print(format_summary(f"release error {speed}x", summarize(timing(path, speed, args.seconds))))
+        rate, first = end_to_end(path, args.items)
+        _, second = end_to_end(path, args.items)
+        identical = all(np.array_equal(first[name], second[name]) for name in first)
+        print(f"max speed end-to-end   {rate:10,.0f} items/sec into history, two runs identical: {identical}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# bench_serial_stack.py
+"""Full serial stack against the firmware-emulating fake Arduino
+
+Unlike --simulate, which hands items straight to the read loop, this runs
+MotorController on a real serial.Serial port: connect() with its banner
+and PROTO:BIN negotiation, the event read loop, the batched write loop and
+the parser, with the fake device answering commands and streaming
+simulated telemetry from its own process. For each scenario it reports
+items/sec reaching the history store against the telemetry and reply
+lines the device sent, and the round trip from send_command() to the
+device's reply being processed on the host.
+
+Usage: python benchmarks/bench_serial_stack.py [--duration 5]
+"""
+import argparse
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from fake_arduino import FakeArduino
+from motor_controller import MotorController
+
+# name, protocol, telemetry rate (Hz), baud limit (None = pty speed)
+SCENARIOS = [
+    ('text 50 Hz', 'text', 50, None),
+    ('text 1 kHz @115200', 'text', 1000, 115200),
+    ('text 1 kHz', 'text', 1000, None),
+    ('binary 100 Hz @115200', 'binary', 100, 115200),
+    ('binary 1 kHz @115200', 'binary', 1000, 115200),
+    ('binary 1 kHz', 'binary', 1000, None),
+]
+
+
+def run(name, protocol, rate_hz, baudrate, duration):
+    device = FakeArduino(baudrate=baudrate, firmware=True, telemetry_hz=rate_hz, min_interval_ms=0).start()
+    config = write_config(device.port, serial_overrides={
+        'protocol': protocol, 'telemetry_interval_ms': max(1, round(1000 / rate_hz))
+    }, extra={'visualization': {'history_length': int(rate_hz * duration * 2) + 1000}})
+    controller = MotorController(config)
+
+    replies = {}
+
+    def on_batch(batch):
+        processed_at = time.perf_counter()
+        for data in batch.items:
+            if isinstance(data, str) and data.startswith('✅ Both motors speed set to: '):
+                replies.setdefault(int(data.rsplit(' ', 1)[1]), processed_at)
+    controller.add_sink('replies', on_batch)
+
+    controller.start()
+    time.sleep(0.5)
+    sent_before, total_before = device.sent, controller.data_history.total
+    start = time.perf_counter()
+    round_trips = []
+    speed = 0
+    while time.perf_counter() - start < duration:
+        speed = speed % 250 + 1
+        replies.pop(speed, None)
+        sent_at = time.perf_counter()
+        controller.set_both_speeds(speed)
+        while speed not in replies and time.perf_counter() - sent_at < 1.0:
+            time.sleep(0.0005)
+        if speed in replies:
+            round_trips.append((replies[speed] - sent_at) * 1000.0)
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    sent_after, total_after = device.sent, controller.data_history.total
+    controller.stop()
+    device.stop()
+
+    sent = {key: (sent_after[key] - sent_before[key]) / elapsed for key in sent_after}
+    received = (total_after - total_before) / elapsed  # every item, replies included, adds a sample
+    mode = 'binary' if controller.serial_interface.binary_mode else 'text'
+    print(f"{name:<24} sent {sent['telemetry']:7,.0f} telemetry + {sent['lines']:3.0f} replies/s  "
+          f"ingested {received:7,.0f}/s  ({mode}, {sent['bytes'] / 1024:5.1f} KiB/s)")
+    print(format_summary('  command round trip', summarize(round_trips)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serial stack benchmark against the fake Arduino')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per scenario')
+    args = parser.parse_args()
+
+    for scenario in SCENARIOS:
+        run(*scenario, args.duration)
+
+
+if __name__ == '__main__':
+    main()
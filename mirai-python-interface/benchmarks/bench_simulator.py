@@ -0,0 +1,103 @@
+# bench_simulator.py
+"""Motor simulator: step response of the model and sustained real-time rate through the stack
+
+- offline: BOTH:<speed> from standstill, then HB, COAST and SB from full
+  speed, stepped without waiting; reports rise time, overshoot, settled
+  error and stopping times so model or PID changes are easy to compare
+- real time: a MotorController in simulate mode at each --rates value for
+  --duration seconds, reporting telemetry items/sec reaching the history
+  store, steps the simulator had to skip, process CPU and how long a
+  command takes to show up in the published snapshot
+
+Usage: python benchmarks/bench_simulator.py [--rates 1000 5000] [--duration 5]
+"""
+import argparse
+import time
+
+from bench_utils import write_config, summarize, format_summary
+from motor_controller import MotorController
+from motor_simulator import MotorSimulator
+
+
+def first_time(items, rate_hz, condition):
+    for index, item in enumerate(items):
+        if not isinstance(item, str) and condition(item):
+            return (index + 1) / rate_hz
+    return float('nan')
+
+
+def step_response(speed, rate_hz=1000):
+    simulator = MotorSimulator(rate_hz=rate_hz)
+    setpoint = speed * simulator.max_rpm / 255.0
+    simulator.write(f"BOTH:{speed}")
+    records = [item for item in simulator.run(5.0) if not isinstance(item, str)]
+    rise = (first_time(records, rate_hz, lambda r: r.left_rpm >= 0.9 * setpoint) -
+            first_time(records, rate_hz, lambda r: r.left_rpm >= 0.1 * setpoint))
+    overshoot = max(0.0, max(r.left_rpm for r in records) - setpoint) / setpoint * 100
+    settled = abs(records[-1].left_rpm - setpoint)
+    print(f"BOTH:{speed:<4} setpoint={setpoint:6.1f} rpm  rise 10-90%={rise * 1000:6.0f} ms  "
+          f"overshoot={overshoot:4.1f}%  error after 5 s={settled:4.1f} rpm")
+
+
+def stopping_time(command, rate_hz=1000):
+    simulator = MotorSimulator(rate_hz=rate_hz)
+    simulator.write('BOTH:255')
+    simulator.run(3.0)
+    simulator.write(command)
+    items = simulator.run(20.0)
+    stopped = first_time(items, rate_hz, lambda r: r.left_rpm < 1.0)
+    print(f"{command:<9} from {simulator.max_rpm:.0f} rpm: below 1 rpm after {stopped:6.2f} s")
+
+
+def real_time(rate_hz, duration):
+    config = write_config('SIMULATED', extra={
+        'simulation': {'rate_hz': rate_hz},
+        'visualization': {'history_length': int(rate_hz * duration * 2)}
+    })
+    controller = MotorController(config, simulate=True)
+    simulator = controller.serial_interface.source
+    controller.start()
+    time.sleep(0.5)
+
+    start_items = controller.data_history.total
+    start_cpu, start = time.process_time(), time.perf_counter()
+    delays = []
+    speed = 0
+    while time.perf_counter() - start < duration:
+        speed = speed % 250 + 5
+        sent = time.perf_counter()
+        controller.set_both_speeds(speed)
+        # set_both_speeds publishes the target itself; wait for a telemetry sample carrying it
+        while time.perf_counter() - sent < 1.0:
+            cursor = controller.get_snapshot().cursor
+            if controller.data_history.read(cursor - 1, cursor)['left_target'][-1] == speed:
+                break
+            time.sleep(0.0005)
+        delays.append((time.perf_counter() - sent) * 1000.0)
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    cpu = (time.process_time() - start_cpu) / elapsed * 100
+    items = controller.data_history.total - start_items
+    controller.stop()
+
+    print(f"{rate_hz:6.0f} Hz  {items / elapsed:9,.0f} items/sec into history  skipped={simulator.skipped}  "
+          f"cpu={cpu:5.1f}%")
+    print(format_summary("  command -> telemetry", summarize(delays)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motor simulator benchmark')
+    parser.add_argument('--rates', type=float, nargs='+', default=[1000, 5000], help='Simulation rates (Hz)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per real-time run')
+    args = parser.parse_args()
+
+    for speed in (100, 200, 255):
+        step_response(speed)
+    for command in ('HB', 'SB', 'COAST'):
+        stopping_time(command)
+    for rate_hz in args.rates:
+        real_time(rate_hz, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# bench_snapshot_contention.py
+"""Telemetry ingest rate and HTTP read latency with many concurrent /status and /history readers
+
+The controller runs in simulation mode while a feeder thread pushes a
+recorded capture into its data_queue as fast as the update loop drains it.
+Each reader thread polls the Flask app over real HTTP and checks that every
+/history response is consistent (equal column lengths, ordered timestamps).
+
+Usage: python benchmarks/bench_snapshot_contention.py [--readers 0,4,16,64] [--duration 5]
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+from werkzeug.serving import make_server
+
+from bench_utils import write_config, summarize, format_summary
+import app as web
+from motor_controller import MotorController
+
+DEFAULT_CAPTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'telemetry_capture.log')
+
+
+def feed(controller, lines, stop_event, batch=200):
+    """Keep the data_queue topped up with capture lines until stopped"""
+    queue = controller.serial_interface.data_queue
+    index = 0
+    while not stop_event.is_set():
+        if queue.qsize() < batch:
+            for _ in range(batch):
+                queue.put(lines[index])
+                index = (index + 1) % len(lines)
+        else:
+            time.sleep(0.0005)
+
+
+def read_loop(base_url, stop_event, latencies, errors):
+    paths = ('/status', '/history')
+    turn = 0
+    while not stop_event.is_set():
+        path = paths[turn % 2]
+        turn += 1
+        start = time.perf_counter()
+        with urllib.request.urlopen(base_url + path, timeout=5) as response:
+            body = response.read()
+        latencies[path].append((time.perf_counter() - start) * 1000.0)
+        if path == '/history':
+            history = json.loads(body)
+            lengths = {len(values) for values in history.values()}
+            timestamps = history['timestamp']
+            if len(lengths) != 1 or any(b < a for a, b in zip(timestamps, timestamps[1:])):
+                errors.append(path)
+
+
+def run(readers, duration, lines, config_path):
+    controller = MotorController(config_path, simulate=True)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log
+    web.motor_controller = controller
+    server = make_server('127.0.0.1', 0, web.app, threaded=True)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    controller.start()
+    stop_event = threading.Event()
+    latencies = {'/status': [], '/history': []}
+    errors = []
+    threads = [threading.Thread(target=feed, args=(controller, lines, stop_event), daemon=True)]
+    threads += [threading.Thread(target=read_loop, args=(base_url, stop_event, latencies, errors), daemon=True)
+                for _ in range(readers)]
+    try:
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)  # let the readers ramp up before measuring
+        ingested = controller.data_history.total
+        start = time.perf_counter()
+        time.sleep(duration)
+        ingest_rate = (controller.data_history.total - ingested) / (time.perf_counter() - start)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        server.shutdown()
+        controller.stop()
+    return ingest_rate, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot contention benchmark (simulated controller, real HTTP)')
+    parser.add_argument('--readers', default='0,4,16,64', help='Comma separated concurrent reader counts')
+    parser.add_argument('--duration', type=float, default=5.0, help='Measured seconds per reader count')
+    parser.add_argument('--capture', default=DEFAULT_CAPTURE, help='Capture file fed to the controller')
+    args = parser.parse_args()
+
+    with open(args.capture, encoding='utf-8') as f:
+        lines = [line.strip() for line in f if line.strip()]
+    # The feeder supplies the load; keep the simulated motors' own telemetry to a trickle
+    config_path = write_config('SIMULATED', extra={'visualization': {'history_length': 1000},
+                                                   'simulation': {'rate_hz': 2}})
+
+    for readers in [int(n) for n in args.readers.split(',')]:
+        ingest_rate, latencies, errors = run(readers, args.duration, lines, config_path)
+        print(f"readers={readers:<3} ingest={ingest_rate:10,.0f} lines/sec inconsistent_reads={len(errors)}")
+        for path, samples in latencies.items():
+            if samples:
+                print("  " + format_summary(path, summarize(samples)))
+
+
+if __name__ == '__main__':
+    main()
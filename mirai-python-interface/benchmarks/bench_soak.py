@@ -0,0 +1,156 @@
+# bench_soak.py
+"""Soak test: flood the serial link with a stalling consumer and watch RSS
+
+A process floods a fake Arduino's pty with text telemetry at --rate lines
+per second (0: as fast as the pty takes it), with a DIAG:SEQ:<n> line
+every 100 lines and an ACK every 1000. The controller's update loop stalls
+for --stall seconds every --stall-every seconds, the way a reconnect sleep
+or a slow print holds it up, so the serial reader keeps filling data_queue
+while nothing drains it.
+
+For the bounded ingest buffer (pipeline.ingest_limit, drop_oldest) and,
+for comparison, an effectively unbounded one, each in a fresh process so
+neither inherits the other's heap, it samples the RSS,
+the buffer depth and the telemetry shed, and checks through a pipeline
+sink that no DIAG line was lost. Run it for hours with --duration; RSS
+should level off after the first stalls and stay flat (the slope is fitted
+over the second half of the run).
+
+Usage: python benchmarks/bench_soak.py [--duration 60] [--rate 20000] [--stall 2] [--stall-every 5] [--limit 10000]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from bench_utils import write_config
+from fake_arduino import FakeArduino
+from motor_controller import MotorController
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.0
+
+
+def flood(master_fd, rate):
+    """Device process: write telemetry lines in 10 ms chunks (or as fast as possible with rate 0)"""
+    sequence = 0
+    count = 0
+    per_chunk = max(1, int(rate / 100)) if rate else 1000
+    next_time = time.perf_counter()
+    while True:
+        lines = []
+        for _ in range(per_chunk):
+            if count % 100 == 0:
+                lines.append(f"DIAG:SEQ:{sequence}")
+                sequence += 1
+            elif count % 1000 == 1:
+                lines.append("ACK:BOTH:120")
+            else:
+                lines.append(f"Left - RPM:{count % 300}.00 MPH:1.00 KPH:1.60 | "
+                             f"Right - RPM:{(count * 2) % 300}.00 MPH:1.00 KPH:1.60")
+            count += 1
+        data = ('\r\n'.join(lines) + '\r\n').encode('utf-8')
+        while data:
+            data = data[os.write(master_fd, data):]
+        if rate:
+            next_time += 0.01
+            time.sleep(max(0.0, next_time - time.perf_counter()))
+
+
+def run(name, limit, args):
+    device = FakeArduino().start()
+    config = write_config(device.port, {'read_chunk_size': 65536},
+                          extra={'pipeline': {'ingest_limit': limit}})
+    controller = MotorController(config)
+
+    diag = {'first': None, 'last': None, 'seen': 0}
+
+    def check_diag(batch):
+        # Counted, not kept, so the check itself doesn't grow over a long soak
+        for item in batch.items:
+            if isinstance(item, str) and item.startswith('DIAG:SEQ:'):
+                sequence = int(item[9:])
+                if diag['first'] is None:
+                    diag['first'] = sequence
+                diag['last'] = sequence
+                diag['seen'] += 1
+    controller.add_sink('diag', check_diag)
+    process = controller.process_pending
+    next_stall = [time.perf_counter() + args.stall_every]
+
+    def stalling_process():
+        if time.perf_counter() >= next_stall[0]:
+            time.sleep(args.stall)
+            next_stall[0] = time.perf_counter() + args.stall_every
+        return process()
+    controller.process_pending = stalling_process
+
+    controller.start()
+    flooder = multiprocessing.get_context('fork').Process(target=flood, args=(device.master_fd, args.rate),
+                                                          daemon=True)
+    flooder.start()
+    start = time.perf_counter()
+    samples = []
+    peak_depth = 0
+    next_sample = start
+    try:
+        while time.perf_counter() - start < args.duration:
+            peak_depth = max(peak_depth, controller.serial_interface.data_queue.qsize())
+            if time.perf_counter() >= next_sample:
+                samples.append((time.perf_counter() - start, rss_mb()))
+                next_sample += args.sample
+            time.sleep(0.05)
+    finally:
+        flooder.terminate()
+        flooder.join()
+        stats = controller.pipeline.get_stats()
+        controller.stop()
+        device.stop()
+
+    half = [sample for sample in samples if sample[0] >= args.duration / 2]
+    slope = 0.0
+    if len(half) > 1:
+        mean_t = sum(t for t, _ in half) / len(half)
+        mean_r = sum(r for _, r in half) / len(half)
+        slope = (sum((t - mean_t) * (r - mean_r) for t, r in half)
+                 / sum((t - mean_t) ** 2 for t, _ in half)) * 3600
+    missing = diag['last'] - diag['first'] + 1 - diag['seen'] if diag['seen'] else 0
+    ingest = stats['stages']['ingest']
+    print(f"{name:<22} RSS start {samples[0][1]:7.1f} MB  max {max(r for _, r in samples):7.1f} MB  "
+          f"end {samples[-1][1]:7.1f} MB  slope {slope:+8.1f} MB/h")
+    print(f"  {ingest['items'] / args.duration:9,.0f} items/s ingested, {ingest['dropped']:,} telemetry shed, "
+          f"peak depth {peak_depth:,}, DIAG {diag['seen']:,} seen / {missing} missing")
+    if args.verbose:
+        for t, r in samples:
+            print(f"    {t:8.1f}s {r:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest overload soak test')
+    parser.add_argument('--duration', type=float, default=60.0, help='Seconds per run (hours for a real soak)')
+    parser.add_argument('--rate', type=float, default=20000, help='Lines per second, 0 for as fast as possible')
+    parser.add_argument('--stall', type=float, default=2.0, help='Seconds the update loop stalls')
+    parser.add_argument('--stall-every', type=float, default=5.0, help='Seconds between stalls')
+    parser.add_argument('--limit', type=int, default=10000, help='pipeline.ingest_limit for the bounded run')
+    parser.add_argument('--sample', type=float, default=1.0, help='Seconds between RSS samples')
+    parser.add_argument('--verbose', action='store_true', help='Print every RSS sample')
+    parser.add_argument('--only', choices=['bounded', 'unbounded'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.only == 'bounded':
+        run(f"bounded ({args.limit:,})", args.limit, args)
+    elif args.only == 'unbounded':
+        run("unbounded", 10 ** 12, args)
+    else:
+        for mode in ('bounded', 'unbounded'):
+            subprocess.run([sys.executable, __file__, '--only', mode] + sys.argv[1:], check=True)
+
+
+if __name__ == '__main__':
+    main()
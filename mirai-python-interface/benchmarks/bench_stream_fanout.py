@@ -0,0 +1,103 @@
+# bench_stream_fanout.py
+"""Push latency and delivered frame rate for many concurrent /stream (SSE) clients
+
+The controller runs in simulation mode and a feeder thread injects telemetry
+at a fixed rate. Each client keeps one /stream connection open and measures
+how long each frame took from being published to arriving over HTTP.
+
+Usage: python benchmarks/bench_stream_fanout.py [--clients 1,16,64] [--rate 100] [--duration 5]
+"""
+import argparse
+import http.client
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+from werkzeug.serving import make_server
+
+from bench_utils import write_config, summarize, format_summary
+import app as web
+from motor_controller import MotorController
+
+
+def feed(controller, rate, stop_event):
+    queue = controller.serial_interface.data_queue
+    interval = 1.0 / rate
+    count = 0
+    while not stop_event.is_set():
+        queue.put(f"STATUS:ML:FORWARD:{count % 256}")
+        count += 1
+        time.sleep(interval)
+
+
+def client(port, client_rate, stop_event, latencies, frames):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    path = '/stream' if client_rate is None else f'/stream?rate={client_rate}'
+    connection.request('GET', path)
+    response = connection.getresponse()
+    received = 0
+    try:
+        while not stop_event.is_set():
+            line = response.fp.readline()
+            if not line:
+                break
+            if line.startswith(b'data: '):
+                frame = json.loads(line[6:])
+                published = datetime.fromisoformat(frame['status']['timestamp']).timestamp()
+                latencies.append((time.time() - published) * 1000.0)
+                received += 1
+    finally:
+        frames.append(received)
+        connection.close()
+
+
+def run(clients, rate, client_rate, duration, config_path):
+    controller = MotorController(config_path, simulate=True)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    web.motor_controller = controller
+    server = make_server('127.0.0.1', 0, web.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    controller.start()
+
+    stop_event = threading.Event()
+    latencies = []
+    frames = []
+    readers = [threading.Thread(target=client, args=(server.server_port, client_rate, stop_event, latencies, frames),
+                                daemon=True) for _ in range(clients)]
+    feeder = threading.Thread(target=feed, args=(controller, rate, stop_event), daemon=True)
+    cpu_start = time.process_time()
+    try:
+        for thread in readers:
+            thread.start()
+        feeder.start()
+        time.sleep(duration)
+    finally:
+        stop_event.set()
+        controller.stop()  # closes the broadcaster, ending every stream
+        for thread in readers + [feeder]:
+            thread.join(timeout=5)
+        server.shutdown()
+    cpu = (time.process_time() - cpu_start) / duration * 100.0
+    return latencies, sum(frames) / max(1, clients) / duration, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SSE fan-out benchmark (simulated controller, real HTTP)')
+    parser.add_argument('--clients', default='1,16,64', help='Comma separated concurrent client counts')
+    parser.add_argument('--rate', type=float, default=100.0, help='Telemetry lines per second')
+    parser.add_argument('--client-rate', type=float, default=None, help='Per-client ?rate= cap (default: server max)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Seconds per client count')
+    args = parser.parse_args()
+
+    # The feeder supplies the load; keep the simulated motors' own telemetry to a trickle
+    config_path = write_config('SIMULATED', extra={'simulation': {'rate_hz': 2}})
+    for clients in [int(n) for n in args.clients.split(',')]:
+        latencies, frame_rate, cpu = run(clients, args.rate, args.client_rate, args.duration, config_path)
+        print(format_summary(f"clients={clients}", summarize(latencies))
+              + f" frames/client/s={frame_rate:6.1f} cpu={cpu:5.1f}%")
+
+
+if __name__ == '__main__':
+    main()
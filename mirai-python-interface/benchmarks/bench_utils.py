@@ -0,0 +1,52 @@
+# bench_utils.py
+"""Shared helpers for the benchmark scripts in this directory"""
+import os
+import sys
+import tempfile
+import yaml
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def write_config(port, serial_overrides=None, extra=None):
+    """Write a throwaway settings.yaml pointing at the given port and return its path"""
+    workdir = tempfile.mkdtemp(prefix='mirai-bench-')
+    config = {
+        'serial': {'port': port, 'baudrate': 115200, 'timeout': 1},
+        'logging': {'level': 'WARNING', 'file': os.path.join(workdir, 'bench.log')}
+    }
+    config['serial'].update(serial_overrides or {})
+    config.update(extra or {})
+    path = os.path.join(workdir, 'settings.yaml')
+    with open(path, 'w') as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def summarize(samples_ms):
+    """Return count/mean/p50/p95/p99/max for a list of millisecond samples"""
+    if not samples_ms:
+        return {'count': 0}
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))]
+
+    return {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'p50': pct(50),
+        'p95': pct(95),
+        'p99': pct(99),
+        'max': ordered[-1]
+    }
+
+
+def format_summary(name, stats):
+    if not stats.get('count'):
+        return f"{name:<24} no samples"
+    return (f"{name:<24} n={stats['count']:<6} mean={stats['mean']:7.3f}ms "
+            f"p50={stats['p50']:7.3f}ms p95={stats['p95']:7.3f}ms "
+            f"p99={stats['p99']:7.3f}ms max={stats['max']:7.3f}ms")
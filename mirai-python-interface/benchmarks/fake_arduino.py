@@ -0,0 +1,336 @@
+# fake_arduino.py
+"""Pseudo-terminal stand-in for the Arduino Mega, used by the serial benchmarks
+
+Like the Mega, which resets when the port opens, the device prints the
+setup() banner each time the host opens it, so connect() finds the board
+ready straight away. By default it is otherwise passive: it records what
+the host writes and the benchmark pushes telemetry with
+write_line()/write_bytes(). With firmware=True it behaves like the real
+board on the other end of the port: each open also puts it back on text
+telemetry, and it answers commands through
+motor_simulator.MotorSimulator (the same command set and replies as
+communication.cpp), negotiates PROTO:BIN/PROTO:TEXT and streams telemetry
+from the simulated motors at `telemetry_hz`, text lines or binary frames.
+The baud rate, if given, limits both directions like a UART would.
+With `link`, the port is a symlink to the pty, like udev's
+/dev/serial/by-id names, so unplug() and replug() can pull the cable and
+plug it back in under the same name.
+
+Run on its own to point the GUI or any other host at it:
+
+    python benchmarks/fake_arduino.py [--telemetry-hz 50] [--baud 115200]
+    python src/main.py --port /dev/pts/N
+"""
+import argparse
+import errno
+import multiprocessing
+import os
+import select
+import threading
+import time
+import tty
+from queue import Empty
+
+import bench_utils  # noqa: F401  (puts src/ on sys.path)
+from binary_protocol import encode_telemetry, PROTO_BINARY, PROTO_TEXT
+from motor_simulator import MotorSimulator, speed_line
+
+# main.cpp setup()
+BANNER = [
+    "==================================================",
+    "🤖 MIRAI Enhanced Dual Hoverboard Motor Controller",
+    "==================================================",
+    "Board: Arduino Mega/Nano with ZS-X11H Controllers",
+    "Motors: 2x Recycled Hoverboard Motors with PID",
+    "Pulses/Rev - L: 44.00 R: 45.00",
+    "==================================================",
+    "Type 'HELP' for command list",
+    "=================================================="
+]
+UPDATE_TIME = 500  # ms, firmware's text telemetry period
+RESET_TIME = 0.01  # s, from the host opening the port to the banner
+HANGUP_POLL = 0.002  # s, between checks for the host opening the port
+MIN_UPDATE_TIME = 10  # ms, fastest interval PROTO:BIN:<ms> accepts
+
+
+class _Firmware:
+    """Device side of firmware mode: command handling and the telemetry loop, run in the device process"""
+
+    def __init__(self, master_fd, baudrate, telemetry_hz, min_interval_ms, physics_hz, counters):
+        self.master_fd = master_fd
+        self.baudrate = baudrate
+        self.text_interval = 1.0 / telemetry_hz if telemetry_hz else UPDATE_TIME / 1000.0
+        self.interval = self.text_interval
+        self.min_interval = min_interval_ms / 1000.0
+        self.binary = False
+        self.counters = counters  # shared [telemetry items, other lines, bytes] sent to the host
+        self.simulator = MotorSimulator(rate_hz=physics_hz, protocol='binary')
+        self.state = self.simulator.run(1.0 / physics_hz)[-1]  # latest TelemetryRecord
+        self.sequence = 0
+        self._lock = threading.Lock()
+        self._wire_clock = time.perf_counter()
+
+    def write(self, data, telemetry=False):
+        """Write to the host, blocking like Serial.print on a full TX buffer when a baud rate is set"""
+        with self._lock:
+            os.write(self.master_fd, data)
+            if telemetry:
+                self.counters[0] += 1
+            else:
+                self.counters[1] += data.count(b'\n')
+            self.counters[2] += len(data)
+            if self.baudrate:
+                now = time.perf_counter()
+                self._wire_clock = max(self._wire_clock, now) + len(data) * 10.0 / self.baudrate
+                if self._wire_clock > now:
+                    time.sleep(self._wire_clock - now)
+
+    def println(self, lines, telemetry=False):
+        if lines:
+            self.write(''.join(line + '\r\n' for line in lines).encode('utf-8'), telemetry)
+
+    def pump(self):
+        """Advance the motors to now and print any pending command replies"""
+        replies = []
+        for item in self.simulator.read(timeout=0):
+            if isinstance(item, str):
+                replies.append(item)
+            else:
+                self.state = item
+        self.println(replies)
+
+    def command(self, line):
+        upper = line.strip().upper()
+        if upper.startswith(PROTO_BINARY):
+            interval = upper[len(PROTO_BINARY) + 1:]
+            if interval.isdigit():
+                self.interval = max(int(interval) / 1000.0, self.min_interval)
+            self.binary = True
+            self.println([f"PROTO:BIN:OK:{round(self.interval * 1000)}"])
+        elif upper == PROTO_TEXT:
+            self.binary = False
+            self.interval = self.text_interval
+            self.println(["PROTO:TEXT:OK"])
+        else:
+            self.simulator.write(line)
+            self.pump()
+
+    def reset(self):
+        """The board restarting as the host opens the port: text telemetry again, then the banner"""
+        self.binary = False
+        self.interval = self.text_interval
+        self.println(BANNER)
+
+    def telemetry_loop(self):
+        next_time = time.perf_counter()
+        while True:
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -1.0:
+                next_time = time.perf_counter()  # fell far behind (slow link): don't burst to catch up
+            self.pump()
+            state = self.state
+            if self.binary:
+                self.write(encode_telemetry(state, self.sequence, state.millis), telemetry=True)
+                self.sequence += 1
+            else:
+                self.println([speed_line(state.left_rpm, state.right_rpm)], telemetry=True)
+
+
+def _watch_opens(master_fd, on_open):
+    """Call on_open() (print the banner) each time the host opens the port
+
+    Nothing else holds the pty's slave end, so the master reports a hangup
+    until the host opens it. pyserial flushes what is waiting right after
+    opening, so on_open runs RESET_TIME later, like a board resetting.
+    """
+    poller = select.poll()
+    poller.register(master_fd, select.POLLIN)
+    was_open = None  # the state when the device came up: an open during the boot got its banner
+    while True:
+        events = dict(poller.poll(0)).get(master_fd, 0)
+        if events & select.POLLNVAL:
+            return  # stopped or unplugged
+        is_open = not events & select.POLLHUP
+        if is_open and was_open is False:
+            time.sleep(RESET_TIME)
+            try:
+                on_open()
+            except OSError:
+                return
+        was_open = is_open
+        time.sleep(HANGUP_POLL)
+
+
+def _reader_process(master_fd, baudrate, received, binary, firmware=None, boot_time=0.0):
+    """Consume host->device bytes and report each complete line with its arrival time
+
+    Runs in its own process so the benchmark's Python threads cannot starve
+    it of the GIL and make the fake device look slower than the wire.
+    perf_counter() is CLOCK_MONOTONIC on Linux, so timestamps are comparable
+    with the parent's. With binary=True, PROTO:BIN is acknowledged like the
+    firmware does; with firmware options, every line goes to _Firmware.
+    """
+    device = None
+    if firmware is not None:
+        time.sleep(boot_time)  # bootloader and setup(); commands sent meanwhile wait in the pty
+        device = _Firmware(master_fd, baudrate, **firmware)
+        device.println(BANNER)
+        threading.Thread(target=device.telemetry_loop, daemon=True).start()
+        on_open = device.reset
+    else:
+        def on_open():
+            os.write(master_fd, ''.join(line + '\r\n' for line in BANNER).encode('utf-8'))
+    threading.Thread(target=_watch_opens, args=(master_fd, on_open), daemon=True).start()
+    buffer = b''
+    # With a baud rate, consume roughly 1 ms worth of bytes at a time on a
+    # steady clock (10 bits per byte, 8N1) so the pty fills up like a UART
+    read_size = max(1, baudrate // 10000) if baudrate else 4096
+    wire_clock = time.perf_counter()
+    while True:
+        try:
+            chunk = os.read(master_fd, read_size)
+        except OSError as e:
+            if e.errno == errno.EIO:
+                time.sleep(HANGUP_POLL)  # the host hasn't the port open
+                continue
+            break
+        if not chunk:
+            break
+        now = time.perf_counter()
+        if baudrate:
+            # Sleep overshoot is caught up on; a longer gap means the line was idle
+            wire_clock = max(wire_clock, now - 0.005) + len(chunk) * 10.0 / baudrate
+            if wire_clock > now:
+                time.sleep(wire_clock - now)
+            now = time.perf_counter()
+        buffer += chunk
+        while b'\n' in buffer:
+            line, buffer = buffer.split(b'\n', 1)
+            line = line.decode('utf-8', errors='replace').strip()
+            if device is not None:
+                if line:
+                    device.command(line)
+            elif binary and line.startswith('PROTO:BIN'):
+                interval = line.split(':')[2] if line.count(':') >= 2 else '500'
+                os.write(master_fd, f"PROTO:BIN:OK:{interval}\r\n".encode('utf-8'))
+            received.put((now, line))
+
+
+class FakeArduino:
+    def __init__(self, baudrate=None, binary=False, firmware=False, telemetry_hz=None,
+                 min_interval_ms=MIN_UPDATE_TIME, physics_hz=1000, link=None, boot_time=0.0):
+        self.link = link  # stable path to the pty, kept across unplug()/replug()
+        self._open_pty()
+        self.baudrate = baudrate  # if set, bytes are moved at UART speed (both directions in firmware mode)
+        self.binary = binary  # acknowledge PROTO:BIN negotiation
+        self.firmware = firmware  # emulate the firmware: replies, banner and simulated telemetry
+        self.telemetry_hz = telemetry_hz  # text telemetry rate, firmware's 2 Hz if None
+        self.min_interval_ms = min_interval_ms  # floor for PROTO:BIN:<ms>, 0 lifts it
+        self.physics_hz = physics_hz
+        self.boot_time = boot_time  # firmware mode: seconds from start()/replug() to the banner
+        self.running = False
+        self._received = []  # (perf_counter, command) for every line written by the host
+        self._context = multiprocessing.get_context('fork')
+        self._received_queue = self._context.Queue()
+        self._sent = self._context.Array('Q', 3, lock=False)  # telemetry items, other lines, bytes sent to the host
+        self._write_lock = threading.Lock()
+
+    def _open_pty(self):
+        self.master_fd, slave_fd = os.openpty()
+        tty.setraw(self.master_fd)
+        self.tty = os.ttyname(slave_fd)
+        os.close(slave_fd)  # only the host holds it, so the device can tell when it opens the port
+        self.port = self.tty
+        if self.link:
+            temporary = self.link + '.new'
+            os.symlink(self.tty, temporary)
+            os.replace(temporary, self.link)
+            self.port = self.link
+
+    @property
+    def received(self):
+        while True:
+            try:
+                self._received.append(self._received_queue.get_nowait())
+            except Empty:
+                return self._received
+
+    @property
+    def sent(self):
+        """Telemetry lines or frames, other lines (banner, replies) and bytes the firmware emulation has sent"""
+        telemetry, lines, size = self._sent
+        return {'telemetry': telemetry, 'lines': lines, 'bytes': size}
+
+    def start(self):
+        self.running = True
+        firmware = None
+        if self.firmware:
+            firmware = {'telemetry_hz': self.telemetry_hz, 'min_interval_ms': self.min_interval_ms,
+                        'physics_hz': self.physics_hz, 'counters': self._sent}
+        self.reader = self._context.Process(
+            target=_reader_process,
+            args=(self.master_fd, self.baudrate, self._received_queue, self.binary, firmware, self.boot_time),
+            daemon=True)
+        self.reader.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.received  # collect what the reader reported before it goes away
+        if self.reader.is_alive():
+            self.reader.terminate()
+            self.reader.join(timeout=1.0)
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+        if self.link and os.path.lexists(self.link):
+            os.unlink(self.link)
+
+    def unplug(self):
+        """Pull the cable: the host's reads fail (EIO) and the port's path disappears"""
+        self.stop()
+
+    def replug(self):
+        """Plug back in: a fresh pty behind the same link, booting with the banner in firmware mode"""
+        self._open_pty()
+        return self.start()
+
+    def write_line(self, line):
+        """Send one line to the host as the firmware's Serial.println would"""
+        data = (line + '\r\n').encode('utf-8')
+        with self._write_lock:
+            os.write(self.master_fd, data)
+
+    def write_bytes(self, data):
+        """Send raw bytes to the host, e.g. a binary telemetry frame"""
+        with self._write_lock:
+            os.write(self.master_fd, data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Arduino on a pseudo-terminal')
+    parser.add_argument('--telemetry-hz', type=float, help='Text telemetry rate (firmware default 2 Hz)')
+    parser.add_argument('--baud', type=int, help='Limit both directions to this baud rate')
+    parser.add_argument('--min-interval-ms', type=int, default=MIN_UPDATE_TIME,
+                        help='Fastest PROTO:BIN interval accepted, 0 for no limit')
+    args = parser.parse_args()
+
+    device = FakeArduino(baudrate=args.baud, firmware=True, telemetry_hz=args.telemetry_hz,
+                         min_interval_ms=args.min_interval_ms).start()
+    print(f"Fake Arduino on {device.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.stop()
+        print(f"Sent {device.sent}, received {len(device.received)} commands")
+
+
+if __name__ == '__main__':
+    main()
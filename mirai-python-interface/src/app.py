@@ -1,105 +1,194 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 import threading
 import time
 import signal
 import sys
 from motor_controller import MotorController
+from replay_source import ReplaySource
+from fleet import FleetManager
+from metrics import MetricsRegistry, render, track_requests, CONTENT_TYPE
 import argparse
 
 app = Flask(__name__)
 
+# Web metrics (per-route latency); /metrics also renders the motor controller's registry
+metrics = MetricsRegistry()
+track_requests(app, metrics)
+
 # Global variables
-motor_controller = None
+motor_controller = None  # the single robot, or the fleet's first one
+fleet = None  # fleet.FleetManager when started with --fleet
 running = True
 
+def get_controller(robot_id=None):
+    """Controller for /robots/<robot_id>/..., or the default one for the routes without it"""
+    if robot_id is None:
+        return motor_controller
+    return fleet.get(robot_id) if fleet else None
+
+def missing_controller(robot_id=None):
+    if robot_id is None:
+        return jsonify({'error': 'Motor controller not initialized'})
+    return jsonify({'error': f'Unknown robot: {robot_id}'}), 404
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/status')
-def get_status():
-    if motor_controller:
-        return jsonify(motor_controller.get_status())
-    return jsonify({'error': 'Motor controller not initialized'})
+@app.route('/robots/<robot_id>/status')
+def get_status(robot_id=None):
+    controller = get_controller(robot_id)
+    if controller:
+        return jsonify(controller.get_status())
+    return missing_controller(robot_id)
 
 @app.route('/command', methods=['POST'])
-def send_command():
-    if not motor_controller:
-        return jsonify({'error': 'Motor controller not initialized'})
+@app.route('/robots/<robot_id>/command', methods=['POST'])
+def send_command(robot_id=None):
+    received_at = time.perf_counter()
+    controller = get_controller(robot_id)
+    if not controller:
+        return missing_controller(robot_id)
     
     command = request.json.get('command')
     params = request.json.get('params', {})
     
     try:
-        if command == 'forward':
-            motor_controller.set_direction('both', 'FORWARD')
-        elif command == 'reverse':
-            motor_controller.set_direction('both', 'REVERSE')
-        elif command == 'stop':
-            motor_controller.stop_motors()
-        elif command == 'coast':
-            motor_controller.coast_motors()
-        elif command == 'emergency':
-            motor_controller.emergency_stop()
-        elif command == 'clear':
-            motor_controller.clear_emergency()
-        elif command == 'softbrake':
-            motor_controller.activate_soft_brake()
-        elif command == 'hardbrake':
-            motor_controller.activate_hard_brake()
-        elif command == 'speed':
-            left_speed = params.get('left', 0)
-            right_speed = params.get('right', 0)
-            motor_controller.set_speed('left', left_speed)
-            motor_controller.set_speed('right', right_speed)
-        elif command == 'both_speed':
-            speed = params.get('speed', 0)
-            motor_controller.set_both_speeds(speed)
-        else:
-            return jsonify({'error': 'Unknown command'})
+        # Commands sent inside the block are traced from this point (see /latency)
+        with controller.command_tracer.request(received_at):
+            if command == 'forward':
+                controller.set_direction('both', 'FORWARD')
+            elif command == 'reverse':
+                controller.set_direction('both', 'REVERSE')
+            elif command == 'stop':
+                controller.stop_motors()
+            elif command == 'coast':
+                controller.coast_motors()
+            elif command == 'emergency':
+                controller.emergency_stop()
+            elif command == 'clear':
+                controller.clear_emergency()
+            elif command == 'softbrake':
+                controller.activate_soft_brake()
+            elif command == 'hardbrake':
+                controller.activate_hard_brake()
+            elif command == 'speed':
+                left_speed = params.get('left', 0)
+                right_speed = params.get('right', 0)
+                controller.set_speed('left', left_speed)
+                controller.set_speed('right', right_speed)
+            elif command == 'both_speed':
+                speed = params.get('speed', 0)
+                controller.set_both_speeds(speed)
+            else:
+                return jsonify({'error': 'Unknown command'})
         
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)})
 
+@app.route('/stream')
+@app.route('/robots/<robot_id>/stream')
+def stream(robot_id=None):
+    """Server-Sent Events push of status and new history samples; ?rate= caps pushes per second"""
+    controller = get_controller(robot_id)
+    if not controller:
+        return missing_controller(robot_id)
+    rate = request.args.get('rate', type=float)
+    return Response(controller.telemetry_stream.subscribe(rate), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/history')
-def get_history():
+@app.route('/robots/<robot_id>/history')
+def get_history(robot_id=None):
+    controller = get_controller(robot_id)
+    if controller:
+        # ?since=<cursor> returns only the samples added after that cursor
+        since = request.args.get('since', type=int)
+        if since is not None or 'since' in request.args:
+            return jsonify(controller.get_history_since(since))
+        return jsonify(controller.get_history())
+    return missing_controller(robot_id)
+
+@app.route('/latency')
+@app.route('/robots/<robot_id>/latency')
+def get_latency(robot_id=None):
+    """Command latency histograms per stage (request, queue, reply, telemetry) and recent traces"""
+    controller = get_controller(robot_id)
+    if controller:
+        return jsonify(controller.command_tracer.get_stats())
+    return missing_controller(robot_id)
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus scrape endpoint: HTTP, serial, parser, queue and command latency metrics (robot="<id>" in a fleet)"""
+    if fleet:
+        text = render(metrics, fleet.metrics, label='robot',
+                      grouped={robot_id: controller.metrics for robot_id, controller in fleet.controllers.items()})
+    else:
+        text = render(metrics, motor_controller.metrics if motor_controller else None)
+    return Response(text, content_type=CONTENT_TYPE)
+
+@app.route('/robots')
+def list_robots():
+    """Robot IDs with their connection and emergency-stop state"""
+    if fleet:
+        return jsonify(fleet.get_status())
     if motor_controller:
-        return jsonify(motor_controller.get_history())
-    return jsonify({'error': 'Motor controller not initialized'})
+        return jsonify({})
+    return missing_controller()
 
 @app.route('/diagnostics')
-def get_diagnostics():
-    if motor_controller:
-        motor_controller.print_diagnostics()
+@app.route('/robots/<robot_id>/diagnostics')
+def get_diagnostics(robot_id=None):
+    controller = get_controller(robot_id)
+    if controller:
+        controller.print_diagnostics()
         return jsonify({'success': True})
-    return jsonify({'error': 'Motor controller not initialized'})
+    return missing_controller(robot_id)
 
 @app.route('/save_data')
-def save_data():
-    if motor_controller:
-        filename = motor_controller.save_data()
+@app.route('/robots/<robot_id>/save_data')
+def save_data(robot_id=None):
+    controller = get_controller(robot_id)
+    if controller:
+        filename = controller.save_data()
         if filename:
             return jsonify({'success': True, 'filename': filename})
         return jsonify({'error': 'Failed to save data'})
-    return jsonify({'error': 'Motor controller not initialized'})
+    return missing_controller(robot_id)
 
 def signal_handler(sig, frame):
     """Handle graceful shutdown on SIGINT"""
     print("\nShutting down gracefully...")
     global running, motor_controller
     running = False
-    if motor_controller:
-        motor_controller.stop()
+    stop_controllers()
     sys.exit(0)
 
-def start_motor_controller(config_path, simulate=False, port=None):
+def start_motor_controller(config_path, simulate=False, port=None, source=None):
     """Initialize and start the motor controller"""
     global motor_controller
-    motor_controller = MotorController(config_path, simulate=simulate)
+    overrides = {'serial': {'port': port}} if port else None
+    motor_controller = MotorController(config_path, simulate=simulate, source=source, overrides=overrides)
     motor_controller.start()
     print("Motor controller started" + (" in simulation mode" if simulate else ""))
 
+def start_fleet(config_path, simulate=False):
+    """Start every robot in the config's fleet section on one shared I/O loop"""
+    global motor_controller, fleet
+    fleet = FleetManager(config_path, simulate=simulate)
+    fleet.start()
+    motor_controller = fleet.default()
+    print(f"Fleet started: {', '.join(fleet.controllers)}" + (" in simulation mode" if simulate else ""))
+
+def stop_controllers():
+    if fleet:
+        fleet.stop()
+    elif motor_controller:
+        motor_controller.stop()
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='MIRAI Motor Control Web Interface')
     parser.add_argument('--config', default='config/settings.yaml', help='Config file path')
@@ -107,13 +196,21 @@ if __name__ == '__main__':
     parser.add_argument('--port', help='Specify serial port (e.g., COM5)')
     parser.add_argument('--host', default='127.0.0.1', help='Flask host address')
     parser.add_argument('--flask-port', default=5000, type=int, help='Flask port number')
+    parser.add_argument('--replay', help='Replay a recording (.lines.gz, .mrec, JSON export or segment directory) instead of the serial port')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='Replay speed factor, 0 for as fast as possible')
+    parser.add_argument('--replay-loop', action='store_true', help='Restart the replay when it reaches the end')
+    parser.add_argument('--fleet', action='store_true', help='Serve every robot in the config\'s fleet section at /robots/<id>/...')
     args = parser.parse_args()
     
     # Setup signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
     
     # Start motor controller
-    start_motor_controller(args.config, args.simulate, args.port)
+    if args.fleet:
+        start_fleet(args.config, args.simulate)
+    else:
+        source = ReplaySource(args.replay, args.replay_speed, args.replay_loop) if args.replay else None
+        start_motor_controller(args.config, args.simulate, args.port, source)
     
     # Start Flask app
     try:
@@ -121,5 +218,4 @@ if __name__ == '__main__':
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
-        if motor_controller:
-            motor_controller.stop()
\ No newline at end of file
+        stop_controllers()
\ No newline at end of file
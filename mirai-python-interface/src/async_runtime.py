@@ -0,0 +1,564 @@
+# async_runtime.py
+"""asyncio runtime: serial I/O, parsing, history and the web server on one event loop
+
+An alternative to the thread-per-task model: SerialInterface's read and
+write threads, MotorController's 10 ms update loop and a Flask thread per
+request. AsyncSerialLoop services MotorControllers from an asyncio loop as
+fleet.SerialEventLoop does from its own thread:
+- loop.add_reader() watches each port's descriptor; the port is read
+  without blocking and items reach the history as soon as they arrive
+- send_command() wakes the loop with call_soon_threadsafe() and the
+  commands are written right away, paced to the wire with call_later()
+- data sources (simulate, replay) are polled
+MotorController.start(loop) and the rest of its API are unchanged, so
+main.py's CLI can drive a controller whose I/O runs on this loop's thread.
+
+AsyncWebServer is a small HTTP/1.1 server on asyncio streams. It serves
+the JSON routes of app.py (/status, /command, /history, /latency,
+/metrics, /robots and /robots/<id>/...), Server-Sent Events at /stream
+and the same telemetry frames over a WebSocket at /ws. It needs no
+packages beyond the standard library.
+
+    python src/async_runtime.py [--simulate] [--fleet] [--host 127.0.0.1] [--http-port 5000]
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import parse_qs
+import serial
+from fleet import FleetManager, SerialEventLoop
+from metrics import MetricsRegistry, render, CONTENT_TYPE
+from motor_controller import MotorController
+from replay_source import ReplaySource
+from serial_reconnect import PLUG_POLL_INTERVAL, port_present
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+SSE_HEADERS = [('Content-Type', 'text/event-stream'), ('Cache-Control', 'no-cache'), ('X-Accel-Buffering', 'no')]
+REASONS = {101: 'Switching Protocols', 200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large'}
+# Largest request body and WebSocket frame payload a client may send (commands and pings are tiny)
+MAX_BODY_SIZE = 64 * 1024
+MAX_WEBSOCKET_PAYLOAD = 64 * 1024
+WEBSOCKET_TOO_BIG = 1009  # close status: message too big
+
+# app.py's /command vocabulary
+COMMANDS = {
+    'forward': lambda controller, params: controller.set_direction('both', 'FORWARD'),
+    'reverse': lambda controller, params: controller.set_direction('both', 'REVERSE'),
+    'stop': lambda controller, params: controller.stop_motors(),
+    'coast': lambda controller, params: controller.coast_motors(),
+    'emergency': lambda controller, params: controller.emergency_stop(),
+    'clear': lambda controller, params: controller.clear_emergency(),
+    'softbrake': lambda controller, params: controller.activate_soft_brake(),
+    'hardbrake': lambda controller, params: controller.activate_hard_brake(),
+    'speed': lambda controller, params: (controller.set_speed('left', params.get('left', 0)),
+                                         controller.set_speed('right', params.get('right', 0))),
+    'both_speed': lambda controller, params: controller.set_both_speeds(params.get('speed', 0))
+}
+
+
+class AsyncSerialLoop:
+    """Serial ports and data sources of MotorControllers, serviced from an asyncio event loop
+
+    Pass a running loop to share it (e.g. with AsyncWebServer); otherwise
+    start() runs a new loop on its own thread.
+    """
+
+    def __init__(self, loop=None, poll_interval=0.01):
+        self.loop = loop
+        self.poll_interval = poll_interval
+        self.thread = None
+        self.running = False
+        self.wakeups = 0  # reader, writer and poll callbacks run, for the fleet metrics
+        self._tasks = {}  # controller -> task connecting it, or polling its data source
+        self._fds = {}  # controller -> descriptor registered with add_reader()
+        self._timers = {}  # controller -> call_later() handle of its next write batch
+        self._active = set()
+
+    can_service = staticmethod(SerialEventLoop.can_service)
+
+    def start(self):
+        self.running = True
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run_forever, args=(started,), name='asyncio-runtime', daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def _run_forever(self, started):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(started.set)
+        self.loop.run_forever()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2.0)
+            self.loop.close()
+
+    def call(self, function):
+        """Run function on the loop and return its result, from any thread"""
+        if self.thread is None or threading.current_thread() is self.thread or self._in_loop():
+            return function()
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                future.set_result(function())
+            except Exception as e:
+                future.set_exception(e)
+        self.loop.call_soon_threadsafe(run)
+        return future.result(timeout=2.0)
+
+    def _in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def add(self, controller):
+        interface = controller.serial_interface
+        interface.command_queue.listener = lambda: self.loop.call_soon_threadsafe(self._write, controller)
+        self.loop.call_soon_threadsafe(self._attach, controller)
+
+    def remove(self, controller):
+        """Stop servicing a controller, before its port is closed"""
+        controller.serial_interface.command_queue.listener = None
+        if self.running and not self.loop.is_closed():
+            self.call(lambda: self._detach(controller))
+
+    def _attach(self, controller):
+        self._tasks[controller] = self.loop.create_task(self._connect(controller))
+
+    async def _connect(self, controller):
+        interface = controller.serial_interface
+        if interface.source is not None:
+            interface.connect()  # only logs the data source
+            interface.running = True
+            self._register(controller)
+            while True:
+                self.wakeups += 1
+                try:
+                    if interface.read_available():
+                        controller.process_pending()
+                except Exception as e:
+                    print(f"Error in asyncio runtime: {e}")
+                await asyncio.sleep(self.poll_interval)
+        # connect() waits for the board's banner, so it runs on the default executor;
+        # the backoff between attempts is a sleep on the loop, holding no thread
+        while self.running and controller.running:
+            if await self.loop.run_in_executor(None, interface.connect):
+                if not controller.running:
+                    interface.stop()
+                    return
+                interface.running = True
+                self._fds[controller] = interface.serial_conn.fileno()
+                self.loop.add_reader(self._fds[controller], self._read, controller)
+                self._register(controller)
+                return
+            await self._backoff(interface)
+
+    async def _backoff(self, interface):
+        """Sleep the backoff delay, cut short when a missing port is plugged back in"""
+        deadline = self.loop.time() + interface.reconnect_delay()
+        port = interface.config['serial']['port']
+        missing = not port_present(port)  # there but failed to open: just wait out the delay
+        step = PLUG_POLL_INTERVAL if missing else float('inf')
+        while self.loop.time() < deadline:
+            await asyncio.sleep(min(step, deadline - self.loop.time()))
+            if missing and port_present(port):
+                interface.backoff.reset()
+                return
+
+    def _register(self, controller):
+        self._active.add(controller)
+        controller.update_connection_status()
+        controller.process_pending()  # banner and early telemetry from connect()
+        self._write(controller)  # commands queued while connecting
+
+    def _detach(self, controller):
+        self._active.discard(controller)
+        task = self._tasks.pop(controller, None)
+        if task is not None:
+            task.cancel()
+        fd = self._fds.pop(controller, None)
+        if fd is not None:
+            self.loop.remove_reader(fd)
+        timer = self._timers.pop(controller, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _read(self, controller):
+        self.wakeups += 1
+        try:
+            if controller.serial_interface.read_available(readable=True):
+                controller.process_pending()
+        except (serial.SerialException, OSError) as e:
+            self._lost(controller, e)
+
+    def _write(self, controller):
+        timer = self._timers.pop(controller, None)
+        if timer is not None:
+            timer.cancel()
+        if controller not in self._active:
+            return  # stays queued until the port is open
+        self.wakeups += 1
+        interface = controller.serial_interface
+        try:
+            while True:
+                due = interface.write_pending()
+                if due is None:
+                    return
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._timers[controller] = self.loop.call_later(delay, self._write, controller)
+                    return
+        except (serial.SerialException, OSError) as e:
+            if interface.source is None:
+                self._lost(controller, e)
+
+    def _lost(self, controller, error):
+        """A port failed: stop watching it, close it and reconnect"""
+        self._detach(controller)
+        if not controller.serial_interface.link_lost(error):
+            return
+        controller.update_connection_status()
+        self._attach(controller)
+
+
+class AsyncWebServer:
+    """app.py's routes, /stream and a /ws WebSocket on asyncio streams"""
+
+    def __init__(self, motor_controller, fleet=None):
+        self.motor_controller = motor_controller
+        self.fleet = fleet
+        self.server = None
+        self.metrics = MetricsRegistry()
+        self.latency = self.metrics.histogram('mirai_http_request_duration_seconds',
+                                              'Time to build each response by route (for /stream and /ws, '
+                                              'until the stream opens)', 'route')
+        self.routes = {
+            '/': self.index, '/status': self.get_status, '/command': self.send_command,
+            '/history': self.get_history, '/latency': self.get_latency, '/metrics': self.get_metrics,
+            '/robots': self.list_robots, '/diagnostics': self.get_diagnostics, '/save_data': self.save_data,
+            '/stream': self.stream, '/ws': self.websocket
+        }
+        with open(INDEX_PATH, 'rb') as f:
+            self.index_html = f.read()
+
+    async def start(self, host='127.0.0.1', port=5000):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def get_controller(self, robot_id=None):
+        if robot_id is None:
+            return self.motor_controller
+        return self.fleet.get(robot_id) if self.fleet else None
+
+    async def _handle(self, reader, writer):
+        """One connection: requests are answered in turn while the client keeps it alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_SIZE:
+                    # The body is left unread, so the connection can't carry another request
+                    await self._send(writer, *self._json({'error': f'Body over {MAX_BODY_SIZE} bytes'}, 413))
+                    break
+                body = await reader.readexactly(length)
+                started = time.perf_counter()
+                path, _, query = target.partition('?')
+                request = {'method': method, 'headers': headers, 'body': body,
+                           'args': {key: values[-1] for key, values in parse_qs(query, keep_blank_values=True).items()},
+                           'reader': reader, 'writer': writer, 'received_at': started}
+                keep_alive = await self._dispatch(path, request)
+                if not keep_alive or version == 'HTTP/1.0' or headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, path, request):
+        robot_id, rule = None, path
+        parts = path.split('/')
+        if len(parts) == 4 and parts[1] == 'robots' and parts[2]:
+            robot_id, path = parts[2], '/' + parts[3]
+            rule = f'/robots/<robot_id>{path}'
+        handler = self.routes.get(path)
+        if handler is None or (robot_id is not None and path in ('/', '/robots', '/metrics')):
+            response = self._json({'error': 'Not found'}, 404)
+            rule = 'unmatched'
+        else:
+            response = await handler(request, robot_id)
+        keep_alive = True
+        if response is not None:  # streams have written their own headers
+            keep_alive = await self._send(request['writer'], *response)
+        self.latency.child(rule).observe(time.perf_counter() - request['received_at'])
+        return keep_alive and response is not None
+
+    async def _send(self, writer, status, body, content_type):
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+        return True
+
+    def _json(self, value, status=200):
+        return status, json.dumps(value, default=_json_default).encode('utf-8'), 'application/json'
+
+    def _missing(self, robot_id):
+        if robot_id is None:
+            return self._json({'error': 'Motor controller not initialized'})
+        return self._json({'error': f'Unknown robot: {robot_id}'}, 404)
+
+    async def index(self, request, robot_id):
+        return 200, self.index_html, 'text/html; charset=utf-8'
+
+    async def get_status(self, request, robot_id):
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        return self._json(controller.get_status())
+
+    async def send_command(self, request, robot_id):
+        if request['method'] != 'POST':
+            return self._json({'error': 'Method not allowed'}, 405)
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        try:
+            data = json.loads(request['body'] or b'{}')
+            action = COMMANDS.get(data.get('command'))
+            if action is None:
+                return self._json({'error': 'Unknown command'})
+            # Commands sent inside the block are traced from this point (see /latency)
+            with controller.command_tracer.request(request['received_at']):
+                action(controller, data.get('params', {}))
+            return self._json({'success': True})
+        except Exception as e:
+            return self._json({'error': str(e)})
+
+    async def get_history(self, request, robot_id):
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        args = request['args']
+        if 'since' in args:
+            since = int(args['since']) if args['since'].isdigit() else None
+            return self._json(controller.get_history_since(since))
+        return self._json(controller.get_history())
+
+    async def get_latency(self, request, robot_id):
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        return self._json(controller.command_tracer.get_stats())
+
+    async def get_metrics(self, request, robot_id):
+        if self.fleet:
+            text = render(self.metrics, self.fleet.metrics, label='robot',
+                          grouped={robot: controller.metrics for robot, controller in self.fleet.controllers.items()})
+        else:
+            text = render(self.metrics, self.motor_controller.metrics if self.motor_controller else None)
+        return 200, text.encode('utf-8'), CONTENT_TYPE
+
+    async def list_robots(self, request, robot_id):
+        return self._json(self.fleet.get_status() if self.fleet else {})
+
+    async def get_diagnostics(self, request, robot_id):
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        controller.print_diagnostics()
+        return self._json({'success': True})
+
+    async def save_data(self, request, robot_id):
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        # File I/O off the event loop
+        filename = await asyncio.get_running_loop().run_in_executor(None, controller.save_data)
+        if filename:
+            return self._json({'success': True, 'filename': filename})
+        return self._json({'error': 'Failed to save data'})
+
+    async def stream(self, request, robot_id):
+        """Server-Sent Events push of status and new history samples; ?rate= caps pushes per second"""
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        writer = request['writer']
+        rate = request['args'].get('rate')
+        head = 'HTTP/1.1 200 OK\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in SSE_HEADERS)
+        writer.write((head + 'Connection: close\r\n\r\n').encode('latin-1'))
+        self.latency.child('/stream' if robot_id is None else '/robots/<robot_id>/stream').observe(
+            time.perf_counter() - request['received_at'])
+        subscription = controller.telemetry_stream.subscribe_async(float(rate) if rate else None)
+        try:
+            async for chunk in subscription:
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            await subscription.aclose()
+        return None
+
+    async def websocket(self, request, robot_id):
+        """The /stream frames' JSON as WebSocket text messages, pings while idle"""
+        controller = self.get_controller(robot_id)
+        if not controller:
+            return self._missing(robot_id)
+        key = request['headers'].get('sec-websocket-key')
+        if request['headers'].get('upgrade', '').lower() != 'websocket' or not key:
+            return self._json({'error': 'WebSocket upgrade required'}, 400)
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('latin-1')).digest()).decode('latin-1')
+        writer = request['writer']
+        writer.write(('HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                      f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        rate = request['args'].get('rate')
+        sender = asyncio.ensure_future(self._websocket_send(writer, controller, float(rate) if rate else None))
+        receiver = asyncio.ensure_future(self._websocket_receive(request['reader'], writer))
+        try:
+            await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sender, receiver):
+                task.cancel()
+        return None
+
+    async def _websocket_send(self, writer, controller, rate):
+        subscription = controller.telemetry_stream.subscribe_async(rate)
+        try:
+            async for chunk in subscription:
+                data = chunk.find(b'data: ')
+                # SSE keepalive comments become pings
+                writer.write(_websocket_frame(chunk[data + 6:-2]) if data != -1 else _websocket_frame(b'', 0x9))
+                await writer.drain()
+        finally:
+            await subscription.aclose()
+
+    async def _websocket_receive(self, reader, writer):
+        """Answer pings and return on a close frame or a dropped connection"""
+        while True:
+            first, second = await reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length = int.from_bytes(await reader.readexactly(2), 'big')
+            elif length == 127:
+                length = int.from_bytes(await reader.readexactly(8), 'big')
+            if length > MAX_WEBSOCKET_PAYLOAD:
+                writer.write(_websocket_frame(WEBSOCKET_TOO_BIG.to_bytes(2, 'big'), 0x8))
+                await writer.drain()
+                return
+            mask = await reader.readexactly(4) if second & 0x80 else None
+            payload = await reader.readexactly(length)
+            if mask:
+                payload = _unmask(payload, mask)
+            if opcode == 0x8:
+                writer.write(_websocket_frame(payload[:2], 0x8))
+                await writer.drain()
+                return
+            if opcode == 0x9:
+                writer.write(_websocket_frame(payload, 0xA))
+
+
+def _websocket_frame(payload, opcode=0x1):
+    """Unmasked server-to-client frame"""
+    size = len(payload)
+    if size < 126:
+        header = bytes((0x80 | opcode, size))
+    elif size < 65536:
+        header = bytes((0x80 | opcode, 126)) + size.to_bytes(2, 'big')
+    else:
+        header = bytes((0x80 | opcode, 127)) + size.to_bytes(8, 'big')
+    return header + payload
+
+
+def _unmask(payload, mask):
+    """XOR a client frame's payload with its 4-byte mask, as one integer operation"""
+    size = len(payload)
+    key = (mask * (size // 4 + 1))[:size]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(size, 'big')
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        # As Flask's jsonify writes dates (naive values are taken as UTC)
+        return format_datetime(value.replace(tzinfo=value.tzinfo or timezone.utc), usegmt=True)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def serve(args):
+    serial_loop = AsyncSerialLoop(asyncio.get_running_loop())
+    fleet = None
+    if args.fleet:
+        fleet = FleetManager(args.config, simulate=args.simulate, loop=serial_loop)
+        fleet.start()
+        controller = fleet.default()
+    else:
+        source = ReplaySource(args.replay, args.replay_speed, args.replay_loop) if args.replay else None
+        overrides = {'serial': {'port': args.port}} if args.port else None
+        controller = MotorController(args.config, simulate=args.simulate, source=source, overrides=overrides)
+        serial_loop.start()
+        controller.start(serial_loop)
+    server = AsyncWebServer(controller, fleet)
+    await server.start(args.host, args.http_port)
+    print(f"Serving on http://{args.host}:{args.http_port} (asyncio runtime)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        if fleet:
+            fleet.stop()
+        else:
+            controller.stop()
+            serial_loop.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MIRAI Motor Control Web Interface (asyncio runtime)')
+    parser.add_argument('--config', default='config/settings.yaml', help='Config file path')
+    parser.add_argument('--simulate', action='store_true', help='Run in simulation mode (no serial)')
+    parser.add_argument('--port', help='Specify serial port (e.g., COM5)')
+    parser.add_argument('--host', default='127.0.0.1', help='HTTP host address')
+    parser.add_argument('--http-port', default=5000, type=int, help='HTTP port number')
+    parser.add_argument('--replay', help='Replay a recording (.lines.gz, .mrec, JSON export or segment directory) instead of the serial port')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='Replay speed factor, 0 for as fast as possible')
+    parser.add_argument('--replay-loop', action='store_true', help='Restart the replay when it reaches the end')
+    parser.add_argument('--fleet', action='store_true', help='Serve every robot in the config\'s fleet section at /robots/<id>/...')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+
+
+if __name__ == '__main__':
+    main()
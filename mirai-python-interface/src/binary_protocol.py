@@ -0,0 +1,140 @@
+# binary_protocol.py
+"""Binary telemetry frames negotiated with the firmware's PROTO:BIN command
+
+Frame: 0xAA 0x55 | length | payload[length] | CRC16 little-endian, where the
+CRC is CRC-16/CCITT-FALSE over length and payload (binascii.crc_hqx with
+0xFFFF). The layout mirrors writeTelemetryFrame() in the firmware's
+motor_control.cpp; see communication.h there for the field list.
+
+Command replies stay text, so the link carries both. Frames are only ever
+written between complete lines, which lets FrameReader tell them apart by
+looking at the first two bytes of each record.
+"""
+import binascii
+import struct
+
+from telemetry_parser import TelemetryRecord
+
+SYNC = b'\xaa\x55'
+FRAME_TELEMETRY = 0x01
+
+# Telemetry payload: type, sequence, flags, millis, then per motor
+# speed, target, direction, braking, pulses, rpm x10, mph x100, kph x100
+_TELEMETRY = struct.Struct('<BBBI' + 'BBBBhHHH' * 2)
+TELEMETRY_PAYLOAD_SIZE = _TELEMETRY.size
+# The only length a frame can carry (the telemetry payload, type byte included)
+FRAME_LENGTH = TELEMETRY_PAYLOAD_SIZE
+
+DIRECTIONS = ('STOPPED', 'FORWARD', 'REVERSE', 'COASTING')
+_DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+
+FLAG_EMERGENCY = 0x01
+FLAG_SOFT_BRAKE = 0x02
+FLAG_HARD_BRAKE = 0x04
+FLAG_ROS = 0x08
+
+# Negotiation: PROTO:BIN[:<interval ms>] is answered with PROTO:BIN:OK:<interval>
+PROTO_BINARY = 'PROTO:BIN'
+PROTO_TEXT = 'PROTO:TEXT'
+PROTO_BINARY_OK = 'PROTO:BIN:OK'
+
+_new = tuple.__new__
+
+
+def crc16(data):
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_frame(payload):
+    """Wrap a payload in sync bytes, length and CRC"""
+    body = bytes([len(payload)]) + payload
+    return SYNC + body + struct.pack('<H', crc16(body))
+
+
+def encode_telemetry(record, sequence=0, millis=0):
+    """Build a telemetry frame from a TelemetryRecord, as the firmware would"""
+    flags = ((FLAG_EMERGENCY if record.emergency_stop else 0) |
+             (FLAG_SOFT_BRAKE if record.soft_brake else 0) |
+             (FLAG_HARD_BRAKE if record.hard_brake else 0))
+    values = [FRAME_TELEMETRY, sequence & 0xFF, flags, millis & 0xFFFFFFFF]
+    for side in ('left', 'right'):
+        values += [
+            getattr(record, f'{side}_speed'), getattr(record, f'{side}_target'),
+            _DIRECTION_CODES.get(getattr(record, f'{side}_direction'), 0),
+            int(getattr(record, f'{side}_braking')), getattr(record, f'{side}_pulses'),
+            round(getattr(record, f'{side}_rpm') * 10), round(getattr(record, f'{side}_mph') * 100),
+            round(getattr(record, f'{side}_kph') * 100)
+        ]
+    return encode_frame(_TELEMETRY.pack(*values))
+
+
+def decode_telemetry(payload):
+    (_, sequence, flags, millis,
+     l_speed, l_target, l_direction, l_braking, l_pulses, l_rpm, l_mph, l_kph,
+     r_speed, r_target, r_direction, r_braking, r_pulses, r_rpm, r_mph, r_kph) = _TELEMETRY.unpack(payload)
+    return _new(TelemetryRecord, (
+        sequence, millis,
+        bool(flags & FLAG_EMERGENCY), bool(flags & FLAG_SOFT_BRAKE), bool(flags & FLAG_HARD_BRAKE),
+        l_speed, l_target, DIRECTIONS[l_direction] if l_direction < 4 else 'STOPPED', bool(l_braking),
+        l_pulses, l_rpm / 10.0, l_mph / 100.0, l_kph / 100.0,
+        r_speed, r_target, DIRECTIONS[r_direction] if r_direction < 4 else 'STOPPED', bool(r_braking),
+        r_pulses, r_rpm / 10.0, r_mph / 100.0, r_kph / 100.0
+    ))
+
+
+class FrameReader:
+    """Split a mixed byte stream into text lines and decoded telemetry records"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.bad_frames = 0  # bad lengths, CRC mismatches and unknown frame types
+
+    def feed(self, data):
+        """Add received bytes; return the complete lines (str) and records decoded so far"""
+        buffer = self.buffer
+        buffer += data
+        items = []
+        position = 0
+        size = len(buffer)
+        while position < size:
+            if buffer[position] == 0xAA and (position + 1 == size or buffer[position + 1] == 0x55):
+                if position + 3 > size:
+                    break  # need the length byte
+                if buffer[position + 2] != FRAME_LENGTH:
+                    # Corrupt length (or a stray 0xAA 0x55): step past the sync and let
+                    # the line scan below re-lock on the next sync or line break
+                    self.bad_frames += 1
+                    position += 1
+                    continue
+                end = position + 3 + FRAME_LENGTH + 2
+                if end > size:
+                    break
+                body = bytes(buffer[position + 2:end - 2])
+                if crc16(body) != buffer[end - 2] | (buffer[end - 1] << 8):
+                    # Unverified: the frame may be shorter than its length claims, so
+                    # resynchronise from the next byte rather than skipping `end`
+                    self.bad_frames += 1
+                    position += 1
+                    continue
+                if body[1] == FRAME_TELEMETRY:
+                    items.append(decode_telemetry(body[1:]))
+                    self.frames += 1
+                else:
+                    self.bad_frames += 1  # intact frame of a type this host doesn't know
+                position = end
+                continue
+            newline = buffer.find(b'\n', position)
+            sync = buffer.find(SYNC, position, newline if newline != -1 else size)
+            if sync != -1:
+                position = sync  # garbage before a frame with no line break in between
+                continue
+            if newline == -1:
+                break
+            line = buffer[position:newline].decode('utf-8', errors='replace').strip()
+            if line:
+                items.append(line)
+            position = newline + 1
+        del buffer[:position]
+        return items
+
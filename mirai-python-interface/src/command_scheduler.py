@@ -0,0 +1,133 @@
+# command_scheduler.py
+import threading
+import time
+from collections import deque
+
+# Transmit lanes, lowest number is sent first
+PRIORITY_EMERGENCY = 0
+PRIORITY_NORMAL = 1
+
+# Commands that ride the emergency lane
+FAST_LANE_COMMANDS = frozenset(['E', 'EMERGENCY', 'S', 'STOP', 'HARDBRAKE', 'HB', 'C', 'CLEAR'])
+
+# Commands that would set the motors moving again if sent after a fast-lane command
+MOTION_COMMANDS = frozenset(['F', 'FORWARD', 'R', 'REVERSE'])
+DIRECTION = 'direction'
+
+# Speed setpoint prefixes and the motors each one overwrites
+SETPOINT_TARGETS = {
+    'ML:': frozenset(['left']),
+    'MR:': frozenset(['right']),
+    'BOTH:': frozenset(['left', 'right'])
+}
+
+
+def setpoint_targets(command):
+    """Return the motors a speed setpoint command writes to, or None for other commands"""
+    for prefix, targets in SETPOINT_TARGETS.items():
+        if command.startswith(prefix):
+            return targets
+    return None
+
+
+class CommandScheduler:
+    """Multi-lane outgoing command queue for SerialInterface._write_loop
+
+    Producers call put(); the writer blocks in get_batch() on a condition
+    variable until something is queued, then takes the pending commands in
+    one go so they can be sent with a single serial write.
+
+    The emergency lane (E, S, HARDBRAKE, C) is always drained first and in
+    full. The normal lane can be capped at max_bytes per batch, which bounds
+    how much ordinary traffic an emergency command can find ahead of it on
+    the wire. Motion commands (setpoints, F/R) overtaken by a fast-lane
+    command are discarded so the motors never act on them out of order.
+
+    Speed setpoints are last-write-wins: a queued ML:/MR:/BOTH: command is
+    dropped when a newer setpoint covering the same motors arrives, so a
+    slider burst only puts its final value on the wire.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        # Emergency lane holds (command, enqueued_at); normal lane entries also
+        # carry the setpoint targets, DIRECTION for F/R, or None
+        self._lanes = {PRIORITY_EMERGENCY: deque(), PRIORITY_NORMAL: deque()}
+        self._motion_queued = 0  # motion commands currently in the normal lane
+        self.coalesced = 0  # motion commands dropped because something newer replaced them
+        self.listener = None  # called after each put(), e.g. to wake fleet.SerialEventLoop
+
+    def put(self, command, enqueued_at=None):
+        key = command.strip().upper()
+        if enqueued_at is None:
+            enqueued_at = time.perf_counter()
+        with self._condition:
+            if key in FAST_LANE_COMMANDS:
+                self._lanes[PRIORITY_EMERGENCY].append((command, enqueued_at))
+                if self._motion_queued:
+                    self._drop_motion(lambda kind: True)
+            else:
+                kind = DIRECTION if key in MOTION_COMMANDS else setpoint_targets(key)
+                if kind is not None and kind is not DIRECTION and self._motion_queued:
+                    self._drop_motion(lambda queued: queued is not DIRECTION and queued <= kind)
+                self._lanes[PRIORITY_NORMAL].append((command, enqueued_at, kind))
+                if kind is not None:
+                    self._motion_queued += 1
+            self._condition.notify()
+        if self.listener is not None:
+            self.listener()
+
+    def _drop_motion(self, superseded):
+        """Remove queued motion commands for which superseded(kind) is true"""
+        kept = deque()
+        for entry in self._lanes[PRIORITY_NORMAL]:
+            if entry[2] is not None and superseded(entry[2]):
+                self._motion_queued -= 1
+                self.coalesced += 1
+            else:
+                kept.append(entry)
+        self._lanes[PRIORITY_NORMAL] = kept
+
+    def get_batch(self, timeout=None, max_bytes=None):
+        """Wait up to timeout seconds and return (command, enqueued_at, priority) tuples
+
+        The whole emergency lane is returned first, followed by normal-lane
+        commands up to max_bytes of encoded payload (at least one command).
+        """
+        with self._condition:
+            if self.empty():
+                self._condition.wait(timeout)
+            batch = [(command, enqueued_at, PRIORITY_EMERGENCY)
+                     for command, enqueued_at in self._lanes[PRIORITY_EMERGENCY]]
+            self._lanes[PRIORITY_EMERGENCY].clear()
+
+            normal = self._lanes[PRIORITY_NORMAL]
+            size = 0
+            while normal:
+                size += len(normal[0][0]) + 1
+                if max_bytes is not None and size > max_bytes and len(batch) > 0:
+                    break
+                command, enqueued_at, kind = normal.popleft()
+                if kind is not None:
+                    self._motion_queued -= 1
+                batch.append((command, enqueued_at, PRIORITY_NORMAL))
+            return batch
+
+    def wakeup(self):
+        """Release a writer blocked in get_batch(), e.g. on shutdown"""
+        with self._condition:
+            self._condition.notify_all()
+
+    def qsize(self, priority=None):
+        if priority is not None:
+            return len(self._lanes[priority])
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def empty(self):
+        return not any(self._lanes.values())
+
+    def clear(self):
+        with self._condition:
+            for lane in self._lanes.values():
+                lane.clear()
+            self._motion_queued = 0
@@ -0,0 +1,351 @@
+# command_trace.py
+"""Per-command latency tracing from request to telemetry
+
+Every command sent through SerialInterface.send_command() gets a trace
+timestamped (perf_counter) at each stage it reaches:
+
+- received: the HTTP handler took the request (inside CommandTracer.request())
+- enqueued: send_command() put it on the command queue
+- written:  the write loop handed it to the port (or data source)
+- acked:    the firmware's reply for it was processed, e.g. "✅ Motor L
+            speed set to: 120" for ML:120, or ACK:ML:120 for ROS:ML:120
+- applied:  the first telemetry record showing its effect (new target,
+            direction, brake or emergency flag); text telemetry carries no
+            targets, so on a text-only link traces finish at the reply
+
+Replies are matched to written commands in order: the firmware handles
+commands one at a time, so a reply belongs to the oldest command still
+waiting for that reply. Commands that get no reply or telemetry within
+`timeout` seconds, or are coalesced away before reaching the wire, expire.
+Each span in STAGES (consecutive stages, plus request to reply and to
+telemetry) has its own LatencyHistogram.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds (Prometheus style, +Inf implied)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Histogram name: (from stage, to stage)
+STAGES = {
+    'http': ('received', 'enqueued'),
+    'queue': ('enqueued', 'written'),
+    'ack': ('written', 'acked'),
+    'apply': ('acked', 'applied'),
+    'round_trip': ('origin', 'acked'),  # request (or enqueue) to reply
+    'total': ('origin', 'applied')  # request (or enqueue) to telemetry
+}
+
+# Replies that reject whichever command the firmware was handling
+REJECTION_PREFIXES = ('🚨 EMERGENCY STOP ACTIVE', '❌')
+
+_REPLIES = {
+    'F': '✅ Both motors FORWARD', 'FORWARD': '✅ Both motors FORWARD',
+    'R': '✅ Both motors REVERSE', 'REVERSE': '✅ Both motors REVERSE',
+    'S': '✅ Stopping both motors', 'STOP': '✅ Stopping both motors',
+    'COAST': '✅ Motors coasting',
+    'SB': '✅ Soft brake activated', 'SOFTBRAKE': '✅ Soft brake activated',
+    'HB': '✅ Hard brake activated', 'HARDBRAKE': '✅ Hard brake activated',
+    'E': '🚨 EMERGENCY STOP ACTIVATED', 'EMERGENCY': '🚨 EMERGENCY STOP ACTIVATED',
+    'C': '✅ Emergency cleared', 'CLEAR': '✅ Emergency cleared'
+}
+
+
+def expected_reply(command):
+    """Start of the line the firmware answers `command` with, or None if it has no single reply"""
+    if command in _REPLIES:
+        return _REPLIES[command]
+    if command.startswith('ML:'):
+        return '✅ Motor L speed set to: ' + command[3:]
+    if command.startswith('MR:'):
+        return '✅ Motor R speed set to: ' + command[3:]
+    if command.startswith('BOTH:'):
+        return '✅ Both motors speed set to: ' + command[5:]
+    if command.isdigit():
+        return '✅ Both motors speed set to: ' + command
+    if command.startswith('ROS:') and command != 'ROS:STATUS' and not command.startswith('ROS:PID'):
+        return 'ACK:' + command[4:]
+    return None
+
+
+def expected_state(command):
+    """Predicate on a TelemetryRecord that is true once `command` has taken effect, or None"""
+    for prefix, sides in (('ML:', ('left',)), ('MR:', ('right',)), ('BOTH:', ('left', 'right')),
+                          ('ROS:ML:', ('left',)), ('ROS:MR:', ('right',)), ('ROS:SPEED:', ('left', 'right'))):
+        if command.startswith(prefix) and command[len(prefix):].isdigit():
+            return _targets(sides, int(command[len(prefix):]))
+    if command.isdigit():
+        return _targets(('left', 'right'), int(command))
+    if command in ('F', 'FORWARD', 'ROS:FORWARD'):
+        return lambda record: record.left_direction == 'FORWARD' and record.right_direction == 'FORWARD'
+    if command in ('R', 'REVERSE', 'ROS:REVERSE'):
+        return lambda record: record.left_direction == 'REVERSE' and record.right_direction == 'REVERSE'
+    if command in ('S', 'STOP', 'ROS:STOP', 'HB', 'HARDBRAKE', 'ROS:HARDBRAKE'):
+        return _targets(('left', 'right'), 0)
+    if command == 'COAST':
+        return lambda record: record.left_direction == 'COASTING' and record.right_direction == 'COASTING'
+    if command in ('SB', 'SOFTBRAKE', 'ROS:SOFTBRAKE'):
+        return lambda record: record.soft_brake or (record.left_target == 0 and record.right_target == 0)
+    if command in ('E', 'EMERGENCY'):
+        return lambda record: record.emergency_stop
+    if command in ('C', 'CLEAR'):
+        return lambda record: not record.emergency_stop
+    return None
+
+
+def _targets(sides, value):
+    if sides == ('left',):
+        return lambda record: record.left_target == value
+    if sides == ('right',):
+        return lambda record: record.right_target == value
+    return lambda record: record.left_target == value and record.right_target == value
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram with count, sum and max, in seconds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with (inf, count)"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket, as histogram_quantile() does"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower, below = 0.0, 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float('inf'):
+                    return self.max
+                inside = total - below
+                return min(lower + (bound - lower) * ((rank - below) / inside if inside else 1.0), self.max)
+            lower, below = bound, total
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.sum / self.count * 1000,
+            'p50_ms': self.quantile(0.5) * 1000,
+            'p90_ms': self.quantile(0.9) * 1000,
+            'p99_ms': self.quantile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+            'buckets': [['+Inf' if bound == float('inf') else bound, total] for bound, total in self.cumulative()]
+        }
+
+
+class CommandTrace:
+    """Stage timestamps of one command; a stage it never reached stays None"""
+
+    def __init__(self, command, received=None):
+        self.command = command
+        self.key = command.strip().upper()
+        self.received = received
+        self.enqueued = None
+        self.written = None
+        self.acked = None
+        self.applied = None
+        self.reply = None
+        self.status = 'queued'  # queued, written, acked, applied, rejected or expired
+        self.expected_reply = expected_reply(self.key)
+        self.expected_state = expected_state(self.key)
+
+    @property
+    def origin(self):
+        return self.received if self.received is not None else self.enqueued
+
+    def to_dict(self):
+        start = self.origin
+        stages = {}
+        for stage in ('received', 'enqueued', 'written', 'acked', 'applied'):
+            value = getattr(self, stage)
+            if value is not None:
+                stages[stage] = round((value - start) * 1000, 3)
+        return {'command': self.command, 'status': self.status, 'reply': self.reply, 'stages_ms': stages}
+
+
+class CommandTracer:
+    """Follow commands through the stack and keep a latency histogram per stage
+
+    enqueued() and written() are called by SerialInterface, observe_reply()
+    and observe_telemetry() by MotorController's update loop, request()
+    by the web app; all of them are safe to call from any thread.
+    """
+
+    def __init__(self, timeout=5.0, recent=50):
+        self.timeout = timeout
+        self.histograms = {name: LatencyHistogram() for name in STAGES}
+        self.counts = {'traced': 0, 'acked': 0, 'applied': 0, 'rejected': 0, 'expired': 0, 'missed_replies': 0}
+        self.recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queued = {}  # enqueued_at -> trace, until written
+        self._awaiting_reply = deque()  # written traces that expect a reply, in write order
+        self._awaiting_state = []  # traces waiting for telemetry to reflect them
+        self._telemetry_at = None  # last TelemetryRecord seen; text-only links never complete 'applied'
+
+    @contextmanager
+    def request(self, received_at=None):
+        """Mark commands sent from this thread inside the block as received at received_at (default now)"""
+        self._local.received = received_at if received_at is not None else time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.received = None
+
+    def enqueued(self, command, enqueued_at):
+        trace = CommandTrace(command, getattr(self._local, 'received', None))
+        trace.enqueued = enqueued_at
+        with self._lock:
+            self.counts['traced'] += 1
+            self._observe(trace, 'http')
+            self._queued[enqueued_at] = trace
+            self._expire(enqueued_at)
+        return trace
+
+    def written(self, batch, written_at):
+        """Record a write of (command, enqueued_at, priority) entries"""
+        with self._lock:
+            for _, enqueued_at, _ in batch:
+                trace = self._queued.pop(enqueued_at, None)
+                if trace is None:
+                    continue
+                trace.written = written_at
+                trace.status = 'written'
+                self._observe(trace, 'queue')
+                if trace.expected_reply is not None:
+                    self._awaiting_reply.append(trace)
+                elif trace.expected_state is not None and self._has_telemetry(written_at):
+                    self._awaiting_state.append(trace)
+                else:
+                    self._finish(trace)
+
+    def observe_reply(self, line):
+        """Match a reply line (✅/🚨/❌ text or ACK:) to the command it answers"""
+        if not self._awaiting_reply:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            waiting = self._awaiting_reply
+            if line.startswith(REJECTION_PREFIXES):
+                trace = waiting.popleft()
+                trace.reply, trace.status = line, 'rejected'
+                self.counts['rejected'] += 1
+                self._finish(trace)
+                return
+            for index, trace in enumerate(waiting):
+                if line.startswith(trace.expected_reply):
+                    break
+            else:
+                return  # not a reply to anything traced (e.g. "✅ Soft brake complete")
+            for _ in range(index):
+                # Replies come in command order, so anything ahead of the match lost its reply
+                missed = waiting.popleft()
+                self.counts['missed_replies'] += 1
+                self._acked(missed, None, None)
+            self._acked(waiting.popleft(), line, now)
+
+    def observe_telemetry(self, record):
+        """Complete traces whose effect this TelemetryRecord shows"""
+        now = self._telemetry_at = time.perf_counter()
+        if not self._awaiting_state:
+            return
+        with self._lock:
+            remaining = []
+            for trace in self._awaiting_state:
+                if trace.expected_state(record):
+                    trace.applied, trace.status = now, 'applied'
+                    self.counts['applied'] += 1
+                    self._observe(trace, 'apply')
+                    self._observe(trace, 'total')
+                    self._finish(trace)
+                else:
+                    remaining.append(trace)
+            self._awaiting_state = remaining
+            self._expire(now)
+
+    def _acked(self, trace, line, now):
+        if line is not None:
+            trace.acked, trace.reply, trace.status = now, line, 'acked'
+            self.counts['acked'] += 1
+            self._observe(trace, 'ack')
+            self._observe(trace, 'round_trip')
+        if trace.expected_state is not None and self._has_telemetry(trace.written):
+            self._awaiting_state.append(trace)
+        else:
+            self._finish(trace)
+
+    def _has_telemetry(self, now):
+        return self._telemetry_at is not None and now - self._telemetry_at < self.timeout
+
+    def _observe(self, trace, name):
+        start, end = STAGES[name]
+        start = getattr(trace, start)
+        if name == 'apply' and start is None:
+            start = trace.written  # reply missed: measure from the write instead
+        end = getattr(trace, end)
+        if start is not None and end is not None:
+            self.histograms[name].observe(end - start)
+
+    def _finish(self, trace):
+        self.recent.append(trace)
+
+    def _expire(self, now):
+        """Give up on traces older than timeout; call with _lock held"""
+        cutoff = now - self.timeout
+        for enqueued_at in [key for key in self._queued if key < cutoff]:
+            self._expired(self._queued.pop(enqueued_at))
+        while self._awaiting_reply and self._awaiting_reply[0].written < cutoff:
+            trace = self._awaiting_reply.popleft()
+            if trace.expected_state is not None and self._has_telemetry(now):
+                self._awaiting_state.append(trace)  # no reply, but telemetry may still show it
+            else:
+                self._expired(trace)
+        if self._awaiting_state:
+            for trace in [trace for trace in self._awaiting_state if trace.written < cutoff]:
+                self._awaiting_state.remove(trace)
+                self._expired(trace)
+
+    def _expired(self, trace):
+        trace.status = 'expired'
+        self.counts['expired'] += 1
+        self._finish(trace)
+
+    def get_stats(self, recent=True):
+        """Counters, per-stage histogram summaries and (optionally) the most recent finished traces"""
+        with self._lock:
+            self._expire(time.perf_counter())
+            stats = {
+                'counts': dict(self.counts),
+                'pending': len(self._queued) + len(self._awaiting_reply) + len(self._awaiting_state),
+                'stages': {name: histogram.summary() for name, histogram in self.histograms.items()}
+            }
+            if recent:
+                stats['recent'] = [trace.to_dict() for trace in self.recent]
+        return stats
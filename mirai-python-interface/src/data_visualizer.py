@@ -1,12 +1,24 @@
 import pygame
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_agg import FigureCanvasAgg
 import pygame.gfxdraw
 from datetime import datetime
 import threading
 import time
 import sys
+from plot_renderer import create_plot_renderer
+
+PANEL_TITLES = {
+    'motors': "Motor Status",
+    'plots': "Real-time Plots",
+    'system': "System Status",
+    'controls': "Control Panel"
+}
+
+# system_status keys shown in the System Status panel, in display order
+SYSTEM_FLAGS = ('serial_connected', 'emergency_stop', 'braking', 'ros_connected', 'simulation_mode')
+
+# Rendered text surfaces kept; RPM readouts keep producing new strings, so the cache is bounded
+TEXT_CACHE_SIZE = 512
 
 class DataVisualizer:
     def __init__(self, motor_controller, width=1400, height=900):
@@ -16,6 +28,9 @@ class DataVisualizer:
         self.running = False
         self.initialized = False
         self.data_available = False
+        # Build-and-draw time of each frame, excluding the 30 FPS wait (GET /metrics)
+        self.frame_time = motor_controller.metrics.histogram(
+            'mirai_visualizer_frame_seconds', 'Dashboard frame time (events, plots and drawing), excluding the FPS wait')
         
         # Initialize pygame with error handling
         try:
@@ -29,9 +44,6 @@ class DataVisualizer:
             self.running = False
             return
         
-        # Initialize matplotlib figures
-        self.setup_plots()
-        
         # Colors
         self.colors = {
             'background': (25, 25, 35),
@@ -62,46 +74,109 @@ class DataVisualizer:
             'button_spacing': 15,
             'status_height': 40
         }
+        self.panels = self.panel_rects()
+        self.buttons = self.create_buttons()
+        
+        # Retained mode: static background, cached text and the values each widget was last drawn with
+        self.static_layer = None
+        self.text_cache = {}
+        self.widgets = self.create_widgets()
+        self.widget_values = {}
+        self.plot_version = 0
+        self.plot_snapshot = None
+        
+        # Initialize plot renderer
+        self.setup_plots()
         
         self.running = True
     
     def setup_plots(self):
         try:
-            # Create matplotlib figures for real-time plotting
-            plt.style.use('dark_background')
-            self.fig, ((self.ax1, self.ax2), (self.ax3, self.ax4)) = plt.subplots(2, 2, figsize=(10, 8))
-            self.canvas = FigureCanvasAgg(self.fig)
-            
-            # Configure plots
-            self.ax1.set_title('Motor Speeds', color='white', fontsize=12)
-            self.ax1.set_ylabel('Speed', color='white')
-            self.ax1.grid(True, alpha=0.3)
-            self.ax1.tick_params(colors='white')
-            self.ax1.set_facecolor((0.1, 0.1, 0.1))
-            
-            self.ax2.set_title('Target vs Actual', color='white', fontsize=12)
-            self.ax2.grid(True, alpha=0.3)
-            self.ax2.tick_params(colors='white')
-            self.ax2.set_facecolor((0.1, 0.1, 0.1))
-            
-            self.ax3.set_title('RPM Values', color='white', fontsize=12)
-            self.ax3.set_ylabel('RPM', color='white')
-            self.ax3.grid(True, alpha=0.3)
-            self.ax3.tick_params(colors='white')
-            self.ax3.set_facecolor((0.1, 0.1, 0.1))
-            
-            self.ax4.set_title('System Status', color='white', fontsize=12)
-            self.ax4.grid(True, alpha=0.3)
-            self.ax4.tick_params(colors='white')
-            self.ax4.set_facecolor((0.1, 0.1, 0.1))
-            
-            # Set dark background for all plots
-            self.fig.patch.set_facecolor((0.15, 0.15, 0.2))
-            plt.tight_layout()
-            
+            # Plots are laid out at the panel's pixel size so they are never rescaled
+            visualization = self.motor_controller.serial_interface.config.get('visualization', {})
+            self.plot_backend = visualization.get('plot_backend', 'matplotlib')
+            self.plot_renderer = create_plot_renderer(self.plot_backend, self.plot_rect().size)
         except Exception as e:
             print(f"Plot setup failed: {e}")
     
+    def panel_rects(self):
+        """Screen rectangles of the four dashboard panels"""
+        panel_width = (self.width - 3 * self.layout['panel_spacing']) // 2
+        left_panel_x = self.layout['padding']
+        right_panel_x = left_panel_x + panel_width + self.layout['panel_spacing']
+        panel_y = self.layout['padding'] + self.layout['status_height'] + self.layout['panel_spacing']
+        panel_height = (self.height - panel_y - 2 * self.layout['padding']) // 2
+        lower_panel_y = panel_y + panel_height + self.layout['panel_spacing']
+        return {
+            'motors': pygame.Rect(left_panel_x, panel_y, panel_width, panel_height),
+            'plots': pygame.Rect(right_panel_x, panel_y, panel_width, panel_height),
+            'system': pygame.Rect(left_panel_x, lower_panel_y, panel_width, panel_height),
+            'controls': pygame.Rect(right_panel_x, lower_panel_y, panel_width, panel_height)
+        }
+    
+    def plot_rect(self):
+        """Screen rectangle of the plots inside the "Real-time Plots" panel"""
+        panel = self.panel_rects()['plots']
+        return pygame.Rect(panel.x + 10, panel.y + 40, panel.width - 20, panel.height - 50)
+    
+    def create_buttons(self):
+        """Control panel buttons as (label, command, screen rect)"""
+        button_width = 140
+        button_height = 45
+        button_spacing = 15
+        
+        # Group buttons logically
+        control_groups = [
+            [
+                ("⏩ Forward", lambda: self.motor_controller.set_direction('both', 'FORWARD')),
+                ("⏪ Reverse", lambda: self.motor_controller.set_direction('both', 'REVERSE')),
+                ("⏹ Stop", self.motor_controller.stop_motors)
+            ],
+            [
+                ("🚨 Emergency", self.motor_controller.emergency_stop),
+                ("✅ Clear", self.motor_controller.clear_emergency),
+                ("📊 Diagnostics", self.motor_controller.print_diagnostics)
+            ],
+            [
+                ("🔄 Soft Brake", self.motor_controller.activate_soft_brake),
+                ("⚡ Hard Brake", self.motor_controller.activate_hard_brake),
+                ("🌊 Coast", self.motor_controller.coast_motors)
+            ]
+        ]
+        
+        panel = self.panels['controls']
+        buttons = []
+        for group_idx, group in enumerate(control_groups):
+            for btn_idx, (text, command) in enumerate(group):
+                btn_x = panel.x + 20 + group_idx * (button_width + button_spacing)
+                btn_y = panel.y + 50 + btn_idx * (button_height + button_spacing)
+                buttons.append((text, command, pygame.Rect(btn_x, btn_y, button_width, button_height)))
+        return buttons
+    
+    def create_widgets(self):
+        """Dashboard widgets as (name, screen rect, draw method, extra draw arguments)
+        
+        Each widget owns its rectangle: redrawing it restores the static layer
+        underneath and draws the widget's current values on top.
+        """
+        motors = self.panels['motors']
+        system = self.panels['system']
+        status_height = self.layout['status_height']
+        widgets = [
+            ('connection', pygame.Rect(0, 0, 300, status_height), self.draw_connection, ()),
+            ('last_update', pygame.Rect(self.width - 250, 0, 250, status_height), self.draw_last_update, ()),
+            ('left_motor', pygame.Rect(motors.x + 20, motors.y + 85, motors.width - 40, 100),
+             self.draw_motor, (self.colors['left_motor'],)),
+            ('right_motor', pygame.Rect(motors.x + 20, motors.y + 235, motors.width - 40, 100),
+             self.draw_motor, (self.colors['right_motor'],)),
+            ('system', pygame.Rect(system.x + 20, system.y + 85, system.width - 40, 125), self.draw_system_status, ()),
+            ('dropped', pygame.Rect(system.x + 20, system.y + 215, system.width - 40, 25), self.draw_dropped, ()),
+            ('plots', self.plot_rect(), self.draw_plots, ())
+        ]
+        for text, _, rect in self.buttons:
+            widgets.append((text, rect, self.draw_button, (text,)))
+        return widgets
+    
     def start(self):
         if not self.initialized:
             return
@@ -122,36 +197,55 @@ class DataVisualizer:
         clock = pygame.time.Clock()
         startup_time = time.time()
         show_loading = True
+        full_redraw = True
         
         while self.running:
             try:
+                frame_start = time.perf_counter()
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         self.running = False
                     elif event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_ESCAPE:
                             self.running = False
+                    elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and not show_loading:
+                        self.handle_click(event.pos)
+                    elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                        full_redraw = True  # the window contents were lost
                 
                 # Check if we have data available
-                status = self.motor_controller.get_status()
-                has_data = len(self.motor_controller.get_history()['timestamp']) > 0
+                has_data = self.motor_controller.get_snapshot().cursor > 0
                 
                 # Show loading screen for first few seconds or until data arrives
                 if show_loading and (time.time() - startup_time < 3 or not has_data):
                     self.render_loading_screen(startup_time)
+                    pygame.display.flip()
                 else:
                     show_loading = False
                     self.data_available = True
                     self.update_plots()
-                    self.render_dashboard()
+                    # Only changed widgets reach the display; an idle frame draws nothing
+                    dirty = self.render_dashboard(force=full_redraw)
+                    full_redraw = False
+                    if dirty:
+                        pygame.display.update(dirty)
                 
-                pygame.display.flip()
+                self.frame_time.observe(time.perf_counter() - frame_start)
                 clock.tick(30)  # 30 FPS
                 
             except Exception as e:
                 print(f"Visualization error: {e}")
                 time.sleep(0.1)
     
+    def handle_click(self, pos):
+        for text, command, rect in self.buttons:
+            if rect.collidepoint(pos):
+                try:
+                    command()
+                except Exception as e:
+                    print(f"Button command failed: {e}")
+                return
+    
     def render_loading_screen(self, startup_time):
         """Render a loading screen while waiting for data"""
         self.screen.fill(self.colors['background'])
@@ -196,136 +290,97 @@ class DataVisualizer:
     
     def update_plots(self):
         try:
-            history = self.motor_controller.get_history()
-            
+            # History and status from the same snapshot so the plots agree
+            snapshot = self.motor_controller.get_snapshot()
+            if snapshot is self.plot_snapshot:
+                return  # nothing published since the last frame
+            self.plot_snapshot = snapshot
+            history = self.motor_controller.get_history_window(100, snapshot)  # Show only last 100 points
             if len(history['timestamp']) > 0:
-                timestamps = history['timestamp'][-100:]  # Show only last 100 points
-                
-                # Update speed plot
-                self.ax1.clear()
-                self.ax1.plot(timestamps, history['left_speed'][-100:], 
-                             label='Left Speed', color='red', linewidth=2)
-                self.ax1.plot(timestamps, history['right_speed'][-100:], 
-                             label='Right Speed', color='green', linewidth=2)
-                self.ax1.set_title('Motor Speeds', color='white', fontsize=12)
-                self.ax1.legend(facecolor=(0.2, 0.2, 0.2), edgecolor='white', labelcolor='white')
-                self.ax1.grid(True, alpha=0.3)
-                self.ax1.tick_params(colors='white')
-                self.ax1.set_facecolor((0.1, 0.1, 0.1))
-                
-                # Update target vs actual plot
-                self.ax2.clear()
-                self.ax2.plot(timestamps, history['left_target'][-100:], 
-                             label='Left Target', color='red', linestyle='--', linewidth=2)
-                self.ax2.plot(timestamps, history['left_speed'][-100:], 
-                             label='Left Actual', color='red', linewidth=2)
-                self.ax2.plot(timestamps, history['right_target'][-100:], 
-                             label='Right Target', color='green', linestyle='--', linewidth=2)
-                self.ax2.plot(timestamps, history['right_speed'][-100:], 
-                             label='Right Actual', color='green', linewidth=2)
-                self.ax2.set_title('Target vs Actual Speeds', color='white', fontsize=12)
-                self.ax2.legend(facecolor=(0.2, 0.2, 0.2), edgecolor='white', labelcolor='white')
-                self.ax2.grid(True, alpha=0.3)
-                self.ax2.tick_params(colors='white')
-                self.ax2.set_facecolor((0.1, 0.1, 0.1))
-                
-                # Update RPM plot
-                self.ax3.clear()
-                self.ax3.plot(timestamps, history['left_rpm'][-100:], 
-                             label='Left RPM', color='red', linewidth=2)
-                self.ax3.plot(timestamps, history['right_rpm'][-100:], 
-                             label='Right RPM', color='green', linewidth=2)
-                self.ax3.set_title('Motor RPM', color='white', fontsize=12)
-                self.ax3.legend(facecolor=(0.2, 0.2, 0.2), edgecolor='white', labelcolor='white')
-                self.ax3.grid(True, alpha=0.3)
-                self.ax3.tick_params(colors='white')
-                self.ax3.set_facecolor((0.1, 0.1, 0.1))
-                
-                # Update system status
-                self.ax4.clear()
-                status = self.motor_controller.get_status()
-                system_vars = [
-                    float(status['system']['emergency_stop']),
-                    float(status['system']['braking']),
-                    float(status['system']['ros_connected']),
-                    float(status['system'].get('serial_connected', False))
-                ]
-                colors = ['red', 'orange', 'blue', 'green']
-                bars = self.ax4.bar(['Emergency', 'Braking', 'ROS', 'Serial'], 
-                                   system_vars, color=colors, alpha=0.7)
-                self.ax4.set_title('System Status', color='white', fontsize=12)
-                self.ax4.set_ylim(0, 1)
-                self.ax4.grid(True, alpha=0.3)
-                self.ax4.tick_params(colors='white')
-                self.ax4.set_facecolor((0.1, 0.1, 0.1))
-                
-                # Draw the canvas
-                self.canvas.draw()
-                self.canvas.flush_events()
+                # Only the line and bar artists whose data changed are redrawn
+                if self.plot_renderer.update(history, snapshot.system, snapshot.cursor):
+                    self.plot_version += 1
                 
         except Exception as e:
             print(f"Plot update error: {e}")
     
-    def render_dashboard(self):
+    def current_values(self, snapshot):
+        """What every widget shows right now; a widget is redrawn only when its entry changes"""
+        system = snapshot.system
+        values = {
+            'connection': bool(system.get('serial_connected', False)),
+            'last_update': datetime.fromtimestamp(snapshot.published_at).strftime('%H:%M:%S'),
+            'system': tuple(bool(system.get(key, False)) for key in SYSTEM_FLAGS),
+            'dropped': sum(self.motor_controller.get_drop_counts().values()),
+            'plots': self.plot_version
+        }
+        for side in ('left', 'right'):
+            motor = snapshot.motors[side]
+            values[f'{side}_motor'] = (motor['speed'], motor['target'], round(motor['rpm'], 1), motor['direction'])
+        mouse_pos = pygame.mouse.get_pos()
+        for text, _, rect in self.buttons:
+            values[text] = rect.collidepoint(mouse_pos)
+        return values
+    
+    def render_dashboard(self, force=False):
+        """Redraw the widgets whose values changed and return the screen rects touched
+        
+        force repaints the whole window from the static layer first, e.g.
+        after the loading screen or when the window was exposed.
+        """
         try:
-            # Clear screen
-            self.screen.fill(self.colors['background'])
-            
-            # Get current status
-            status = self.motor_controller.get_status()
-            
-            # Draw status bar at top
-            self.draw_status_bar()
+            dirty = []
+            if force or self.static_layer is None:
+                if self.static_layer is None:
+                    self.static_layer = self.render_static_layer()
+                self.screen.blit(self.static_layer, (0, 0))
+                self.widget_values = {}
+                dirty.append(self.screen.get_rect())
             
-            # Calculate panel dimensions with better spacing
-            panel_width = (self.width - 3 * self.layout['panel_spacing']) // 2
-            left_panel_x = self.layout['padding']
-            right_panel_x = left_panel_x + panel_width + self.layout['panel_spacing']
-            panel_y = self.layout['padding'] + self.layout['status_height'] + self.layout['panel_spacing']
-            panel_height = (self.height - panel_y - 2 * self.layout['padding']) // 2
-            
-            # Draw panels with improved layout
-            self.draw_panel(left_panel_x, panel_y, panel_width, panel_height, "Motor Status")
-            self.draw_panel(right_panel_x, panel_y, panel_width, panel_height, "Real-time Plots")
-            self.draw_panel(left_panel_x, panel_y + panel_height + self.layout['panel_spacing'], 
-                           panel_width, panel_height, "System Status")
-            self.draw_panel(right_panel_x, panel_y + panel_height + self.layout['panel_spacing'], 
-                           panel_width, panel_height, "Control Panel")
-            
-            # Draw content in panels
-            self.draw_motor_status(left_panel_x + 20, panel_y + 50, status)
-            self.draw_system_status(left_panel_x + 20, panel_y + panel_height + self.layout['panel_spacing'] + 50, status)
-            self.draw_control_buttons(right_panel_x + 20, panel_y + panel_height + self.layout['panel_spacing'] + 50)
-            self.draw_matplotlib_plot(right_panel_x + 10, panel_y + 40, panel_width - 20, panel_height - 50)
+            values = self.current_values(self.motor_controller.get_snapshot())
+            for name, rect, draw, args in self.widgets:
+                value = values[name]
+                if name in self.widget_values and self.widget_values[name] == value:
+                    continue
+                self.widget_values[name] = value
+                # Restore the background under the widget, then draw it
+                self.screen.blit(self.static_layer, rect, rect)
+                draw(rect, value, *args)
+                if not force:
+                    dirty.append(rect)
+            return dirty
             
         except Exception as e:
             print(f"Rendering error: {e}")
+            return []
     
-    def draw_status_bar(self):
-        # Draw status bar at top of screen
-        status_bar_rect = pygame.Rect(0, 0, self.width, self.layout['status_height'])
-        pygame.draw.rect(self.screen, self.colors['panel'], status_bar_rect)
+    def render_static_layer(self):
+        """Draw everything that never changes (background, panels, titles, headings) and keep a copy"""
+        self.screen.fill(self.colors['background'])
         
-        # Get connection status
-        status = self.motor_controller.get_status()
-        serial_connected = status['system'].get('serial_connected', False)
+        # Status bar with the dashboard title
+        pygame.draw.rect(self.screen, self.colors['panel'], (0, 0, self.width, self.layout['status_height']))
+        title_surf = self.render_text("MIRAI Motor Control Dashboard", self.fonts['title'], self.colors['accent'])
+        self.screen.blit(title_surf, (self.width // 2 - title_surf.get_width() // 2, 5))
         
-        # Draw connection status
+        for name, rect in self.panels.items():
+            self.draw_panel(rect.x, rect.y, rect.width, rect.height, PANEL_TITLES[name])
+        
+        motors = self.panels['motors']
+        self.draw_text("LEFT MOTOR", motors.x + 20, motors.y + 50, self.fonts['medium'], self.colors['left_motor'])
+        self.draw_text("RIGHT MOTOR", motors.x + 20, motors.y + 200, self.fonts['medium'], self.colors['right_motor'])
+        system = self.panels['system']
+        self.draw_text("SYSTEM STATUS", system.x + 20, system.y + 50, self.fonts['medium'], self.colors['accent'])
+        return self.screen.copy()
+    
+    def draw_connection(self, rect, serial_connected):
         connection_text = "Serial: " + ("CONNECTED" if serial_connected else "DISCONNECTED")
         connection_color = self.colors['connected'] if serial_connected else self.colors['disconnected']
-        
-        connection_surf = self.fonts['medium'].render(connection_text, True, connection_color)
-        self.screen.blit(connection_surf, (20, 10))
-        
-        # Draw timestamp
-        time_text = f"Last Update: {status['timestamp'].strftime('%H:%M:%S')}"
-        time_surf = self.fonts['small'].render(time_text, True, self.colors['text'])
-        self.screen.blit(time_surf, (self.width - time_surf.get_width() - 20, 12))
-        
-        # Draw title
-        title_text = "MIRAI Motor Control Dashboard"
-        title_surf = self.fonts['title'].render(title_text, True, self.colors['accent'])
-        self.screen.blit(title_surf, (self.width // 2 - title_surf.get_width() // 2, 5))
+        self.draw_text(connection_text, rect.x + 20, rect.y + 10, self.fonts['medium'], connection_color)
+    
+    def draw_last_update(self, rect, time_text):
+        time_surf = self.render_text(f"Last Update: {time_text}", self.fonts['small'], self.colors['text'])
+        self.screen.blit(time_surf, (rect.right - time_surf.get_width() - 20, rect.y + 12))
     
     def draw_panel(self, x, y, width, height, title):
         # Draw panel background with rounded corners
@@ -336,107 +391,52 @@ class DataVisualizer:
         pygame.draw.rect(self.screen, self.colors['accent'], header_rect, border_radius=12)
         
         # Draw title
-        title_text = self.fonts['medium'].render(title, True, self.colors['text'])
-        self.screen.blit(title_text, (x + 15, y + 10))
+        self.draw_text(title, x + 15, y + 10, self.fonts['medium'])
     
-    def draw_motor_status(self, x, y, status):
-        motors = status['motors']
-        
-        # Left motor section
-        self.draw_text("LEFT MOTOR", x, y, self.fonts['medium'], self.colors['left_motor'])
-        self.draw_text(f"Speed: {motors['left']['speed']}/255", x, y + 35, self.fonts['small'])
-        self.draw_text(f"Target: {motors['left']['target']}/255", x, y + 60, self.fonts['small'])
-        self.draw_text(f"RPM: {motors['left']['rpm']:.1f}", x, y + 85, self.fonts['small'])
-        self.draw_text(f"Direction: {motors['left']['direction']}", x, y + 110, self.fonts['small'])
-        
-        # Right motor section
-        self.draw_text("RIGHT MOTOR", x, y + 150, self.fonts['medium'], self.colors['right_motor'])
-        self.draw_text(f"Speed: {motors['right']['speed']}/255", x, y + 185, self.fonts['small'])
-        self.draw_text(f"Target: {motors['right']['target']}/255", x, y + 210, self.fonts['small'])
-        self.draw_text(f"RPM: {motors['right']['rpm']:.1f}", x, y + 235, self.fonts['small'])
-        self.draw_text(f"Direction: {motors['right']['direction']}", x, y + 260, self.fonts['small'])
-        
-        # Draw speed bars with better spacing
-        self.draw_speed_bar(x + 180, y + 35, motors['left']['speed'], self.colors['left_motor'])
-        self.draw_speed_bar(x + 180, y + 185, motors['right']['speed'], self.colors['right_motor'])
+    def draw_motor(self, rect, values, color):
+        speed, target, rpm, direction = values
+        x, y = rect.x, rect.y
+        self.draw_text(f"Speed: {speed}/255", x, y, self.fonts['small'])
+        self.draw_text(f"Target: {target}/255", x, y + 25, self.fonts['small'])
+        self.draw_text(f"RPM: {rpm:.1f}", x, y + 50, self.fonts['small'])
+        self.draw_text(f"Direction: {direction}", x, y + 75, self.fonts['small'])
+        self.draw_speed_bar(x + 180, y, speed, color)
     
-    def draw_system_status(self, x, y, status):
-        system = status['system']
-        
-        self.draw_text("SYSTEM STATUS", x, y, self.fonts['medium'], self.colors['accent'])
+    def draw_system_status(self, rect, flags):
+        serial_connected, emergency_stop, braking, ros_connected, simulation_mode = flags
+        x, y = rect.x, rect.y
         
         # Connection status
-        serial_connected = system.get('serial_connected', False)
         connection_color = self.colors['connected'] if serial_connected else self.colors['disconnected']
-        self.draw_text(f"Serial: {'CONNECTED' if serial_connected else 'DISCONNECTED'}", 
-                      x, y + 35, self.fonts['small'], connection_color)
+        self.draw_text(f"Serial: {'CONNECTED' if serial_connected else 'DISCONNECTED'}",
+                      x, y, self.fonts['small'], connection_color)
         
         # Other status indicators
-        emergency_color = self.colors['emergency'] if system['emergency_stop'] else self.colors['success']
-        braking_color = self.colors['warning'] if system['braking'] else self.colors['text']
-        ros_color = self.colors['connected'] if system['ros_connected'] else self.colors['disconnected']
-        
-        self.draw_text(f"Emergency: {'ACTIVE' if system['emergency_stop'] else 'INACTIVE'}", 
-                      x, y + 65, self.fonts['small'], emergency_color)
-        self.draw_text(f"Braking: {'ACTIVE' if system['braking'] else 'INACTIVE'}", 
-                      x, y + 90, self.fonts['small'], braking_color)
-        self.draw_text(f"ROS: {'CONNECTED' if system['ros_connected'] else 'DISCONNECTED'}", 
-                      x, y + 115, self.fonts['small'], ros_color)
-        self.draw_text(f"Simulation: {'ACTIVE' if system['simulation_mode'] else 'INACTIVE'}", 
-                      x, y + 140, self.fonts['small'], self.colors['warning'] if system['simulation_mode'] else self.colors['text'])
+        emergency_color = self.colors['emergency'] if emergency_stop else self.colors['success']
+        braking_color = self.colors['warning'] if braking else self.colors['text']
+        ros_color = self.colors['connected'] if ros_connected else self.colors['disconnected']
+        
+        self.draw_text(f"Emergency: {'ACTIVE' if emergency_stop else 'INACTIVE'}",
+                      x, y + 30, self.fonts['small'], emergency_color)
+        self.draw_text(f"Braking: {'ACTIVE' if braking else 'INACTIVE'}",
+                      x, y + 55, self.fonts['small'], braking_color)
+        self.draw_text(f"ROS: {'CONNECTED' if ros_connected else 'DISCONNECTED'}",
+                      x, y + 80, self.fonts['small'], ros_color)
+        self.draw_text(f"Simulation: {'ACTIVE' if simulation_mode else 'INACTIVE'}",
+                      x, y + 105, self.fonts['small'], self.colors['warning'] if simulation_mode else self.colors['text'])
     
-    def draw_control_buttons(self, x, y):
-        button_width = 140
-        button_height = 45
-        button_spacing = 15
-        
-        # Group buttons logically
-        control_groups = [
-            [
-                ("⏩ Forward", lambda: self.motor_controller.set_direction('both', 'FORWARD')),
-                ("⏪ Reverse", lambda: self.motor_controller.set_direction('both', 'REVERSE')),
-                ("⏹ Stop", self.motor_controller.stop_motors)
-            ],
-            [
-                ("🚨 Emergency", self.motor_controller.emergency_stop),
-                ("✅ Clear", self.motor_controller.clear_emergency),
-                ("📊 Diagnostics", self.motor_controller.print_diagnostics)
-            ],
-            [
-                ("🔄 Soft Brake", self.motor_controller.activate_soft_brake),
-                ("⚡ Hard Brake", self.motor_controller.activate_hard_brake),
-                ("🌊 Coast", self.motor_controller.coast_motors)
-            ]
-        ]
-        
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_pressed = pygame.mouse.get_pressed()[0]
+    def draw_dropped(self, rect, dropped):
+        # Telemetry shed under overload, parse errors, bad frames and full recorder/sink queues
+        self.draw_text(f"Dropped: {dropped} items", rect.x, rect.y, self.fonts['small'],
+                       self.colors['warning'] if dropped else self.colors['text'])
+    
+    def draw_button(self, rect, mouse_over, text):
+        # Draw button with hover effect
+        btn_color = self.colors['accent'] if mouse_over else self.colors['panel']
+        pygame.draw.rect(self.screen, btn_color, rect, border_radius=8)
         
-        for group_idx, group in enumerate(control_groups):
-            for btn_idx, (text, command) in enumerate(group):
-                btn_x = x + group_idx * (button_width + button_spacing)
-                btn_y = y + btn_idx * (button_height + button_spacing)
-                
-                # Check if mouse is over button
-                mouse_over = (btn_x <= mouse_pos[0] <= btn_x + button_width and 
-                             btn_y <= mouse_pos[1] <= btn_y + button_height)
-                
-                # Draw button with hover effect
-                btn_color = self.colors['accent'] if mouse_over else self.colors['panel']
-                pygame.draw.rect(self.screen, btn_color, (btn_x, btn_y, button_width, button_height), 
-                               border_radius=8)
-                
-                # Draw button text
-                text_surf = self.fonts['small'].render(text, True, self.colors['text'])
-                self.screen.blit(text_surf, (btn_x + 10, btn_y + 12))
-                
-                # Handle click
-                if mouse_over and mouse_pressed:
-                    try:
-                        command()
-                        pygame.time.delay(200)  # Debounce
-                    except Exception as e:
-                        print(f"Button command failed: {e}")
+        # Draw button text
+        self.draw_text(text, rect.x + 10, rect.y + 12, self.fonts['small'])
     
     def draw_speed_bar(self, x, y, speed, color):
         max_width = 200
@@ -452,26 +452,32 @@ class DataVisualizer:
         # Border
         pygame.draw.rect(self.screen, self.colors['text'], (x, y, max_width, height), 1, border_radius=3)
         # Text
-        speed_text = self.fonts['small'].render(f"{speed}/255", True, self.colors['text'])
-        self.screen.blit(speed_text, (x + max_width + 10, y))
+        self.draw_text(f"{speed}/255", x + max_width + 10, y, self.fonts['small'])
+    
+    def render_text(self, text, font, color):
+        """Rendered text surface from the cache; font.render is the costliest call in a frame"""
+        key = (text, font, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = self.text_cache[key] = font.render(text, True, color)
+        return surface
     
     def draw_text(self, text, x, y, font, color=None):
         if color is None:
             color = self.colors['text']
-        text_surface = font.render(text, True, color)
-        self.screen.blit(text_surface, (x, y))
+        self.screen.blit(self.render_text(text, font, color), (x, y))
     
-    def draw_matplotlib_plot(self, x, y, width, height):
+    def draw_plots(self, rect, plot_version):
         try:
-            # Convert matplotlib figure to pygame surface
-            buf = self.canvas.buffer_rgba()
-            plot_surface = pygame.image.frombuffer(buf, self.canvas.get_width_height(), 'RGBA')
-            # Scale and draw
-            scaled_surface = pygame.transform.smoothscale(plot_surface, (width, height))
-            self.screen.blit(scaled_surface, (x, y))
+            # The renderer's surface is already panel sized
+            surface = self.plot_renderer.surface
+            if surface is not None:
+                self.screen.blit(surface, rect.topleft, (0, 0, rect.width, rect.height))
         except Exception as e:
             print(f"Plot rendering error: {e}")
-
+    
     def draw_pid_controls(self, x, y):
         """Draw PID control interface"""
         pid_width = 400
@@ -0,0 +1,349 @@
+# fleet.py
+"""Several robots in one process, serviced by one I/O thread
+
+FleetManager owns a MotorController per robot ID (the `fleet.robots`
+list in settings.yaml, each entry overriding config sections such as its
+serial port). Rather than two threads per SerialInterface plus each
+controller's 10 ms update thread, a single SerialEventLoop thread sleeps
+in select() on every port's file descriptor and a wake-up pipe that
+send_command() pokes:
+
+- a readable port is read without blocking and its lines or frames are
+  processed by the controller straight away (history, snapshot, stream)
+- queued commands are written as soon as they arrive; with drain_writes
+  the next batch waits out the previous one's wire time on a timer instead
+  of a sleep, so one robot's traffic never holds up another's
+- data sources without a descriptor (simulate, replay) are read every
+  poll_interval
+
+Opening a port takes up to seconds (connect() waits for the board's ready
+banner), so each connection attempt runs on a small worker pool and the
+port joins the loop once it is ready. After a failed attempt the loop
+times the backoff itself, checking a missing port for hot-plug every
+PLUG_POLL_INTERVAL (serial_reconnect), so robots without a board hold no
+worker while the others connect. Ports without a selectable descriptor
+(Windows) keep their own threads.
+"""
+import os
+import selectors
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import serial
+import yaml
+from metrics import MetricsRegistry
+from motor_controller import MotorController
+from serial_reconnect import PLUG_POLL_INTERVAL, port_present
+
+
+class SerialEventLoop:
+    """One thread reading, writing and processing for many MotorControllers"""
+
+    def __init__(self, poll_interval=0.01, workers=2):
+        self.poll_interval = poll_interval
+        self.selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fleet-connect')
+        self._lock = threading.Lock()
+        self._calls = deque()  # functions to run on the loop thread
+        self._writable = set()  # controllers send_command() queued for since the last pass
+        self._woken = False
+        self._sources = []  # controllers reading from a data source, polled
+        self._active = set()  # controllers whose port or source is in the loop
+        self._deferred = {}  # controller -> perf_counter time its next write batch is due
+        self._retries = {}  # controller -> (perf_counter time of its next connect attempt, port missing)
+        self._next_plug_check = 0.0
+        self._next_poll = 0.0
+        self.thread = None
+        self.running = False
+        # Loop passes, for the fleet metrics
+        self.wakeups = 0
+
+    @staticmethod
+    def can_service(controller):
+        """Data sources always; serial ports only where select() works on them"""
+        return controller.serial_interface.source is not None or os.name != 'nt'
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='fleet-io', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        os.write(self._wake_write, b'\0')
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.selector.close()
+        for fd in (self._wake_read, self._wake_write):
+            os.close(fd)
+
+    def add(self, controller):
+        """Service a started controller: connect its port on the pool, then read and write it here"""
+        interface = controller.serial_interface
+        interface.command_queue.listener = lambda: self._notify(controller)
+        if interface.source is not None:
+            interface.connect()  # only logs the data source
+            interface.running = True
+            self.call(lambda: self._register(controller))
+        else:
+            self._pool.submit(self._connect, controller)
+
+    def remove(self, controller):
+        """Stop servicing a controller, waiting until its port is out of the selector"""
+        controller.serial_interface.command_queue.listener = None
+        if not self.running or threading.current_thread() is self.thread:
+            self._unregister(controller)
+            return
+        done = threading.Event()
+        self.call(lambda: (self._unregister(controller), done.set()))
+        done.wait(timeout=2.0)
+
+    def call(self, function):
+        """Run function on the loop thread at its next pass"""
+        with self._lock:
+            self._calls.append(function)
+        self._wake()
+
+    def _notify(self, controller):
+        with self._lock:
+            self._writable.add(controller)
+            if self._woken:
+                return  # a wake-up byte is already pending
+            self._woken = True
+        self._wake()
+
+    def _wake(self):
+        if not self.running:
+            return  # stopped: the pipe may already be closed
+        try:
+            os.write(self._wake_write, b'\0')
+        except (BlockingIOError, OSError):
+            pass  # pipe full (the loop is already due to wake) or closed on stop
+
+    def _connect(self, controller):
+        """Worker: one connection attempt; if it fails the loop schedules the next after a backoff"""
+        interface = controller.serial_interface
+        if not (self.running and controller.running):
+            return
+        if interface.connect():
+            interface.running = True
+            self.call(lambda: self._register(controller))
+            return
+        due = time.perf_counter() + interface.reconnect_delay()
+        missing = not port_present(interface.config['serial']['port'])
+        self.call(lambda: self._retries.update({controller: (due, missing)}))
+
+    def _retry(self, now):
+        """Submit the connection attempts that are due, and at once those whose missing port was plugged in"""
+        check_plugs = now >= self._next_plug_check
+        if check_plugs:
+            self._next_plug_check = now + PLUG_POLL_INTERVAL
+        for controller, (due, missing) in list(self._retries.items()):
+            interface = controller.serial_interface
+            plugged = missing and check_plugs and port_present(interface.config['serial']['port'])
+            if due > now and not plugged:
+                continue
+            del self._retries[controller]
+            if plugged:
+                interface.backoff.reset()
+            self._pool.submit(self._connect, controller)
+
+    def _register(self, controller):
+        interface = controller.serial_interface
+        if not controller.running:
+            interface.stop()  # stopped while connecting
+            return
+        if interface.source is not None:
+            self._sources.append(controller)
+        else:
+            self.selector.register(interface.serial_conn.fileno(), selectors.EVENT_READ, controller)
+        self._active.add(controller)
+        controller.update_connection_status()
+        self._writable.add(controller)  # commands queued while connecting
+        controller.process_pending()  # banner and early telemetry from connect()
+
+    def _unregister(self, controller):
+        self._active.discard(controller)
+        if controller in self._sources:
+            self._sources.remove(controller)
+        for key in list(self.selector.get_map().values()):
+            if key.data is controller:
+                self.selector.unregister(key.fileobj)
+        self._writable.discard(controller)
+        self._deferred.pop(controller, None)
+        self._retries.pop(controller, None)
+
+    def _lost(self, controller, error):
+        """A port failed: take it out of the loop, close it and reconnect from the pool"""
+        self._unregister(controller)
+        if not controller.serial_interface.link_lost(error):
+            return  # already lost (a read and a write failing in the same pass)
+        controller.update_connection_status()
+        self._pool.submit(self._connect, controller)
+
+    def _timeout(self, now):
+        """Seconds select() may sleep: until the next source poll, deferred write or connect retry, else indefinitely"""
+        due = []
+        if self._sources:
+            due.append(self._next_poll)
+        if self._deferred:
+            due.append(min(self._deferred.values()))
+        if self._retries:
+            due.append(min(retry for retry, _ in self._retries.values()))
+            if any(missing for _, missing in self._retries.values()):
+                due.append(self._next_plug_check)
+        if not due:
+            return None
+        return max(0.0, min(due) - now)
+
+    def _run(self):
+        while self.running:
+            try:
+                self._pass()
+            except Exception as e:
+                if not self.running:
+                    break  # selector closed by stop()
+                print(f"Error in fleet loop: {e}")
+                time.sleep(0.1)
+
+    def _pass(self):
+        """Wait for ports, wake-ups or timers, then read, write and process what is ready"""
+        events = self.selector.select(self._timeout(time.perf_counter()))
+        self.wakeups += 1
+        received = []
+        for key, _ in events:
+            if key.data is None:
+                try:
+                    while os.read(self._wake_read, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            controller = key.data
+            try:
+                if controller.serial_interface.read_available(readable=True):
+                    received.append(controller)
+            except (serial.SerialException, OSError) as e:
+                self._lost(controller, e)
+
+        with self._lock:
+            calls, self._calls = self._calls, deque()
+            writable, self._writable = self._writable, set()
+            self._woken = False
+        for function in calls:
+            function()
+
+        now = time.perf_counter()
+        if self._retries:
+            self._retry(now)
+        if self._sources and now >= self._next_poll:
+            for controller in self._sources:
+                if controller.serial_interface.read_available():
+                    received.append(controller)
+            # Skip polls missed while busy instead of bursting to catch up
+            self._next_poll = max(self._next_poll + self.poll_interval, now)
+
+        writable.update(controller for controller, due in self._deferred.items() if due <= now)
+        for controller in writable & self._active:  # the rest stay queued until their port is open
+            self._write(controller)
+
+        for controller in received:
+            try:
+                controller.process_pending()
+            except Exception as e:
+                print(f"Error in fleet update: {e}")
+
+    def _write(self, controller):
+        interface = controller.serial_interface
+        self._deferred.pop(controller, None)
+        try:
+            while True:
+                due = interface.write_pending()
+                if due is None:
+                    return
+                if due > time.perf_counter():
+                    self._deferred[controller] = due
+                    return
+        except (serial.SerialException, OSError) as e:
+            if interface.source is None:
+                self._lost(controller, e)
+
+
+class FleetManager:
+    """MotorControllers keyed by robot ID, all serviced by one SerialEventLoop
+
+    With shared_loop=False every controller runs its own threads as
+    MotorController.start() does on its own (kept for comparison). `loop`
+    replaces the SerialEventLoop, e.g. with async_runtime.AsyncSerialLoop.
+    """
+
+    def __init__(self, config_path='config/settings.yaml', robots=None, simulate=False, shared_loop=True, loop=None):
+        try:
+            with open(config_path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            config = {}
+        fleet = config.get('fleet', {})
+        robots = fleet.get('robots', []) if robots is None else robots
+        if not robots:
+            raise ValueError("No robots configured (fleet.robots in the config file)")
+        self.loop = loop
+        if loop is None and shared_loop:
+            self.loop = SerialEventLoop(poll_interval=fleet.get('poll_interval_ms', 10) / 1000.0,
+                                        workers=fleet.get('workers', 2))
+        self.controllers = {}
+        for robot in robots:
+            robot_id = str(robot['id'])
+            if robot_id in self.controllers:
+                raise ValueError(f"Duplicate robot id: {robot_id}")
+            # Nested sections (serial:, simulation:, ...) override the shared config for this robot
+            overrides = {section: values for section, values in robot.items() if isinstance(values, dict)}
+            if 'port' in robot:
+                overrides['serial'] = {**overrides.get('serial', {}), 'port': robot['port']}
+            self.controllers[robot_id] = MotorController(
+                config_path, simulate=simulate or robot.get('simulate', False), overrides=overrides)
+        self.metrics = MetricsRegistry()
+        self.metrics.collect('mirai_fleet_robots', 'gauge', 'Robots in the fleet', lambda: len(self.controllers))
+        self.metrics.collect('mirai_fleet_robots_connected', 'gauge', 'Robots whose port or data source is connected',
+                             lambda: sum(c.serial_interface.is_connected() for c in self.controllers.values()))
+        if self.loop is not None:
+            self.metrics.collect('mirai_fleet_loop_wakeups_total', 'counter', 'Passes of the shared I/O loop',
+                                 lambda: self.loop.wakeups)
+
+    def start(self):
+        if self.loop is not None:
+            self.loop.start()
+        for controller in self.controllers.values():
+            controller.start(self.loop)
+
+    def stop(self):
+        for controller in self.controllers.values():
+            controller.stop()
+        if self.loop is not None:
+            self.loop.stop()
+
+    def get(self, robot_id):
+        return self.controllers.get(robot_id)
+
+    def default(self):
+        """First configured robot, served by the routes without /robots/<id>"""
+        return next(iter(self.controllers.values()))
+
+    def get_status(self):
+        """Connection and safety summary per robot"""
+        robots = {}
+        for robot_id, controller in self.controllers.items():
+            snapshot = controller.get_snapshot()
+            robots[robot_id] = {
+                'port': controller.serial_interface.get_port_status(),
+                'serial_connected': snapshot.system['serial_connected'],
+                'emergency_stop': snapshot.system['emergency_stop'],
+                'simulation_mode': controller.simulate
+            }
+        return robots
@@ -6,6 +6,9 @@ import threading
 import time
 from motor_controller import MotorController
 from data_visualizer import DataVisualizer
+from replay_source import ReplaySource
+from metrics import serve as serve_metrics
+from async_runtime import AsyncSerialLoop
 
 def signal_handler(sig, frame):
     """Handle graceful shutdown on SIGINT"""
@@ -22,6 +25,13 @@ def main():
     parser.add_argument('--config', default='config/settings.yaml', help='Config file path')
     parser.add_argument('--simulate', action='store_true', help='Run in simulation mode (no serial)')
     parser.add_argument('--port', help='Specify serial port (e.g., COM5)')
+    parser.add_argument('--replay', help='Replay a recording (.lines.gz, .mrec, JSON export or segment directory) instead of the serial port')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='Replay speed factor, 0 for as fast as possible')
+    parser.add_argument('--replay-loop', action='store_true', help='Restart the replay when it reaches the end')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics at http://<metrics-host>:<port>/metrics')
+    parser.add_argument('--metrics-host', default='127.0.0.1', help='Address for --metrics-port')
+    parser.add_argument('--runtime', choices=['threads', 'asyncio'], default='threads',
+                        help='Serial I/O on per-port threads, or on one asyncio event loop (async_runtime.py)')
     args = parser.parse_args()
     
     # Setup signal handler for graceful shutdown
@@ -29,10 +39,18 @@ def main():
     
     # Initialize motor controller
     global motor_controller
-    motor_controller = MotorController(args.config, simulate=args.simulate)
+    source = ReplaySource(args.replay, args.replay_speed, args.replay_loop) if args.replay else None
+    motor_controller = MotorController(args.config, simulate=args.simulate, source=source)
+    if args.metrics_port:
+        serve_metrics([motor_controller.metrics], args.metrics_host, args.metrics_port)
+    
+    runtime = None
+    if args.runtime == 'asyncio':
+        runtime = AsyncSerialLoop()
+        runtime.start()
     
     try:
-        motor_controller.start()
+        motor_controller.start(runtime)
         
         if not args.no_gui:
             # Initialize and start visualizer in a separate thread
@@ -109,6 +127,8 @@ def main():
     
     finally:
         motor_controller.stop()
+        if runtime is not None:
+            runtime.stop()
         if not args.no_gui and 'visualizer' in globals() and visualizer.running:
             visualizer.stop()
 
@@ -0,0 +1,216 @@
+# metrics.py
+"""Prometheus text-format metrics for the web apps and the GUI, without a client library
+
+Every counter and histogram is created when it is registered, together with
+the label values it will be seen with, so instrumenting a hot path costs one
+attribute increment on an object looked up once: no allocation, no lock and
+no label formatting per event. Each counter or histogram should have a single
+writing thread (HTTP handlers share theirs under a lock). Values other parts
+of the stack already keep (queue depths, the command tracer's counters,
+FrameReader.bad_frames) are registered as callbacks and only read at scrape
+time. render() produces the text exposition format for GET /metrics.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from command_trace import LatencyHistogram, LATENCY_BUCKETS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    """Monotonic count; the hot path does `counter.value += n`"""
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Metric:
+    """One metric family: help text, type and its children keyed by label value
+
+    `children` maps each value of the single label (None for an unlabelled
+    metric) to a Counter, a LatencyHistogram or, for collected metrics, a
+    function returning the current value.
+    """
+
+    def __init__(self, name, kind, documentation, label=None, factory=None):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.documentation = documentation
+        self.label = label
+        self.factory = factory  # builds a child for a new label value; None for collected metrics
+        self.children = {}
+
+    def __getitem__(self, value):
+        return self.children[value]
+
+    def child(self, value):
+        """The child for `value`, created on first use (for label values not known up front)"""
+        child = self.children.get(value)
+        if child is None:
+            child = self.children[value] = self.factory()
+        return child
+
+    def render(self, lines, header=True, extra=''):
+        """Append this family's lines; `extra` is a label pair put on every sample (e.g. robot="r1")"""
+        if header:
+            lines.append(f"# HELP {self.name} {self.documentation}")
+            lines.append(f"# TYPE {self.name} {self.kind}")
+        for value, child in list(self.children.items()):
+            label = extra if value is None else ','.join(filter(None, (extra, f'{self.label}="{_escape(value)}"')))
+            if isinstance(child, LatencyHistogram):
+                separator = ',' if label else ''
+                for bound, total in child.cumulative():
+                    bound = '+Inf' if bound == float('inf') else repr(float(bound))
+                    lines.append(f'{self.name}_bucket{{{label}{separator}le="{bound}"}} {total}')
+                suffix = f'{{{label}}}' if label else ''
+                lines.append(f"{self.name}_sum{suffix} {_number(child.sum)}")
+                lines.append(f"{self.name}_count{suffix} {child.count}")
+            else:
+                sample = child.value if isinstance(child, Counter) else child()
+                lines.append(f"{self.name}{{{label}}} {_number(sample)}" if label
+                             else f"{self.name} {_number(sample)}")
+
+
+class MetricsRegistry:
+    """Named metric families, rendered in registration order
+
+    Registering a name again returns the existing family (or child), so a
+    component created twice for the same controller shares its metrics.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, name, kind, documentation, label, factory=None):
+        metric = self.metrics.get(name)
+        if metric is not None:
+            if metric.kind != kind or metric.label != label:
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+        metric = self.metrics[name] = Metric(name, kind, documentation, label, factory)
+        return metric
+
+    def counter(self, name, documentation, label=None, values=()):
+        """Register a counter; returns the Counter, or the Metric holding one per label value"""
+        metric = self._add(name, 'counter', documentation, label, Counter)
+        for value in values:
+            metric.child(value)
+        return metric.child(None) if label is None else metric
+
+    def histogram(self, name, documentation, label=None, values=(), buckets=LATENCY_BUCKETS):
+        """Register a histogram (seconds); returns the LatencyHistogram, or the Metric holding one per label value"""
+        metric = self._add(name, 'histogram', documentation, label, lambda: LatencyHistogram(buckets))
+        for value in values:
+            metric.child(value)
+        return metric.child(None) if label is None else metric
+
+    def collect(self, name, kind, documentation, function=None, label=None, functions=None):
+        """Register a counter or gauge read at scrape time: `function`, or {label value: function}"""
+        metric = self._add(name, kind, documentation, label)
+        if label is None:
+            metric.children[None] = function
+        else:
+            metric.children.update(functions or {})
+        return metric
+
+    def collect_histograms(self, name, documentation, label, histograms):
+        """Expose LatencyHistograms owned elsewhere (e.g. CommandTracer.histograms) as one family"""
+        metric = self._add(name, 'histogram', documentation, label)
+        metric.children.update(histograms)
+        return metric
+
+    def render_lines(self, lines):
+        for metric in list(self.metrics.values()):
+            metric.render(lines)
+
+
+def render(*registries, label=None, grouped=None):
+    """Text exposition of the given registries (None entries are skipped)
+
+    `grouped` maps values of `label` to registries with the same metric
+    names, e.g. {robot ID: controller.metrics} for a fleet; each family is
+    written once with every group's samples tagged label="value".
+    """
+    lines = []
+    for registry in registries:
+        if registry is not None:
+            registry.render_lines(lines)
+    families = {}
+    for value, registry in (grouped or {}).items():
+        for name, metric in list(registry.metrics.items()):
+            families.setdefault(name, []).append((f'{label}="{_escape(value)}"', metric))
+    for members in families.values():
+        for index, (extra, metric) in enumerate(members):
+            metric.render(lines, header=index == 0, extra=extra)
+    lines.append('')
+    return '\n'.join(lines)
+
+
+def track_requests(app, registry):
+    """Time every request of a Flask app into mirai_http_request_duration_seconds{route}"""
+    from flask import g, request
+
+    latency = registry.histogram('mirai_http_request_duration_seconds',
+                                 'Time to build each response by route (for /stream, until the stream opens)', 'route')
+    lock = threading.Lock()  # handlers run on many threads
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_latency(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            rule = request.url_rule
+            with lock:
+                latency.child(rule.rule if rule is not None else 'unmatched').observe(time.perf_counter() - started)
+        return response
+
+    return latency
+
+
+def serve(registries, host='127.0.0.1', port=9100):
+    """Answer GET /metrics from a daemon thread, for processes without a Flask app (main.py's GUI)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render(*registries).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # scrapes would flood the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
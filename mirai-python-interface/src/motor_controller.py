@@ -2,13 +2,34 @@
 import time
 import json
 import threading
+from collections import namedtuple
 from datetime import datetime
+from types import MappingProxyType
 from serial_interface import SerialInterface
+from command_scheduler import PRIORITY_EMERGENCY
+from telemetry_parser import parse_line, update_motor_data, TelemetryRecord, AckRecord, TextRecord, RECORD_NAMES
+from telemetry_history import TelemetryHistory
+from telemetry_stream import TelemetryBroadcaster
+from telemetry_recording import RecordingWriter, EXTENSION
+from telemetry_recorder import TelemetryRecorder
+from telemetry_pipeline import TelemetryPipeline, PipelineBatch
+
+# Immutable, internally consistent view of the controller state. `cursor` is
+# data_history.total when it was taken, so history reads bounded by it line
+# up with the motor and system values.
+MotorSnapshot = namedtuple('MotorSnapshot', ['motors', 'system', 'cursor', 'published_at'])
+
+
+def _freeze(values):
+    return MappingProxyType(dict(values))
+
 
 class MotorController:
-    def __init__(self, config_path='config/settings.yaml', simulate=False):
+    def __init__(self, config_path='config/settings.yaml', simulate=False, source=None, overrides=None):
         self.simulate = simulate
-        self.serial_interface = SerialInterface(config_path, simulate=simulate)
+        self.serial_interface = SerialInterface(config_path, simulate=simulate, source=source, overrides=overrides)
+        self.command_tracer = self.serial_interface.command_tracer
+        self.metrics = self.serial_interface.metrics
         self.motor_data = {
             'left': {'speed': 0, 'target': 0, 'direction': 'STOPPED', 'pulses': 0, 'rpm': 0, 'mph': 0, 'kph': 0},
             'right': {'speed': 0, 'target': 0, 'direction': 'STOPPED', 'pulses': 0, 'rpm': 0, 'mph': 0, 'kph': 0}
@@ -21,51 +42,104 @@ class MotorController:
             'serial_connected': False,
             'simulation_mode': simulate
         }
-        self.data_history = {
-            'timestamp': [],
-            'left_speed': [],
-            'right_speed': [],
-            'left_target': [],
-            'right_target': [],
-            'left_pulses': [],
-            'right_pulses': [],
-            'left_rpm': [],
-            'right_rpm': []
-        }
         self.update_thread = None
         self.running = False
-        self.max_history = 1000
+        self.loop = None  # fleet.SerialEventLoop servicing this controller, if any
+        visualization = self.serial_interface.config.get('visualization', {})
+        self.max_history = visualization.get('history_length', 1000)
+        self.data_history = TelemetryHistory(self.max_history)
+        web = self.serial_interface.config.get('web', {})
+        self.telemetry_stream = TelemetryBroadcaster(
+            max_rate=web.get('stream_max_rate', 20),
+            keepalive=web.get('stream_keepalive', 15)
+        )
+        self._stream_cursor = 0
+        recording = self.serial_interface.config.get('recording', {})
+        self.recorder = None
+        if recording.get('enabled', False):
+            self.recorder = TelemetryRecorder(
+                directory=recording.get('directory', 'recordings'),
+                segment_seconds=recording.get('segment_seconds', 900),
+                segment_max_bytes=int(recording.get('segment_max_mb', 64) * 2 ** 20),
+                retention_hours=recording.get('retention_hours', 72),
+                max_total_bytes=int(recording.get('max_total_mb', 2048) * 2 ** 20),
+                buffer_items=recording.get('buffer_items', 100000),
+                chunk_rows=recording.get('chunk_rows', 4096),
+                compression_level=recording.get('compression_level', 6),
+                metadata={'simulation_mode': simulate}
+            )
+        # parse -> store -> fan-out of what the serial interface ingests (see telemetry_pipeline)
+        pipeline = self.serial_interface.config.get('pipeline', {})
+        self.pipeline = TelemetryPipeline(
+            self.metrics, self.serial_interface.data_queue,
+            max_items=pipeline.get('sink_max_items', 10000),
+            policy=pipeline.get('sink_policy', 'drop_oldest')
+        )
+        if self.recorder:
+            self.pipeline.add_sink('recorder', self._record)
+        # Writers (the update thread and command methods) serialise on this
+        # lock and publish a fresh snapshot; readers never take it
+        self._state_lock = threading.Lock()
+        self._snapshot = None
+        self._publish()
+        self._register_metrics()
     
-    def start(self):
-        self.serial_interface.start()
+    def _register_metrics(self):
+        metrics = self.metrics
+        parsed = metrics.counter('mirai_records_parsed_total', 'Items processed by the update loop, by record type',
+                                 'type', RECORD_NAMES.values())
+        # Looked up by type(record) in _store, so counting is one dict get and an increment
+        self._parsed_counters = {record_type: parsed[name] for record_type, name in RECORD_NAMES.items()}
+        self._parse_errors = metrics.counter('mirai_parse_errors_total',
+                                             'Items the update loop failed to parse or apply (malformed lines)')
+        self._dropped = metrics.collect(
+            'mirai_items_dropped_total', 'counter', 'Items lost on the way to the history store, recorder or sinks',
+            label='reason', functions={
+                'ingest_full': lambda: self.serial_interface.data_queue.dropped.value,
+                'parse_error': lambda: self._parse_errors.value,
+                'bad_frame': self.serial_interface.get_bad_frame_count,
+                'recorder_full': lambda: self.recorder.dropped if self.recorder else 0,
+                'sink_full': self.pipeline.sink_dropped
+            })
+        metrics.collect('mirai_history_samples_total', 'counter', 'Samples appended to the telemetry history',
+                        lambda: self.data_history.total)
+    
+    def start(self, loop=None):
+        """Start the serial link and the update loop, or hand both to a shared fleet.SerialEventLoop"""
+        if self.recorder:
+            self.recorder.start()
         self.running = True
-        self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
-        self.update_thread.start()
+        if loop is not None and loop.can_service(self):
+            self.loop = loop
+            loop.add(self)
+        else:
+            self.serial_interface.start()
+            self.update_thread = threading.Thread(target=self._update_loop, daemon=True)
+            self.update_thread.start()
         print("Motor controller started" + (" in simulation mode" if self.simulate else ""))
     
     def stop(self):
         self.running = False
+        self.telemetry_stream.close()
+        if self.loop is not None:
+            self.loop.remove(self)  # before the port closes under its selector
         self.serial_interface.stop()
         if self.update_thread and self.update_thread.is_alive():
             self.update_thread.join(timeout=1.0)
+        self.pipeline.stop()
+        if self.recorder:
+            self.recorder.stop()
         print("Motor controller stopped")
     
     def _update_loop(self):
         while self.running:
             try:
-                # Only try to get data if serial is connected
-                if self.serial_interface.is_connected():
-                    data = self.serial_interface.get_all_data()
-                    for line in data:
-                        self._process_data(line)
-                else:
-                    # If not connected, try to reconnect every 5 seconds
-                    time.sleep(5)
-                    if not self.simulate:
-                        self.serial_interface.start()  # Try to restart
+                # The serial interface reconnects on its own read thread; lines read
+                # before a loss and the banner of a reconnect are processed either way
+                self.process_pending()
                 
                 # Update serial connection status
-                self.system_status['serial_connected'] = self.serial_interface.is_connected()
+                self.update_connection_status()
                 
                 time.sleep(0.01)
                 
@@ -73,83 +147,134 @@ class MotorController:
                 print(f"Error in update loop: {e}")
                 time.sleep(1)
     
+    def process_pending(self):
+        """Run everything ingested since the last call through parse, store and fan-out; returns the item count"""
+        items = self.serial_interface.get_all_data()
+        if not items:
+            return 0
+        pipeline = self.pipeline
+        # Parse outside the state lock; only applying the records needs it
+        records = [self._parse(item) for item in items]
+        pipeline.count('parse', len(items))
+        with self._state_lock:
+            first = self.data_history.total
+            for item, record in zip(items, records):
+                if record is not None:
+                    self._store(item, record)
+            self._publish()
+            cursor = self.data_history.total
+        pipeline.count('store', cursor - first)
+        pipeline.dispatch(PipelineBatch(items, records, first, cursor, time.time()))
+        return len(items)
+    
+    def add_sink(self, name, consume, threaded=False, max_items=None, policy=None):
+        """Call consume(telemetry_pipeline.PipelineBatch) for every processed batch (see TelemetryPipeline.add_sink)"""
+        self.pipeline.add_sink(name, consume, threaded, max_items, policy)
+    
+    def remove_sink(self, name):
+        self.pipeline.remove_sink(name)
+    
+    def _record(self, batch):
+        """Recorder sink: hand over a copy of the batch's samples; all file I/O happens on the recorder's thread"""
+        self.recorder.record(batch.items, self.data_history.read(batch.first, batch.cursor))
+    
+    def update_connection_status(self):
+        """Publish a change of the serial connection state"""
+        connected = self.serial_interface.is_connected()
+        if connected != self.system_status['serial_connected']:
+            with self._state_lock:
+                self.system_status['serial_connected'] = connected
+                self._publish()
+    
     def _process_data(self, data):
+        """Parse and store a single item; call with _state_lock held"""
+        record = self._parse(data)
+        if record is not None:
+            self._store(data, record)
+    
+    def _parse(self, data):
+        """Parse stage: the record for a line (binary frames arrive already decoded), None if malformed"""
+        if not isinstance(data, str):
+            return data
         try:
-            # Process different data formats
-            if data.startswith('Left - ') or data.startswith('Right - '):
-                # New speed format with RPM data
-                if 'Left -' in data:
-                    parts = data.split('Left - ')[1].split()
-                    for part in parts:
-                        if 'RPM:' in part:
-                            self.motor_data['left']['rpm'] = float(part.split(':')[1])
-                        elif 'MPH:' in part:
-                            self.motor_data['left']['mph'] = float(part.split(':')[1])
-                        elif 'KPH:' in part:
-                            self.motor_data['left']['kph'] = float(part.split(':')[1])
-                
-                if 'Right -' in data:
-                    parts = data.split('Right - ')[1].split()
-                    for part in parts:
-                        if 'RPM:' in part:
-                            self.motor_data['right']['rpm'] = float(part.split(':')[1])
-                        elif 'MPH:' in part:
-                            self.motor_data['right']['mph'] = float(part.split(':')[1])
-                        elif 'KPH:' in part:
-                            self.motor_data['right']['kph'] = float(part.split(':')[1])
-            
-            elif data.startswith('STATUS:'):
-                parts = data.split(':')
-                if len(parts) >= 4:
-                    motor = 'left' if parts[1] == 'ML' else 'right'
-                    self.motor_data[motor]['direction'] = parts[2]
-                    self.motor_data[motor]['speed'] = int(parts[3])
-            
-            elif data.startswith('PULSES:'):
-                parts = data.split(':')
-                if len(parts) >= 3:
-                    self.motor_data['left']['pulses'] = int(parts[1])
-                    self.motor_data['right']['pulses'] = int(parts[2])
-            
-            elif data.startswith('ACK:'):
-                # Process acknowledgments
-                pass
-            
-            elif data.startswith('DIAG:'):
-                # Process diagnostic data
-                pass
+            return parse_line(data)
+        except Exception as e:
+            self._parse_errors.value += 1
+            print(f"Error processing data: {e}")
+            return None
+    
+    def _store(self, data, record):
+        """Store stage: apply a record to the motor state, command tracer and history"""
+        try:
+            update_motor_data(self.motor_data, record)
+            record_type = type(record)
+            self._parsed_counters[record_type].value += 1
+            if record_type is TelemetryRecord:
+                self.system_status['emergency_stop'] = record.emergency_stop
+                self.system_status['braking'] = record.soft_brake or record.hard_brake
+                self.command_tracer.observe_telemetry(record)
+            elif record_type is TextRecord or record_type is AckRecord:
+                # Command replies: ✅/🚨/❌ lines and ACK:<command>[:<value>]
+                self.command_tracer.observe_reply(data)
             
             # Update data history
-            timestamp = datetime.now()
-            self.data_history['timestamp'].append(timestamp)
-            self.data_history['left_speed'].append(self.motor_data['left']['speed'])
-            self.data_history['right_speed'].append(self.motor_data['right']['speed'])
-            self.data_history['left_target'].append(self.motor_data['left']['target'])
-            self.data_history['right_target'].append(self.motor_data['right']['target'])
-            self.data_history['left_pulses'].append(self.motor_data['left']['pulses'])
-            self.data_history['right_pulses'].append(self.motor_data['right']['pulses'])
-            self.data_history['left_rpm'].append(self.motor_data['left']['rpm'])
-            self.data_history['right_rpm'].append(self.motor_data['right']['rpm'])
-            
-            # Keep history within limits
-            for key in self.data_history:
-                if len(self.data_history[key]) > self.max_history:
-                    self.data_history[key] = self.data_history[key][-self.max_history:]
+            left = self.motor_data['left']
+            right = self.motor_data['right']
+            self.data_history.append(
+                time.time(),
+                left['speed'], right['speed'],
+                left['target'], right['target'],
+                left['pulses'], right['pulses'],
+                left['rpm'], right['rpm']
+            )
                     
         except Exception as e:
+            self._parse_errors.value += 1
             print(f"Error processing data: {e}")
     
+    def _publish(self):
+        """Swap in a new snapshot of the current state; call with _state_lock held"""
+        self._snapshot = MotorSnapshot(
+            MappingProxyType({motor: _freeze(values) for motor, values in self.motor_data.items()}),
+            _freeze(self.system_status),
+            self.data_history.total,
+            time.time()
+        )
+        if not self.telemetry_stream.publish(self._encode_stream_frame):
+            # Nobody listening: keep the cursor current, so the first frame after a
+            # subscribe carries one batch, not everything since the last listener left
+            self._stream_cursor = self._snapshot.cursor
+    
+    def _encode_stream_frame(self):
+        """Encode the current snapshot and the history added since the previous frame as one SSE event"""
+        snapshot = self._snapshot
+        frame = self.get_history_since(self._stream_cursor, snapshot)
+        frame['status'] = self.get_status(snapshot)
+        frame['status']['timestamp'] = datetime.fromtimestamp(snapshot.published_at).isoformat()
+        self._stream_cursor = snapshot.cursor
+        return b'event: telemetry\ndata: ' + json.dumps(frame, separators=(',', ':')).encode() + b'\n\n'
+    
+    def _set_targets(self, speed, motors=('left', 'right')):
+        with self._state_lock:
+            for motor in motors:
+                self.motor_data[motor]['target'] = speed
+            self._publish()
+    
+    def _set_system(self, **values):
+        with self._state_lock:
+            self.system_status.update(values)
+            self._publish()
+    
     # Motor control commands
     def set_speed(self, motor, speed):
         if motor in ['left', 'right']:
             motor_code = 'ML' if motor == 'left' else 'MR'
             self.serial_interface.send_command(f"{motor_code}:{speed}")
-            self.motor_data[motor]['target'] = speed
+            self._set_targets(speed, (motor,))
     
     def set_both_speeds(self, speed):
         self.serial_interface.send_command(f"BOTH:{speed}")
-        self.motor_data['left']['target'] = speed
-        self.motor_data['right']['target'] = speed
+        self._set_targets(speed)
     
     def set_direction(self, motor, direction):
         if motor == 'both':
@@ -163,29 +288,27 @@ class MotorController:
     
     def stop_motors(self):
         self.serial_interface.send_command('S')
-        self.motor_data['left']['target'] = 0
-        self.motor_data['right']['target'] = 0
+        self._set_targets(0)
     
     def coast_motors(self):
         self.serial_interface.send_command('COAST')
-        self.motor_data['left']['target'] = 0
-        self.motor_data['right']['target'] = 0
+        self._set_targets(0)
     
     def emergency_stop(self):
         self.serial_interface.send_command('E')
-        self.system_status['emergency_stop'] = True
+        self._set_system(emergency_stop=True)
     
     def clear_emergency(self):
         self.serial_interface.send_command('C')
-        self.system_status['emergency_stop'] = False
+        self._set_system(emergency_stop=False)
     
     def activate_soft_brake(self):
         self.serial_interface.send_command('SOFTBRAKE')
-        self.system_status['braking'] = True
+        self._set_system(braking=True)
     
     def activate_hard_brake(self):
         self.serial_interface.send_command('HARDBRAKE')
-        self.system_status['braking'] = True
+        self._set_system(braking=True)
     
     def print_diagnostics(self):
         """Print diagnostic information to console"""
@@ -198,34 +321,93 @@ class MotorController:
         print(f"Braking: {status['system']['braking']}")
         print(f"Left Motor - Speed: {status['motors']['left']['speed']}, Target: {status['motors']['left']['target']}, RPM: {status['motors']['left']['rpm']}")
         print(f"Right Motor - Speed: {status['motors']['right']['speed']}, Target: {status['motors']['right']['target']}, RPM: {status['motors']['right']['rpm']}")
+        latency = self.serial_interface.get_command_latency_stats()
+        if latency['count']:
+            print(f"Command Latency - p50: {latency['p50_ms']:.2f} ms, p99: {latency['p99_ms']:.2f} ms, max: {latency['max_ms']:.2f} ms ({latency['count']} commands)")
+        emergency = self.serial_interface.get_command_latency_stats(PRIORITY_EMERGENCY)
+        if emergency['count']:
+            print(f"Emergency Lane Latency - max: {emergency['max_ms']:.2f} ms ({emergency['count']} commands)")
+        print(f"Coalesced Setpoints: {self.serial_interface.command_queue.coalesced}")
+        trace = self.command_tracer.get_stats(recent=False)
+        for stage in ('round_trip', 'total'):
+            summary = trace['stages'][stage]
+            if summary['count']:
+                print(f"Command {stage.replace('_', ' ').title()} - p50: {summary['p50_ms']:.2f} ms, "
+                      f"p99: {summary['p99_ms']:.2f} ms ({summary['count']} commands)")
+        pipeline = self.pipeline.get_stats()
+        print("Pipeline - " + ", ".join(f"{stage} {counts['items']}" for stage, counts in pipeline['stages'].items())
+              + f" items, {pipeline['queued']} queued, {pipeline['stages']['ingest']['dropped']} shed at ingest")
+        for name, sink in pipeline['sinks'].items():
+            if sink['threaded']:
+                print(f"Sink {name} - {sink['queued']} queued, {sink['dropped']} dropped ({sink['policy']}), "
+                      f"{sink['errors']} errors")
+        if self.recorder:
+            recorder = self.recorder.get_stats()
+            print(f"Recorder - {recorder['recorded']} items in {recorder['segments']} segments, "
+                  f"{recorder['dropped']} dropped, {recorder['queued']} queued, {recorder['write_errors']} write errors")
         print("==========================================\n")
     
-    def get_status(self):
+    def get_snapshot(self):
+        """Latest immutable MotorSnapshot; lock-free, safe from any thread"""
+        return self._snapshot
+    
+    def get_status(self, snapshot=None):
+        snapshot = snapshot or self._snapshot
         return {
-            'motors': self.motor_data,
-            'system': self.system_status,
+            'motors': {motor: dict(values) for motor, values in snapshot.motors.items()},
+            'system': dict(snapshot.system),
+            'dropped': self.get_drop_counts(),
             'timestamp': datetime.now()
         }
     
-    def get_history(self):
-        return self.data_history
+    def get_drop_counts(self):
+        """Items lost since start by reason (mirai_items_dropped_total), for the dashboards"""
+        return {reason: count() for reason, count in self._dropped.children.items()}
+    
+    def get_history(self, limit=None, snapshot=None):
+        """Newest `limit` history samples up to the snapshot, as lists (timestamps in epoch seconds)"""
+        snapshot = snapshot or self._snapshot
+        return self.data_history.to_lists(limit, stop=snapshot.cursor)
+    
+    def get_history_since(self, since=None, snapshot=None):
+        """History samples added after cursor `since`, for incremental /history polling
+        
+        Returns the snapshot cursor to pass back as `since` next time, the
+        cursor of the first returned sample and the columns as lists. `reset`
+        tells the client to replace rather than append: on the first request,
+        after a controller restart, or when it fell behind the ring buffer.
+        """
+        snapshot = snapshot or self._snapshot
+        reset = since is None or since > snapshot.cursor
+        start, columns = self.data_history.since(0 if reset else since, stop=snapshot.cursor)
+        return {
+            'cursor': snapshot.cursor,
+            'start': start,
+            'reset': reset or start > since,
+            'columns': columns
+        }
+    
+    def get_history_window(self, limit=None, snapshot=None):
+        """Newest `limit` history samples up to the snapshot as NumPy arrays, without copying where possible"""
+        snapshot = snapshot or self._snapshot
+        return self.data_history.window(limit, stop=snapshot.cursor)
     
     def save_data(self, filename=None):
+        """Write the retained history to a compressed columnar recording (see telemetry_recording)"""
         if filename is None:
-            filename = f"motor_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            filename = f"motor_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}{EXTENSION}"
         
-        data_to_save = {
-            'metadata': {
-                'export_date': datetime.now().isoformat(),
-                'data_points': len(self.data_history['timestamp']),
-                'simulation_mode': self.simulate
-            },
-            'data': self.data_history
+        recording = self.serial_interface.config.get('recording', {})
+        metadata = {
+            'export_date': datetime.now().isoformat(),
+            'simulation_mode': self.simulate
         }
         
         try:
-            with open(filename, 'w') as f:
-                json.dump(data_to_save, f, indent=2, default=str)
+            with RecordingWriter(filename, metadata,
+                                 chunk_rows=recording.get('chunk_rows', 4096),
+                                 compression_level=recording.get('compression_level', 6)) as writer:
+                writer.append_columns(self.data_history.read(0, self._snapshot.cursor))
             return filename
         except Exception as e:
             print(f"Error saving data: {e}")
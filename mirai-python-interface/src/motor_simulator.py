@@ -0,0 +1,361 @@
+# motor_simulator.py
+"""Simulated Arduino and hoverboard motors for --simulate mode
+
+MotorSimulator stands in for the serial port as a SerialInterface data
+source. It accepts the firmware's text commands (processSerialCommand() in
+communication.cpp), answers with the same reply lines, and steps a model of
+both motors at a fixed rate in real time, emitting one telemetry item per
+step:
+
+- drive: the PID settings from settings.yaml trim a feed-forward PWM from
+  the target speed (target 255 = max_rpm); the wheel speed follows the PWM
+  with a first-order lag of `time_constant` seconds (motor and wheel inertia)
+- coast: PWM 0 and the brake released, the wheel spins down on friction
+  with the longer `coast_time_constant`
+- brake: the brake pin engaged by HB or E decelerates the wheel at
+  `brake_decel` RPM/s; a soft brake ramps the setpoint to 0 over
+  SOFT_BRAKE_TIME like calculateBrakeSpeed()
+- hall pulses accumulate per motor.<side>.pulses_per_rotation
+
+With protocol 'binary' each step is a TelemetryRecord, as decoded from a
+negotiated binary frame; with 'text' it is the writeToSerial() speed line.
+The model is deterministic for a given seed and command sequence.
+"""
+import random
+import threading
+import time
+
+from telemetry_parser import TelemetryRecord
+
+# Firmware constants (config.h) the model mirrors
+SOFT_BRAKE_TIME = 1.0  # seconds
+WHEEL_CIRCUMFERENCE_IN = 22.25
+WHEEL_CIRCUMFERENCE_CM = 56.5
+DEFAULT_FORWARD_SPEED = 150  # F/R from standstill
+
+# The feed-forward covers large steps; the integral only trims errors smaller than this (PWM units)
+INTEGRAL_BAND = 25
+
+# Steps released per read() at most; beyond this a stalled consumer resyncs instead of catching up
+MAX_CATCH_UP_STEPS = 1000
+
+_new = tuple.__new__
+
+
+def speed_line(left_rpm, right_rpm):
+    """writeToSerial()'s combined telemetry line for the given wheel speeds"""
+    return (f"Left - RPM:{left_rpm:.2f} MPH:{left_rpm * WHEEL_CIRCUMFERENCE_IN * 60 / 63360:.2f} "
+            f"KPH:{left_rpm * WHEEL_CIRCUMFERENCE_CM * 60 / 100000:.2f} | "
+            f"Right - RPM:{right_rpm:.2f} MPH:{right_rpm * WHEEL_CIRCUMFERENCE_IN * 60 / 63360:.2f} "
+            f"KPH:{right_rpm * WHEEL_CIRCUMFERENCE_CM * 60 / 100000:.2f}")
+
+
+class SimulatedMotor:
+    """One wheel: PID-trimmed drive, inertia, brake and hall pulse counting"""
+
+    def __init__(self, name, pulses_per_rotation, pid):
+        self.name = name
+        self.pulses_per_rotation = pulses_per_rotation
+        self.kp = pid.get('kp', 0.15)
+        self.ki = pid.get('ki', 0.7)
+        self.kd = pid.get('kd', 0.001)
+        self.max_integral = pid.get('max_integral', 50)
+        self.target_speed = 0
+        self.current_speed = 0  # PWM applied this step
+        self.direction = 'STOPPED'
+        self.brake_engaged = False
+        self.is_braking = False  # soft brake in progress
+        self.velocity = 0.0  # signed RPM, negative in reverse
+        self.pulse_total = 0.0
+        self.reset_pid()
+
+    def reset_pid(self):
+        self.integral = 0.0
+        self.prev_error = 0.0
+        self.setpoint = 0.0
+        self.error = 0.0
+
+    def tune_pid(self, kp, ki, kd, max_integral):
+        self.kp, self.ki, self.kd, self.max_integral = kp, ki, kd, max_integral
+        self.integral = 0.0
+
+    def pid_status(self):
+        return (f"🔧 {self.name} PID: Kp={self.kp:.3f} Ki={self.ki:.3f} Kd={self.kd:.3f} | "
+                f"SP={self.setpoint:.1f} RPM={abs(self.velocity):.1f} PWM={float(self.current_speed):.1f} "
+                f"Err={self.error:.1f} I={self.integral:.1f}")
+
+    def step(self, dt, setpoint_speed, max_rpm, time_constant, coast_time_constant, brake_decel):
+        """Advance the motor by dt seconds towards setpoint_speed (0-255)"""
+        rpm = abs(self.velocity)
+        if self.brake_engaged or self.direction not in ('FORWARD', 'REVERSE'):
+            self.current_speed = 0
+            self.setpoint = 0.0
+        else:
+            # computePID(): the RPM error is scaled to PWM units (255 PWM / max_rpm)
+            self.setpoint = setpoint_speed * max_rpm / 255.0
+            self.error = (self.setpoint - rpm) * 255.0 / max_rpm
+            if abs(self.error) < INTEGRAL_BAND:
+                self.integral = min(max(self.integral + self.error * dt, -self.max_integral), self.max_integral)
+            derivative = (self.error - self.prev_error) / dt
+            self.prev_error = self.error
+            correction = self.kp * self.error + self.ki * self.integral + self.kd * derivative
+            output = setpoint_speed + correction if setpoint_speed else 0
+            self.current_speed = int(min(max(output, 0), 255))
+
+        if self.brake_engaged:
+            change = min(rpm, brake_decel * dt)
+            self.velocity -= change if self.velocity > 0 else -change
+        else:
+            sign = -1.0 if self.direction == 'REVERSE' else 1.0
+            drive = sign * self.current_speed * max_rpm / 255.0
+            tau = time_constant if self.current_speed else coast_time_constant
+            self.velocity += (drive - self.velocity) * min(1.0, dt / tau)
+            if not self.current_speed and abs(self.velocity) < 0.05:
+                self.velocity = 0.0
+        self.pulse_total += abs(self.velocity) / 60.0 * self.pulses_per_rotation * dt
+
+    def pulses(self):
+        # A telemetry frame carries the count as 16 bits, which wraps
+        return (int(self.pulse_total) + 32768) % 65536 - 32768
+
+
+class MotorSimulator:
+    """Data source for SerialInterface that simulates the firmware and both motors
+
+    read() blocks until the next step is due (or the timeout passes) and
+    returns the command replies and telemetry produced since the last call.
+    write() applies a command immediately, as the firmware's loop would on
+    its next pass.
+    """
+
+    def __init__(self, motor_config=None, pid_config=None, rate_hz=1000, protocol='binary',
+                 max_rpm=300.0, time_constant=0.25, coast_time_constant=2.0, brake_decel=1500.0,
+                 noise_rpm=0.0, seed=0):
+        motor_config = motor_config or {}
+        pid_config = pid_config or {}
+        self.rate_hz = rate_hz
+        self.protocol = protocol
+        self.max_rpm = max_rpm
+        self.time_constant = time_constant
+        self.coast_time_constant = coast_time_constant
+        self.brake_decel = brake_decel
+        self.noise_rpm = noise_rpm
+        self.left = SimulatedMotor('Left', motor_config.get('left', {}).get('pulses_per_rotation', 44.0), pid_config)
+        self.right = SimulatedMotor('Right', motor_config.get('right', {}).get('pulses_per_rotation', 45.0), pid_config)
+        self.emergency_stop = False
+        self.soft_brake_active = False
+        self.hard_brake_active = False
+        self._soft_brake_started = 0.0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._replies = []
+        self._started = None  # perf_counter of step 0
+        self.steps = 0
+        self.commands = 0
+        self.skipped = 0  # steps dropped while the consumer was stalled
+
+    def describe(self):
+        return f"Simulated motors at {self.rate_hz:g} Hz ({self.protocol} telemetry)"
+
+    def read(self, timeout=0.5):
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+        due = self._started + (self.steps + 1) / self.rate_hz
+        if due > now and not self._replies:
+            if due - now > timeout:
+                time.sleep(timeout)
+                return []
+            time.sleep(due - now)
+            now = time.perf_counter()
+        with self._lock:
+            items, self._replies = self._replies, []
+            pending = int((now - self._started) * self.rate_hz) - self.steps
+            if pending > MAX_CATCH_UP_STEPS:
+                self.skipped += pending - MAX_CATCH_UP_STEPS
+                self._started += (pending - MAX_CATCH_UP_STEPS) / self.rate_hz
+                pending = MAX_CATCH_UP_STEPS
+            for _ in range(pending):
+                items.append(self._step())
+        return items
+
+    def run(self, seconds):
+        """Step the model `seconds` of simulated time without waiting, for offline use; returns the items"""
+        with self._lock:
+            items, self._replies = self._replies, []
+            for _ in range(int(seconds * self.rate_hz)):
+                items.append(self._step())
+        return items
+
+    def _step(self):
+        dt = 1.0 / self.rate_hz
+        self.steps += 1
+        elapsed = self.steps * dt
+        soft_brake_scale = 1.0
+        if self.soft_brake_active:
+            progress = min(1.0, (elapsed - self._soft_brake_started) / SOFT_BRAKE_TIME)
+            soft_brake_scale = 1.0 - progress * progress
+            if progress >= 1.0:
+                self.soft_brake_active = False
+                for motor in (self.left, self.right):
+                    motor.is_braking = False
+                    motor.target_speed = 0
+                self._replies.append("✅ Soft brake complete")
+        for motor in (self.left, self.right):
+            motor.step(dt, motor.target_speed * soft_brake_scale, self.max_rpm,
+                       self.time_constant, self.coast_time_constant, self.brake_decel)
+        return self._telemetry(int(elapsed * 1000))
+
+    def _measured_rpm(self, motor):
+        rpm = abs(motor.velocity)
+        if rpm and self.noise_rpm:
+            rpm = max(0.0, rpm + self._random.gauss(0.0, self.noise_rpm))
+        return rpm
+
+    def _telemetry(self, millis):
+        left_rpm = self._measured_rpm(self.left)
+        right_rpm = self._measured_rpm(self.right)
+        if self.protocol != 'binary':
+            return speed_line(left_rpm, right_rpm)
+        values = [self.steps & 0xFF, millis & 0xFFFFFFFF,
+                  self.emergency_stop, self.soft_brake_active, self.hard_brake_active]
+        for motor, rpm in ((self.left, left_rpm), (self.right, right_rpm)):
+            values += [motor.current_speed, motor.target_speed, motor.direction, motor.is_braking, motor.pulses(),
+                       round(rpm, 1), round(rpm * WHEEL_CIRCUMFERENCE_IN * 60 / 63360, 2),
+                       round(rpm * WHEEL_CIRCUMFERENCE_CM * 60 / 100000, 2)]
+        return _new(TelemetryRecord, values)
+
+    def write(self, command):
+        with self._lock:
+            self.commands += 1
+            self._replies.extend(self._process_command(command.strip().upper()))
+
+    def _process_command(self, command):
+        """processSerialCommand(): apply one command and return the reply lines"""
+        left, right = self.left, self.right
+        if not command:
+            return []
+        if command.startswith('PROTO:'):
+            return self._process_protocol(command[6:])
+        if self.emergency_stop and command not in ('C', 'CLEAR'):
+            return ["🚨 EMERGENCY STOP ACTIVE - Use 'C' to clear"]
+
+        if command in ('F', 'FORWARD', 'R', 'REVERSE'):
+            direction = 'FORWARD' if command.startswith('F') else 'REVERSE'
+            for motor in (left, right):
+                motor.direction = direction
+                motor.brake_engaged = False
+                motor.target_speed = motor.current_speed if motor.current_speed > 0 else DEFAULT_FORWARD_SPEED
+            return [f"✅ Both motors {direction} | Speed: {left.target_speed}"]
+        if command in ('S', 'STOP'):
+            left.target_speed = right.target_speed = 0
+            return ["✅ Stopping both motors"]
+        if command == 'COAST':
+            for motor in (left, right):
+                motor.brake_engaged = False
+                motor.direction = 'COASTING'
+                motor.target_speed = motor.current_speed = 0
+            return ["✅ Motors coasting (free spin)"]
+        if command in ('SOFTBRAKE', 'SB'):
+            self.soft_brake_active = True
+            self.hard_brake_active = False
+            self._soft_brake_started = self.steps / self.rate_hz
+            left.is_braking = right.is_braking = True
+            return ["✅ Soft brake activated"]
+        if command in ('HARDBRAKE', 'HB'):
+            self.soft_brake_active = False
+            self._stop_motors()
+            return ["✅ Hard brake activated"]
+        if command in ('E', 'EMERGENCY'):
+            self.soft_brake_active = self.hard_brake_active = False
+            self._stop_motors()
+            self.emergency_stop = True
+            return ["🚨 EMERGENCY STOP ACTIVATED"]
+        if command in ('C', 'CLEAR'):
+            self.emergency_stop = False
+            for motor in (left, right):
+                motor.brake_engaged = False
+                motor.direction = 'COASTING'
+                motor.current_speed = 0
+            return ["✅ Emergency cleared"]
+        if command == 'STATUS':
+            lines = [f"📊 Motor {motor.name[0]}: {motor.direction} at {motor.current_speed}/255" for motor in (left, right)]
+            lines += [left.pid_status(), right.pid_status()]
+            return lines
+        if command in ('HELP', '?'):
+            return ["📋 Simulated controller: F R S COAST SB HB E C STATUS 0-255 ML: MR: BOTH: PID PIDL: PIDR: "
+                    "PIDBOTH: PROTO:BIN PROTO:TEXT"]
+        if command in ('D', 'DIAG'):
+            return [f"Motor {motor.name[0]} Status: {motor.direction} speed={motor.current_speed} "
+                    f"target={motor.target_speed} rpm={abs(motor.velocity):.1f} pulses={motor.pulses()}"
+                    for motor in (left, right)]
+
+        for prefix, motors, label in (('ML:', (left,), 'Motor L'), ('MR:', (right,), 'Motor R'),
+                                      ('BOTH:', (left, right), 'Both motors')):
+            if command.startswith(prefix):
+                value = command[len(prefix):]
+                if value.isdigit() and int(value) <= 255:
+                    self._set_speed(motors, int(value))
+                    return [f"✅ {label} speed set to: {value}"]
+                return []
+        if command.isdigit():
+            if int(command) <= 255:
+                self._set_speed((left, right), int(command))
+                return [f"✅ Both motors speed set to: {command}"]
+            return ["❌ Speed must be 0-255"]
+        if command.startswith('ROS:'):
+            return [f"📡 ROS2 Command: {command}"]
+        if command.startswith('PID'):
+            return self._process_pid(command)
+        return [f"❌ Unknown command: '{command}'", "💡 Type 'HELP' for available commands"]
+
+    def _set_speed(self, motors, speed):
+        for motor in motors:
+            motor.target_speed = speed
+            if speed and motor.direction in ('STOPPED', 'COASTING'):
+                # setMotorSpeed(): release the brake and default to forward
+                motor.direction = 'FORWARD'
+                motor.brake_engaged = False
+
+    def _stop_motors(self):
+        """stopMotor() on both sides: brake pin engaged, PWM and targets zeroed"""
+        for motor in (self.left, self.right):
+            motor.brake_engaged = True
+            motor.is_braking = False
+            motor.direction = 'STOPPED'
+            motor.target_speed = motor.current_speed = 0
+            motor.reset_pid()
+
+    def _process_protocol(self, mode):
+        mode = mode.partition(':')[0]
+        if mode == 'BIN':
+            # The step rate stays rate_hz; only the encoding changes
+            self.protocol = 'binary'
+            return [f"PROTO:BIN:OK:{1000.0 / self.rate_hz:g}"]
+        if mode == 'TEXT':
+            self.protocol = 'text'
+            return ["PROTO:TEXT:OK"]
+        return [f"❌ Unknown protocol: '{mode}'"]
+
+    def _process_pid(self, command):
+        """processPIDCommand(): status, reset and Kp,Ki,Kd,MaxI tuning"""
+        if command in ('PID', 'PIDSTATUS'):
+            return [self.left.pid_status(), self.right.pid_status()]
+        for prefix, motors in (('PIDL:', (self.left,)), ('PIDR:', (self.right,)),
+                               ('PIDBOTH:', (self.left, self.right))):
+            if not command.startswith(prefix):
+                continue
+            params = command[len(prefix):]
+            if params == 'RESET':
+                for motor in motors:
+                    motor.reset_pid()
+                return [f"✅ {'Both PIDs' if len(motors) == 2 else motors[0].name + ' PID'} reset"]
+            try:
+                kp, ki, kd, max_integral = (float(value) for value in params.split(','))
+            except ValueError:
+                return ["❌ Invalid PID format. Use: Kp,Ki,Kd,MaxI"]
+            for motor in motors:
+                motor.tune_pid(kp, ki, kd, max_integral)
+            return [f"✅ {motor.name} PID tuned: Kp={kp:.3f}, Ki={ki:.3f}, Kd={kd:.3f}, MaxI={max_integral:.1f}"
+                    for motor in motors]
+        return [f"❌ Unknown PID command: '{command}'"]
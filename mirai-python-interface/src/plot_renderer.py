@@ -0,0 +1,352 @@
+# plot_renderer.py
+"""Live telemetry plot engines for DataVisualizer
+
+Both renderers take the same NumPy history window and system status and
+expose the result as a pygame surface sized to the plot panel:
+
+- MatplotlibPlotRenderer: matplotlib Agg with blitted artists
+- PygamePlotRenderer: draws straight onto pygame surfaces, no matplotlib
+
+Pick one with `visualization.plot_backend` in settings.yaml.
+"""
+import numpy as np
+import pygame
+
+PLOT_BACKENDS = ('matplotlib', 'pygame')
+DPI = 100
+
+# (axes index, history column, label, color, linestyle)
+PLOT_LINES = (
+    (0, 'left_speed', 'Left Speed', 'red', '-'),
+    (0, 'right_speed', 'Right Speed', 'green', '-'),
+    (1, 'left_target', 'Left Target', 'red', '--'),
+    (1, 'left_speed', 'Left Actual', 'red', '-'),
+    (1, 'right_target', 'Right Target', 'green', '--'),
+    (1, 'right_speed', 'Right Actual', 'green', '-'),
+    (2, 'left_rpm', 'Left RPM', 'red', '-'),
+    (2, 'right_rpm', 'Right RPM', 'green', '-')
+)
+PLOT_TITLES = ('Motor Speeds', 'Target vs Actual Speeds', 'Motor RPM', 'System Status')
+
+# (label, system_status key, color)
+STATUS_BARS = (
+    ('Emergency', 'emergency_stop', 'red'),
+    ('Braking', 'braking', 'orange'),
+    ('ROS', 'ros_connected', 'blue'),
+    ('Serial', 'serial_connected', 'green')
+)
+
+# Time axis spans in seconds; the x limits only change (forcing a full redraw) between these
+TIME_SPANS = (5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _nice_ceiling(value, minimum):
+    """Round value up to 1, 2 or 5 times a power of ten, at least minimum"""
+    limit = minimum
+    while limit < value:
+        for factor in (2, 2.5, 2):
+            limit *= factor
+            if limit >= value:
+                break
+    return limit
+
+
+def create_plot_renderer(backend, size):
+    """Build the renderer named by visualization.plot_backend"""
+    if backend not in PLOT_BACKENDS:
+        raise ValueError(f"Unknown plot backend '{backend}', expected one of {PLOT_BACKENDS}")
+    if backend == 'matplotlib':
+        try:
+            return MatplotlibPlotRenderer(size)
+        except ImportError as e:
+            print(f"matplotlib unavailable ({e}), using the pygame plot backend")
+    return PygamePlotRenderer(size)
+
+
+def _time_span(timestamps):
+    span = timestamps[-1] - timestamps[0] if len(timestamps) else 0
+    return next((limit for limit in TIME_SPANS if limit >= span), TIME_SPANS[-1])
+
+
+def _rpm_limit(history, current):
+    """RPM axis top: grows when exceeded, shrinks when the data uses under a quarter of it"""
+    rpm_max = max(float(history['left_rpm'].max(initial=0)), float(history['right_rpm'].max(initial=0)))
+    if current is None or rpm_max > current or rpm_max < current / 4:
+        return _nice_ceiling(rpm_max * 1.1, 100)
+    return current
+
+
+class MatplotlibPlotRenderer:
+    """Live telemetry plots drawn with matplotlib and updated by blitting
+
+    The figure is laid out once at the panel's pixel size. Axes, grids,
+    titles and legends are drawn into a cached background; each frame only
+    restores that background and redraws the line and bar artists whose
+    data changed. A full redraw happens only when an axis limit has to move.
+    `surface` shares its pixels with the Agg canvas, so it is never copied
+    or scaled.
+    """
+
+    def __init__(self, size):
+        # Imported here so the pygame backend never pays matplotlib's import time
+        import matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.size = tuple(size)
+        with matplotlib.style.context('dark_background'):
+            self.fig = Figure(figsize=(self.size[0] / DPI, self.size[1] / DPI), dpi=DPI,
+                              facecolor=(0.15, 0.15, 0.2))
+            self.canvas = FigureCanvasAgg(self.fig)
+            self.axes = list(self.fig.subplots(2, 2).flat)
+            self.lines = []
+            for index, column, label, color, linestyle in PLOT_LINES:
+                line, = self.axes[index].plot([], [], label=label, color=color, linestyle=linestyle,
+                                              linewidth=1.5, animated=True)
+                self.lines.append((index, column, line))
+            self.bars = self.axes[3].bar([label for label, _, _ in STATUS_BARS], [0] * len(STATUS_BARS),
+                                         color=[color for _, _, color in STATUS_BARS], alpha=0.7)
+            for bar in self.bars:
+                bar.set_animated(True)
+
+            for ax, title in zip(self.axes, PLOT_TITLES):
+                ax.set_title(title, color='white', fontsize=9)
+                ax.grid(True, alpha=0.3)
+                ax.tick_params(colors='white', labelsize=7)
+                ax.set_facecolor((0.1, 0.1, 0.1))
+            for ax in self.axes[:3]:
+                ax.legend(facecolor=(0.2, 0.2, 0.2), edgecolor='white', labelcolor='white',
+                          fontsize=6, loc='upper left')
+            self.axes[0].set_ylim(0, 260)
+            self.axes[1].set_ylim(0, 260)
+            self.axes[3].set_ylim(0, 1)
+            self.fig.tight_layout(pad=0.6)
+
+        self.time_span = None
+        self.rpm_limit = None
+        self.surface = None
+        self._backgrounds = None
+        self._last_cursor = None
+        self._last_status = None
+
+    def _redraw_background(self):
+        """Full draw of the static parts; animated artists are skipped by canvas.draw()"""
+        self.canvas.draw()
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        self.surface = pygame.image.frombuffer(self.canvas.buffer_rgba(), self.canvas.get_width_height(), 'RGBA')
+
+    def _fit_limits(self, history):
+        """Move axis limits if the data left them; returns True when the background is stale"""
+        time_span = _time_span(history['timestamp'])
+        rpm_limit = _rpm_limit(history, self.rpm_limit)
+        if time_span == self.time_span and rpm_limit == self.rpm_limit:
+            return False
+        self.time_span, self.rpm_limit = time_span, rpm_limit
+        for ax in self.axes[:3]:
+            ax.set_xlim(-time_span, 0)
+        self.axes[2].set_ylim(0, rpm_limit)
+        return True
+
+    def update(self, history, system, cursor=None):
+        """Redraw whatever changed; returns True if the surface was touched
+
+        history is a dict of NumPy columns (MotorController.get_history_window),
+        system the snapshot's system status and cursor its history cursor.
+        """
+        status = tuple(bool(system.get(key, False)) for _, key, _ in STATUS_BARS)
+        history_changed = cursor is None or cursor != self._last_cursor
+        status_changed = status != self._last_status
+        if self.surface is not None and not history_changed and not status_changed:
+            return False
+
+        full = self._fit_limits(history) if len(history['timestamp']) else False
+        if full or self._backgrounds is None:
+            self._redraw_background()
+            history_changed = status_changed = True
+
+        if history_changed:
+            timestamps = history['timestamp']
+            x = timestamps - timestamps[-1] if len(timestamps) else timestamps  # seconds before the newest sample
+            for _, column, line in self.lines:
+                line.set_data(x, history[column])
+            for index in range(3):
+                self._blit_axes(index, [line for line_index, _, line in self.lines if line_index == index])
+        if status_changed:
+            for bar, value in zip(self.bars, status):
+                bar.set_height(float(value))
+            self._blit_axes(3, self.bars)
+
+        self._last_cursor, self._last_status = cursor, status
+        return True
+
+    def _blit_axes(self, index, artists):
+        ax = self.axes[index]
+        self.canvas.restore_region(self._backgrounds[index])
+        for artist in artists:
+            ax.draw_artist(artist)
+
+
+def _ticks(top, count=5):
+    """Evenly spaced 1/2/5-step ticks from 0 to top"""
+    step = _nice_ceiling(top / count, 1)
+    return np.arange(0, top + step / 2, step)
+
+
+class PygamePlotRenderer:
+    """Live telemetry plots drawn straight onto pygame surfaces, without matplotlib
+
+    Each of the four axes has a cached static layer (frame, grid, tick
+    labels, title, legend) that is rebuilt only when its limits change. A
+    frame blits the static layer of the axes whose data changed and draws
+    the series over it with pygame.draw.lines, mapping the NumPy columns to
+    pixels in one vectorised step.
+    """
+
+    BACKGROUND = (38, 38, 51)
+    PLOT_AREA = (25, 25, 25)
+    GRID = (70, 70, 70)
+    TEXT = (220, 220, 220)
+
+    def __init__(self, size):
+        self.size = tuple(size)
+        self.surface = pygame.Surface(self.size)
+        self.surface.fill(self.BACKGROUND)
+        self.title_font = pygame.font.SysFont('Arial', 13)
+        self.label_font = pygame.font.SysFont('Arial', 10)
+        self.colors = {name: pygame.Color(name) for name in ('red', 'green', 'orange', 'blue')}
+
+        # Four quadrants, each split into title strip, plot area and tick margins
+        width, height = self.size
+        half_width, half_height = width // 2, height // 2
+        title_height = self.title_font.get_linesize() + 4
+        label_height = self.label_font.get_linesize()
+        self.cells = []
+        self.areas = []
+        for row in range(2):
+            for column in range(2):
+                cell = pygame.Rect(column * half_width, row * half_height, half_width, half_height)
+                area = pygame.Rect(cell.x + 34, cell.y + title_height, cell.width - 42,
+                                   cell.height - title_height - label_height - 6)
+                self.cells.append(cell)
+                self.areas.append(area)
+
+        # Per axes: (x_min, x_max, y_max); x is seconds before the newest sample
+        self.limits = [(-TIME_SPANS[0], 0, 260), (-TIME_SPANS[0], 0, 260), (-TIME_SPANS[0], 0, 100), (0, 1, 1)]
+        self.time_span = None
+        self.rpm_limit = None
+        self._static = [None] * 4
+        self._last_cursor = None
+        self._last_status = None
+
+    def _build_static(self, index):
+        """Render the frame, grid, tick labels, title and legend of one axes"""
+        cell, area = self.cells[index], self.areas[index]
+        layer = pygame.Surface(cell.size)
+        layer.fill(self.BACKGROUND)
+        local = area.move(-cell.x, -cell.y)
+        pygame.draw.rect(layer, self.PLOT_AREA, local)
+
+        title = self.title_font.render(PLOT_TITLES[index], True, self.TEXT)
+        layer.blit(title, (local.centerx - title.get_width() // 2, 2))
+
+        x_min, x_max, y_max = self.limits[index]
+        if index < 3:
+            for value in _ticks(y_max):
+                y = local.bottom - round(value / y_max * local.height)
+                pygame.draw.line(layer, self.GRID, (local.left, y), (local.right - 1, y))
+                label = self.label_font.render(f"{value:g}", True, self.TEXT)
+                layer.blit(label, (local.left - label.get_width() - 4, y - label.get_height() // 2))
+            for value in _ticks(x_max - x_min):
+                x = local.right - 1 - round(value / (x_max - x_min) * (local.width - 1))
+                pygame.draw.line(layer, self.GRID, (x, local.top), (x, local.bottom - 1))
+                label = self.label_font.render(f"{-value:g}" if value else "0", True, self.TEXT)
+                layer.blit(label, (x - label.get_width() // 2, local.bottom + 2))
+            legend_y = local.top + 3
+            for line_index, _, label, color, linestyle in PLOT_LINES:
+                if line_index != index:
+                    continue
+                self._draw_series(layer, [(local.left + 4, legend_y + 6), (local.left + 20, legend_y + 6)],
+                                  self.colors[color], linestyle)
+                text = self.label_font.render(label, True, self.TEXT)
+                layer.blit(text, (local.left + 24, legend_y))
+                legend_y += text.get_height()
+        else:
+            for slot, (label, _, _) in enumerate(STATUS_BARS):
+                text = self.label_font.render(label, True, self.TEXT)
+                center = local.left + (slot * 2 + 1) * local.width // (2 * len(STATUS_BARS))
+                layer.blit(text, (center - text.get_width() // 2, local.bottom + 2))
+        pygame.draw.rect(layer, self.TEXT, local, 1)
+        self._static[index] = layer
+
+    @staticmethod
+    def _draw_series(surface, points, color, linestyle):
+        if linestyle == '--':
+            # pygame has no dash style; draw every other segment
+            for start in range(0, len(points) - 1, 2):
+                pygame.draw.line(surface, color, points[start], points[start + 1], 2)
+        else:
+            pygame.draw.lines(surface, color, False, points, 2)
+
+    def _fit_limits(self, history):
+        """Update axis limits from the data; returns the indexes whose static layer is stale"""
+        time_span = _time_span(history['timestamp'])
+        rpm_limit = _rpm_limit(history, self.rpm_limit)
+        stale = []
+        if time_span != self.time_span:
+            self.time_span = time_span
+            for index in range(3):
+                self.limits[index] = (-time_span, 0, self.limits[index][2])
+            stale += [0, 1, 2]
+        if rpm_limit != self.rpm_limit:
+            self.rpm_limit = rpm_limit
+            self.limits[2] = (self.limits[2][0], 0, rpm_limit)
+            stale.append(2)
+        return stale
+
+    def update(self, history, system, cursor=None):
+        """Redraw whatever changed; returns True if the surface was touched
+
+        Same arguments as MatplotlibPlotRenderer.update().
+        """
+        status = tuple(bool(system.get(key, False)) for _, key, _ in STATUS_BARS)
+        history_changed = cursor is None or cursor != self._last_cursor
+        status_changed = status != self._last_status
+        if not history_changed and not status_changed:
+            return False
+
+        timestamps = history['timestamp']
+        for index in (self._fit_limits(history) if len(timestamps) else []):
+            self._static[index] = None
+        for index in range(4):
+            if self._static[index] is None:
+                self._build_static(index)
+
+        if history_changed:
+            x = timestamps - timestamps[-1] if len(timestamps) else timestamps
+            for index in range(3):
+                area = self.areas[index]
+                x_min, x_max, y_max = self.limits[index]
+                self.surface.blit(self._static[index], self.cells[index])
+                if len(x) < 2:
+                    continue
+                clip = self.surface.get_clip()
+                self.surface.set_clip(area.inflate(-2, -2))
+                px = area.left + (x - x_min) * ((area.width - 1) / (x_max - x_min))
+                for line_index, column, _, color, linestyle in PLOT_LINES:
+                    if line_index != index:
+                        continue
+                    py = area.bottom - 1 - np.asarray(history[column], dtype=np.float64) * ((area.height - 1) / y_max)
+                    self._draw_series(self.surface, np.column_stack((px, py)).tolist(), self.colors[color], linestyle)
+                self.surface.set_clip(clip)
+        if status_changed or history_changed and self._last_status is None:
+            area = self.areas[3]
+            self.surface.blit(self._static[3], self.cells[3])
+            slot_width = area.width // len(STATUS_BARS)
+            for slot, ((_, _, color), value) in enumerate(zip(STATUS_BARS, status)):
+                if value:
+                    bar = pygame.Rect(area.left + slot * slot_width + slot_width // 5, area.top + 1,
+                                      slot_width * 3 // 5, area.height - 2)
+                    pygame.draw.rect(self.surface, self.colors[color], bar)
+
+        self._last_cursor, self._last_status = cursor, status
+        return True
@@ -0,0 +1,153 @@
+# replay_source.py
+"""Replay a recorded session through SerialInterface in place of the serial port
+
+Accepted recordings:
+
+- <stem>.lines.gz segments from TelemetryRecorder (or a directory of them):
+  the raw lines and binary frames exactly as they arrived
+- .mrec recordings and legacy save_data JSON exports: history samples only,
+  each replayed as one TelemetryRecord carrying the recorded speeds,
+  targets, pulses and RPM (direction is derived from speed, MPH/KPH are 0)
+
+Items are released at their recorded times relative to the first one,
+divided by `speed`; speed 0 (or None) replays as fast as the consumer takes
+them. The recording is streamed, never loaded whole, and the same file
+always yields the same items in the same order.
+"""
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+from binary_protocol import FrameReader
+from telemetry_parser import TelemetryRecord
+from telemetry_recorder import LINES_EXTENSION, read_lines
+from telemetry_recording import EXTENSION, RecordingReader
+
+_new = tuple.__new__
+
+
+def _sample_record(sequence, left_speed, right_speed, left_target, right_target,
+                   left_pulses, right_pulses, left_rpm, right_rpm):
+    return _new(TelemetryRecord, (
+        sequence & 0xFF, 0, False, False, False,
+        left_speed, left_target, 'FORWARD' if left_speed else 'STOPPED', False, left_pulses, left_rpm, 0.0, 0.0,
+        right_speed, right_target, 'FORWARD' if right_speed else 'STOPPED', False, right_pulses, right_rpm, 0.0, 0.0
+    ))
+
+
+def _column_events(columns):
+    names = ('left_speed', 'right_speed', 'left_target', 'right_target',
+             'left_pulses', 'right_pulses', 'left_rpm', 'right_rpm')
+    values = [columns[name].tolist() if hasattr(columns[name], 'tolist') else columns[name] for name in names]
+    timestamps = columns['timestamp']
+    for index, row in enumerate(zip(*values)):
+        yield float(timestamps[index]), _sample_record(index, *row)
+
+
+def recording_events(path):
+    """Yield (timestamp, item) pairs from any supported recording, in recorded order"""
+    if os.path.isdir(path):
+        for segment in sorted(glob.glob(os.path.join(path, '*' + LINES_EXTENSION))):
+            yield from recording_events(segment)
+    elif path.endswith(LINES_EXTENSION):
+        reader = FrameReader()
+        for timestamp, item in read_lines(path):
+            if isinstance(item, bytes):
+                for record in reader.feed(item):
+                    yield timestamp, record
+            else:
+                yield timestamp, item
+    elif path.endswith(EXTENSION):
+        with RecordingReader(path) as reader:
+            for chunk in reader.chunks():
+                yield from _column_events(chunk)
+    elif path.endswith('.json'):
+        with open(path) as f:
+            data = json.load(f)['data']
+        data['timestamp'] = [datetime.fromisoformat(str(value)).timestamp() for value in data['timestamp']]
+        yield from _column_events(data)
+    else:
+        raise ValueError(f"Unsupported recording '{path}', expected a directory, "
+                         f"{LINES_EXTENSION}, {EXTENSION} or .json file")
+
+
+class ReplaySource:
+    """Data source for SerialInterface that plays back a recording
+
+    read() blocks until the next item is due (or the timeout passes) and
+    returns every item due by then. Commands written to it are counted and
+    otherwise ignored; a recording cannot react to them.
+    """
+
+    def __init__(self, path, speed=1.0, loop=False, batch_size=256):
+        self.path = path
+        self.speed = speed or 0
+        self.loop = loop
+        self.batch_size = batch_size  # items per read() at max speed
+        self.replayed = 0
+        self.commands = 0
+        self.finished = False
+        self._events = None
+        self._next = None
+        self._pass_events = 0  # events taken in the current pass; an empty recording never loops
+        self._origin = None  # (recorded time, perf_counter) of the first item
+        self.max_lateness = 0.0  # seconds the worst item was released after its due time
+
+    def describe(self):
+        rate = 'max speed' if not self.speed else f"{self.speed:g}x"
+        return f"Replaying {self.path} at {rate}"
+
+    def _advance(self):
+        if self._events is None:
+            self._events = recording_events(self.path)
+        try:
+            self._next = next(self._events)
+            self._pass_events += 1
+        except StopIteration:
+            self._next = None
+            if self.loop and self._pass_events:
+                self._events, self._origin = None, None
+                self._pass_events = 0
+                self._advance()
+            else:
+                self.finished = True
+
+    def read(self, timeout=0.5):
+        if self._next is None and not self.finished:
+            self._advance()
+        if self._next is None:
+            time.sleep(timeout)
+            return []
+        if not self.speed:
+            items = []
+            while self._next is not None and len(items) < self.batch_size:
+                items.append(self._next[1])
+                self._advance()
+            self.replayed += len(items)
+            return items
+
+        now = time.perf_counter()
+        if self._origin is None:
+            self._origin = (self._next[0], now)
+        recorded_start, started = self._origin
+        due = started + (self._next[0] - recorded_start) / self.speed
+        if due > now:
+            if due - now > timeout:
+                time.sleep(timeout)
+                return []
+            time.sleep(due - now)
+            now = time.perf_counter()
+        self.max_lateness = max(self.max_lateness, now - due)
+        items = []
+        while self._next is not None and started + (self._next[0] - recorded_start) / self.speed <= now:
+            items.append(self._next[1])
+            self._advance()
+            if self._origin is None:  # looped back to the start
+                break
+        self.replayed += len(items)
+        return items
+
+    def write(self, command):
+        self.commands += 1
@@ -2,33 +2,160 @@ import serial
 import time
 import logging
 import threading
-from queue import Queue
 import yaml
-import random
+import platform
+from collections import deque
+from command_scheduler import CommandScheduler, PRIORITY_EMERGENCY, PRIORITY_NORMAL
+from binary_protocol import FrameReader, PROTO_BINARY, PROTO_BINARY_OK
+from motor_simulator import MotorSimulator
+from command_trace import CommandTracer
+from metrics import MetricsRegistry
+from telemetry_pipeline import IngestBuffer
+from telemetry_parser import is_telemetry
+from serial_reconnect import Backoff, PortWatcher, resolve_port, port_present
+
+# Items data_queue holds before a data source's reads pause or a port's telemetry is shed (pipeline.ingest_limit)
+SOURCE_QUEUE_LIMIT = 10000
+# main.cpp setup() prints this near the end of its banner, once the board is ready for commands
+READY_BANNER = "Type 'HELP' for command list"
+# Seconds from losing the port to having it open again
+OUTAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
 
 class SerialInterface:
-    def __init__(self, config_path='config/settings.yaml', simulate=False):
+    def __init__(self, config_path='config/settings.yaml', simulate=False, source=None, overrides=None):
         self.simulate = simulate
+        # Optional stand-in for the port (e.g. replay_source.ReplaySource): read() returns
+        # received items, write() takes commands
+        self.source = source
         self.load_config(config_path)
+        # Per-instance config changes by section, e.g. a fleet robot's {'serial': {'port': ...}}
+        for section, values in (overrides or {}).items():
+            self.config[section] = {**self.config.get(section, {}), **values}
+        if simulate and source is None:
+            simulation = self.config.get('simulation', {})
+            self.source = MotorSimulator(
+                self.config.get('motor', {}),
+                self.config.get('pid', {}),
+                rate_hz=simulation.get('rate_hz', 50),
+                protocol=simulation.get('protocol', 'binary'),
+                max_rpm=simulation.get('max_rpm', 300),
+                time_constant=simulation.get('time_constant', 0.25),
+                coast_time_constant=simulation.get('coast_time_constant', 2.0),
+                brake_decel=simulation.get('brake_decel', 1500),
+                noise_rpm=simulation.get('noise_rpm', 0.0),
+                seed=simulation.get('seed', 0)
+            )
         self.serial_conn = None
         self.running = False
-        self.data_queue = Queue()
-        self.command_queue = Queue()
+        # Ingest stage of the telemetry pipeline: one batch per read (see telemetry_pipeline).
+        # Data sources wait while it is full; a port can't, so its oldest telemetry is shed
+        pipeline = self.config.get('pipeline', {})
+        self.data_queue = IngestBuffer(
+            pipeline.get('ingest_limit', SOURCE_QUEUE_LIMIT),
+            policy='block' if self.source is not None else pipeline.get('ingest_policy', 'drop_oldest'),
+            droppable=is_telemetry
+        )
+        self.command_queue = CommandScheduler()
+        # Enqueue-to-wire latency per transmit lane, in seconds
+        self.command_latencies = {
+            PRIORITY_EMERGENCY: deque(maxlen=1000),
+            PRIORITY_NORMAL: deque(maxlen=1000)
+        }
+        # Per-command stage timestamps through to the firmware's reply and telemetry
+        self.command_tracer = CommandTracer()
+        # Prometheus metrics for GET /metrics; MotorController and the GUI register theirs here too
+        self.metrics = MetricsRegistry()
+        self.metrics.collect('mirai_items_received_total', 'counter',
+                             'Lines and binary frames read from the port or data source',
+                             lambda: self.data_queue.items.value)
+        self.reconnects = self.metrics.counter(
+            'mirai_serial_reconnects_total', 'Reconnects after a serial error or a lost connection')
+        self.outages = self.metrics.histogram(
+            'mirai_serial_outage_seconds', 'Time from losing the port to having it open and ready again',
+            buckets=OUTAGE_BUCKETS)
         self.logger = self.setup_logger()
         self.connection_attempts = 0
         self.max_connection_attempts = 5
+        # 'event' wakes as soon as bytes arrive, 'poll' is the legacy in_waiting loop
+        self.read_mode = self.config['serial'].get('read_mode', 'event')
+        self.read_chunk_size = self.config['serial'].get('read_chunk_size', 4096)
+        self._read_buffer = bytearray()
+        # Normal-lane bytes per write; bounds how long an emergency command waits behind traffic
+        self.max_write_batch_bytes = self.config['serial'].get('max_write_batch_bytes', 64)
+        # Wait for each write to leave the UART so the OS buffer never queues ahead of E
+        self.drain_writes = self.config['serial'].get('drain_writes', True)
+        self._byte_time = 10.0 / self.config['serial'].get('baudrate', 115200)  # 8N1
+        self._write_ready_at = 0.0  # write_pending(): when the last batch has left the wire
+        # 'binary' asks the firmware for framed telemetry at connect time; text is the fallback
+        self.protocol = self.config['serial'].get('protocol', 'text')
+        self.telemetry_interval_ms = self.config['serial'].get('telemetry_interval_ms', 50)
+        self.binary_mode = False
+        self.frame_reader = FrameReader()
+        self._bad_frames_before = 0  # bad_frames of readers replaced at reconnect
+        # Link state machine (see serial_reconnect): retries back off from a few
+        # milliseconds, and a missing port is watched for being plugged back in
+        self.link_state = 'stopped'
+        self.backoff = Backoff(
+            initial=self.config['serial'].get('reconnect_initial_ms', 50) / 1000.0,
+            max_delay=self.config['serial'].get('reconnect_max_ms', 2000) / 1000.0
+        )
+        self.ready_timeout = self.config['serial'].get('ready_timeout', 3.0)
+        self._port_watcher = None  # created on the first wait for a missing port
+        self._link_lock = threading.Lock()
+        self._connected = threading.Event()  # the write thread waits on it while the port is down
+        self._stopped = threading.Event()  # cuts backoff waits short on stop()
+        self._lost_at = None
+        self._register_metrics()
         
+    def _register_metrics(self):
+        """Gauges and counters kept elsewhere, read only when /metrics is scraped"""
+        metrics = self.metrics
+        metrics.collect('mirai_data_queue_depth', 'gauge', 'Items read but not yet processed by the update loop',
+                        self.data_queue.qsize)
+        metrics.collect('mirai_command_queue_depth', 'gauge', 'Commands waiting for the write loop, by lane',
+                        label='lane', functions={
+                            'emergency': lambda: self.command_queue.qsize(PRIORITY_EMERGENCY),
+                            'normal': lambda: self.command_queue.qsize(PRIORITY_NORMAL)
+                        })
+        metrics.collect('mirai_commands_coalesced_total', 'counter',
+                        'Queued setpoints dropped because a newer one replaced them',
+                        lambda: self.command_queue.coalesced)
+        metrics.collect('mirai_serial_connected', 'gauge', 'Whether the port (or data source) is connected',
+                        self.is_connected)
+        tracer = self.command_tracer
+        metrics.collect('mirai_command_traces_total', 'counter', 'Traced commands and how they finished',
+                        label='outcome', functions={
+                            outcome: (lambda outcome=outcome: tracer.counts[outcome]) for outcome in tracer.counts
+                        })
+        metrics.collect_histograms('mirai_command_latency_seconds',
+                                   'Command latency per stage, from the HTTP request to the firmware reply '
+                                   'and telemetry (see command_trace.STAGES)', 'stage', tracer.histograms)
+    
+    def get_bad_frame_count(self):
+        """Binary frames dropped for a CRC mismatch or unknown type since start"""
+        return self._bad_frames_before + self.frame_reader.bad_frames
+    
     def load_config(self, config_path):
         try:
             with open(config_path, 'r') as f:
                 self.config = yaml.safe_load(f)
         except FileNotFoundError:
             # Default config if file doesn't exist
+            default_port = 'COM3' if platform.system() == "Windows" else '/dev/ttyUSB0'
             self.config = {
                 'serial': {
-                    'port': 'COM3',
+                    'port': default_port,
                     'baudrate': 115200,
-                    'timeout': 0.1
+                    'timeout': 0.1,
+                    'read_mode': 'event',
+                    'read_chunk_size': 4096,
+                    'max_write_batch_bytes': 64,
+                    'drain_writes': True,
+                    'protocol': 'text',
+                    'telemetry_interval_ms': 50,
+                    'ready_timeout': 3.0,
+                    'reconnect_initial_ms': 50,
+                    'reconnect_max_ms': 2000
                 },
                 'logging': {
                     'level': 'INFO',
@@ -48,45 +175,168 @@ class SerialInterface:
         return logging.getLogger(__name__)
     
     def connect(self):
-        if self.simulate:
-            self.logger.warning("SIMULATION MODE: Serial connection disabled")
+        if self.source is not None:
+            if self.simulate:
+                self.logger.warning("SIMULATION MODE: Serial connection disabled")
+            self.logger.warning(f"DATA SOURCE: {self.source.describe()}")
             return True
-            
+        self.link_state = 'connecting'
+        self._connected.clear()
         try:
+            port = resolve_port(self.config['serial']['port'])
+            if port is None:
+                raise serial.SerialException("No Arduino found among the serial ports")
             self.serial_conn = serial.Serial(
-                port=self.config['serial']['port'],
+                port=port,
                 baudrate=self.config['serial']['baudrate'],
                 timeout=self.config['serial']['timeout'],
                 write_timeout=1.0  # Add write timeout
             )
-            time.sleep(2)  # Wait for connection to establish
-            self.logger.info(f"Connected to {self.config['serial']['port']}")
-            self.connection_attempts = 0
+            self._read_buffer.clear()
+            self.binary_mode = False
+            if not self._wait_ready():
+                self.logger.warning(f"No ready banner from {port} within {self.ready_timeout} s, continuing")
+            self.logger.info(f"Connected to {port}")
+            if self.protocol == 'binary':
+                self._negotiate_binary()
+            self._link_up()
             return True
-        except serial.SerialException as e:
+        except (serial.SerialException, OSError) as e:
+            self._close_quietly()
+            self.link_state = 'backoff'
             self.connection_attempts += 1
             if self.connection_attempts <= self.max_connection_attempts:
                 self.logger.warning(f"Serial connection attempt {self.connection_attempts} failed: {e}")
+            elif self.connection_attempts == self.max_connection_attempts + 1:
+                self.logger.error(f"Serial connection failed after {self.max_connection_attempts} attempts: {e} "
+                                  f"(still retrying)")
             else:
-                self.logger.error(f"Serial connection failed after {self.max_connection_attempts} attempts: {e}")
+                self.logger.debug(f"Serial connection attempt {self.connection_attempts} failed: {e}")
             return False
         except Exception as e:
+            self._close_quietly()
+            self.link_state = 'backoff'
             self.logger.error(f"Unexpected connection error: {e}")
             return False
     
-    def start(self):
-        if self.connect():
-            self.running = True
-            self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
-            self.write_thread = threading.Thread(target=self._write_loop, daemon=True)
-            self.read_thread.start()
-            self.write_thread.start()
-            self.logger.info("Serial interface started")
+    def _wait_ready(self):
+        """Read until the firmware's ready banner, or telemetry from a board that didn't reset on open
+        
+        Replaces a fixed sleep for the board's reset: the Mega restarts when
+        the port opens and prints its banner once setup() is done. Lines read
+        meanwhile are queued; False if neither arrived within ready_timeout.
+        """
+        deadline = time.monotonic() + self.ready_timeout
+        received = []
+        ready = False
+        timeout = self.serial_conn.timeout
+        self.serial_conn.timeout = 0.05  # short reads, so the deadline holds
+        try:
+            while not ready and time.monotonic() < deadline:
+                for line in self._split_chunk(self.serial_conn.read(max(1, self.serial_conn.in_waiting))):
+                    received.append(line)
+                    ready = ready or line.startswith(READY_BANNER) or is_telemetry(line)
+        finally:
+            self.serial_conn.timeout = timeout
+        self.data_queue.put_batch(received)
+        return ready
+    
+    def _link_up(self):
+        """The port is open and ready: leave backoff and let the write thread go"""
+        with self._link_lock:
+            self.link_state = 'connected'
+            self.connection_attempts = 0
+            self.backoff.reset()
+            if self._lost_at is not None:
+                self.outages.observe(time.perf_counter() - self._lost_at)
+                self._lost_at = None
+            self._connected.set()
+    
+    def link_lost(self, error, conn=None):
+        """Close the port after a read or write error and enter backoff; False if that already happened
+        
+        `conn` is the port the error came from, so the other thread (or a
+        loop) failing on the same or an already replaced port does nothing.
+        """
+        with self._link_lock:
+            if self.link_state != 'connected' or (conn is not None and conn is not self.serial_conn):
+                return False
+            self.link_state = 'backoff'
+            self._connected.clear()
+            self._lost_at = time.perf_counter()
+        self.logger.error(f"Serial link to {self.serial_conn.port} lost: {error}")
+        self.reconnects.inc()
+        self._close_quietly()
+        return True
+    
+    def reconnect_delay(self):
+        """Enter backoff and return the next delay, for loops that time the wait themselves"""
+        self.link_state = 'backoff'
+        return self.backoff.next_delay()
+    
+    def wait_reconnect(self):
+        """Sleep the next backoff delay before a connection attempt
+        
+        Returns early on stop(), and as soon as a missing port is plugged
+        back in (which also restarts the backoff from its first step).
+        """
+        delay = self.reconnect_delay()
+        port = self.config['serial']['port']
+        if port_present(port):
+            self._stopped.wait(delay)  # there but failed to open: busy, permissions, resetting
+            return
+        if self._port_watcher is None:
+            self._port_watcher = PortWatcher()
+        if self._port_watcher.wait(port, delay, self._stopped):
+            self.backoff.reset()
+    
+    def _close_quietly(self):
+        if self.serial_conn is not None:
+            try:
+                self.serial_conn.close()
+            except Exception:
+                pass
+    
+    def _negotiate_binary(self, timeout=1.0):
+        """Switch the firmware to binary telemetry frames, staying on text if it never acknowledges"""
+        self._bad_frames_before += self.frame_reader.bad_frames
+        self.frame_reader = FrameReader()
+        self.serial_conn.write(f"{PROTO_BINARY}:{self.telemetry_interval_ms}\n".encode('utf-8'))
+        deadline = time.monotonic() + timeout
+        received = []  # banner lines and early telemetry
+        while not self.binary_mode and time.monotonic() < deadline:
+            chunk = self.serial_conn.read(max(1, self.serial_conn.in_waiting))
+            for item in self.frame_reader.feed(chunk):
+                if isinstance(item, str) and item.startswith(PROTO_BINARY_OK):
+                    self.binary_mode = True
+                else:
+                    received.append(item)
+        self.data_queue.put_batch(received)
+        if self.binary_mode:
+            self.logger.info(f"Binary telemetry enabled ({self.telemetry_interval_ms} ms interval)")
         else:
-            self.logger.error("Failed to start serial interface")
+            self.logger.warning("Firmware did not acknowledge binary telemetry, using text lines")
+            # Anything the frame reader held back is still text
+            self._read_buffer = self.frame_reader.buffer
+    
+    def start(self):
+        """Connect and start the read and write threads; they run for good, the read thread reconnects"""
+        self.running = True
+        self._stopped.clear()
+        if not self.connect():
+            self.logger.error("Failed to open the serial port, retrying in the background")
+        self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
+        self.write_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.read_thread.start()
+        self.write_thread.start()
+        self.logger.info("Serial interface started")
     
     def stop(self):
         self.running = False
+        self.link_state = 'stopped'
+        self._stopped.set()
+        self._connected.clear()
+        self.command_queue.wakeup()
         if self.serial_conn and self.serial_conn.is_open:
             try:
                 self.serial_conn.close()
@@ -97,108 +347,233 @@ class SerialInterface:
     def _read_loop(self):
         while self.running:
             try:
-                if self.simulate:
-                    # Generate simulated data
-                    time.sleep(0.5)  # Slower simulation to reduce CPU usage
-                    left_speed = random.randint(0, 255)
-                    right_speed = random.randint(0, 255)
-                    left_rpm = left_speed * 300 / 255
-                    right_rpm = right_speed * 300 / 255
-                    simulated_data = [
-                        f"Left - RPM:{left_rpm:.1f} MPH:{left_rpm*0.1:.1f} KPH:{left_rpm*0.16:.1f}",
-                        f"Right - RPM:{right_rpm:.1f} MPH:{right_rpm*0.1:.1f} KPH:{right_rpm*0.16:.1f}",
-                        f"PULSES:{random.randint(1000, 2000)}:{random.randint(1000, 2000)}"
-                    ]
-                    for data in simulated_data:
-                        self.data_queue.put(data)
-                elif self.serial_conn and self.serial_conn.is_open:
+                if self.source is not None:
+                    # Hold back while the consumer is behind, so max-speed sources don't flood the queue
+                    if self.data_queue.full():
+                        time.sleep(0.001)
+                        continue
+                    self.data_queue.put_batch(self.source.read(timeout=0.5))
+                elif self.link_state != 'connected':
+                    self._reconnect()
+                else:
+                    conn = self.serial_conn
                     try:
-                        if self.serial_conn.in_waiting > 0:
-                            line = self.serial_conn.readline().decode('utf-8').strip()
-                            if line:
-                                self.data_queue.put(line)
+                        if self.read_mode == 'poll' and not self.binary_mode:
+                            if self.serial_conn.in_waiting > 0:
+                                line = self.serial_conn.readline().decode('utf-8').strip()
+                                if line:
+                                    self.data_queue.put(line)
+                            else:
+                                time.sleep(0.01)  # Small sleep to prevent busy waiting
                         else:
-                            time.sleep(0.01)  # Small sleep to prevent busy waiting
-                    except serial.SerialException as e:
-                        self.logger.error(f"Serial read error: {e}")
-                        # Try to reconnect
-                        self._handle_serial_error()
-                        time.sleep(1)
+                            # One handoff per wake-up, however many lines it brought
+                            self.data_queue.put_batch(self._read_lines())
+                    except (serial.SerialException, OSError) as e:
+                        self.link_lost(e, conn)
             except Exception as e:
+                if not self.running:
+                    break  # port closed by stop() while blocked in read
+                if self.source is None and self.link_state != 'connected':
+                    continue  # port closed by the write thread after an error: reconnect straight away
                 self.logger.error(f"Unexpected read loop error: {e}")
                 time.sleep(1)
     
+    def _reconnect(self):
+        """Read thread: retry connect() with backoff until the port is back or stop() is called"""
+        while self.running:
+            if self.connection_attempts:
+                self.wait_reconnect()  # the last attempt (start()'s or this loop's) failed
+                if not self.running:
+                    break
+            if self.connect():
+                break
+        if not self.running:
+            self._close_quietly()  # stopped while connecting
+            self.link_state = 'stopped'
+    
+    def _read_lines(self):
+        """Block until bytes arrive, then return the complete lines (and, in binary mode, telemetry records) received so far"""
+        # read(1) sleeps in select()/WaitCommEvent until the first byte or the
+        # port timeout, so an idle link costs no CPU; the rest is read in bulk
+        chunk = self.serial_conn.read(1)
+        if not chunk:
+            return []
+        waiting = self.serial_conn.in_waiting
+        if waiting:
+            chunk += self.serial_conn.read(min(waiting, self.read_chunk_size))
+        return self._split_chunk(chunk)
+
+    def _split_chunk(self, chunk):
+        """Add received bytes; return the complete lines (and, in binary mode, telemetry records) so far"""
+        if self.binary_mode:
+            # Text replies and telemetry frames, in arrival order
+            return self.frame_reader.feed(chunk)
+
+        self._read_buffer += chunk
+        if b'\n' not in chunk:
+            return []
+
+        *raw_lines, remainder = self._read_buffer.split(b'\n')
+        self._read_buffer = bytearray(remainder)
+        lines = []
+        for raw in raw_lines:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if line:
+                lines.append(line)
+        return lines
+
     def _write_loop(self):
         while self.running:
             try:
-                if not self.command_queue.empty():
-                    command = self.command_queue.get()
-                    if self.simulate:
-                        self.logger.debug(f"SIMULATION: Would send: {command}")
-                        # Simulate command processing delay
-                        time.sleep(0.1)
-                    elif self.serial_conn and self.serial_conn.is_open:
-                        try:
-                            self.serial_conn.write((command + '\n').encode('utf-8'))
-                            self.logger.debug(f"Sent: {command}")
-                        except serial.SerialException as e:
-                            self.logger.error(f"Serial write error: {e}")
-                            # Try to reconnect
-                            self._handle_serial_error()
-                else:
-                    time.sleep(0.01)  # Small sleep to prevent busy waiting
+                if self.source is None and not self._connected.is_set():
+                    # Commands stay queued until the read thread has the port back
+                    self._connected.wait(0.5)
+                    continue
+                # Sleeps on the queue's condition variable until a command arrives
+                batch = self.command_queue.get_batch(timeout=0.5, max_bytes=self.max_write_batch_bytes)
+                if not batch:
+                    continue
+                conn = self.serial_conn
+                try:
+                    written = self._write_batch(batch)
+                    if written and self.drain_writes:
+                        self._drain(*written)
+                except (serial.SerialException, OSError) as e:
+                    self.link_lost(e, conn)
             except Exception as e:
+                if not self.running:
+                    break  # port closed by stop() mid-write
                 self.logger.error(f"Unexpected write loop error: {e}")
                 time.sleep(1)
     
-    def _handle_serial_error(self):
-        """Handle serial communication errors by attempting to reconnect"""
-        if not self.simulate:
-            self.logger.warning("Attempting to reconnect to serial port...")
-            self.stop()
-            time.sleep(2)
-            self.start()
+    def _write_batch(self, batch):
+        """Send a batch from the command queue; returns (started_at, bytes) for a serial write, else None"""
+        if self.source is not None:
+            written_at = time.perf_counter()
+            for command, enqueued_at, priority in batch:
+                self.source.write(command)
+                self.command_latencies[priority].append(written_at - enqueued_at)
+            self.command_tracer.written(batch, written_at)
+        elif self.serial_conn and self.serial_conn.is_open:
+            # Everything that queued up while we were busy goes out in one write
+            payload = ''.join(command + '\n' for command, _, _ in batch)
+            started_at = time.perf_counter()
+            self.serial_conn.write(payload.encode('utf-8'))
+            written_at = time.perf_counter()
+            for command, enqueued_at, priority in batch:
+                self.command_latencies[priority].append(written_at - enqueued_at)
+            self.command_tracer.written(batch, written_at)
+            self.logger.debug(f"Sent: {payload.strip()}")
+            return started_at, len(payload)
+        return None
+    
+    def read_available(self, readable=False):
+        """Queue what the port or data source has ready without blocking, for fleet.SerialEventLoop
+        
+        `readable` means select() reported the port readable; if there is
+        nothing to read then, the device went away and SerialException is
+        raised as a failed read would. Returns the number of items queued.
+        """
+        if self.source is not None:
+            if self.data_queue.full():
+                return 0
+            items = self.source.read(timeout=0)
+        else:
+            waiting = self.serial_conn.in_waiting
+            if not waiting:
+                if readable:
+                    raise serial.SerialException("Port readable but no data (device disconnected?)")
+                return 0
+            items = self._split_chunk(self.serial_conn.read(min(waiting, self.read_chunk_size)))
+        self.data_queue.put_batch(items)
+        return len(items)
+    
+    def write_pending(self):
+        """Write queued commands without blocking, for fleet.SerialEventLoop
+        
+        Instead of sleeping like _drain(), returns the perf_counter time the
+        next batch should wait for (the last batch's wire time, with
+        drain_writes), or None once the queue is empty.
+        """
+        if time.perf_counter() < self._write_ready_at:
+            return self._write_ready_at
+        batch = self.command_queue.get_batch(timeout=0, max_bytes=self.max_write_batch_bytes)
+        if batch:
+            written = self._write_batch(batch)
+            if written and self.drain_writes:
+                started_at, size = written
+                self._write_ready_at = started_at + size * self._byte_time
+        return None if self.command_queue.empty() else self._write_ready_at
+    
+    def _drain(self, started_at, size):
+        """Hold the writer until the last batch has had time to leave the wire"""
+        # USB adapters and ptys report tcdrain() done while bytes are still
+        # buffered, so also wait out the batch's wire time at the configured baud
+        self.serial_conn.flush()
+        remaining = started_at + size * self._byte_time - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
     
     def send_command(self, command):
         """Send a command to the serial device"""
         try:
-            self.command_queue.put(command)
+            enqueued_at = time.perf_counter()
+            self.command_tracer.enqueued(command, enqueued_at)
+            self.command_queue.put(command, enqueued_at)
             return True
         except Exception as e:
             self.logger.error(f"Error queueing command: {e}")
             return False
     
+    def get_command_latency_stats(self, priority=None):
+        """Enqueue-to-wire latency of recently sent commands, in milliseconds
+
+        Pass PRIORITY_EMERGENCY or PRIORITY_NORMAL for a single lane; the
+        emergency lane's max_ms is the measured emergency-stop latency bound.
+        """
+        if priority is None:
+            samples = sorted(sample for lane in self.command_latencies.values() for sample in lane)
+        else:
+            samples = sorted(self.command_latencies[priority])
+        if not samples:
+            return {'count': 0}
+        return {
+            'count': len(samples),
+            'mean_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            'max_ms': samples[-1] * 1000
+        }
+    
     def get_data(self):
         """Get a single data item from the queue"""
         try:
-            if not self.data_queue.empty():
-                return self.data_queue.get_nowait()
-            return None
+            return self.data_queue.get()
         except Exception as e:
             self.logger.error(f"Error getting data: {e}")
             return None
     
     def get_all_data(self):
         """Get all available data from the queue"""
-        data = []
         try:
-            while not self.data_queue.empty():
-                data.append(self.data_queue.get_nowait())
+            return self.data_queue.get_batch()
         except Exception as e:
             self.logger.error(f"Error getting all data: {e}")
-        return data
+            return []
 
     def is_connected(self):
         """Check if serial connection is active"""
-        if self.simulate:
+        if self.simulate or self.source is not None:
             return True
-        return self.serial_conn is not None and self.serial_conn.is_open
+        return self.link_state == 'connected'
 
     def get_port_status(self):
         """Get detailed port status information"""
-        if self.simulate:
-            return "Simulation Mode - No physical connection"
-        elif self.serial_conn and self.serial_conn.is_open:
-            return f"Connected to {self.config['serial']['port']}"
+        if self.source is not None:
+            return self.source.describe()
+        elif self.link_state == 'connected':
+            return f"Connected to {self.serial_conn.port}"
+        elif self.link_state != 'stopped':
+            return f"Reconnecting to {self.config['serial']['port']}"
         else:
             return "Disconnected"
\ No newline at end of file
@@ -0,0 +1,109 @@
+# serial_reconnect.py
+"""Reconnect state machine pieces for the serial link: backoff and hot-plug
+
+A SerialInterface moves through LINK_STATES:
+
+    connecting -> connected -> (error) -> backoff -> connecting -> ...
+
+- connecting: connect() opens the port and waits for the firmware's ready
+  banner instead of a fixed sleep
+- connected: the read and write threads move data; the first read or
+  write error closes the port and starts a backoff
+- backoff: Backoff.next_delay() grows from a few milliseconds (a cable
+  bump, a port busy for a moment) to max_delay (no board). While the port
+  is missing, PortWatcher waits for it to be plugged back in and cuts the
+  wait short, so a replug is noticed within `interval` whatever the delay
+- stopped: stop() was called; any backoff wait returns straight away
+
+The threads are the same before and after a reconnect; only the port
+object is replaced. The fleet and asyncio loops drive the same states from
+their own workers.
+
+Hot-plug detection uses udev events when pyudev is installed (Linux) and
+otherwise polls for the device node, or for serial.port 'auto' the
+list_ports scan of getport.find_arduino_port().
+"""
+import os
+import random
+import serial.tools.list_ports
+from getport import find_arduino_port
+
+LINK_STATES = ('stopped', 'connecting', 'connected', 'backoff')
+
+# serial.port value that picks the first Arduino-looking port (getport.find_arduino_port)
+AUTO_PORT = 'auto'
+# Longest a udev wait sleeps before checking `stopped` again
+UDEV_STEP = 0.25
+# Seconds between presence checks while polling for a missing port
+PLUG_POLL_INTERVAL = 0.05
+
+
+class Backoff:
+    """Exponential delays between connection attempts, with jitter so a fleet doesn't retry in lockstep"""
+
+    def __init__(self, initial=0.05, max_delay=2.0, factor=2.0, jitter=0.1):
+        self.initial = initial
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = min(self.max_delay, self.initial * self.factor ** self.attempt)
+        self.attempt += 1
+        return delay * (1.0 + random.uniform(-self.jitter, self.jitter))
+
+    def reset(self):
+        self.attempt = 0
+
+
+def resolve_port(port):
+    """The device to open for a configured port: 'auto' is looked up with find_arduino_port() (None if absent)"""
+    if port == AUTO_PORT:
+        return find_arduino_port()
+    return port
+
+
+def port_present(port):
+    """Whether the configured port exists right now, without opening it"""
+    if port == AUTO_PORT:
+        return find_arduino_port() is not None
+    if os.name == 'nt':
+        return any(info.device == port for info in serial.tools.list_ports.comports())
+    return os.path.exists(port)
+
+
+class PortWatcher:
+    """Waits for a missing serial port to be plugged in"""
+
+    def __init__(self, interval=PLUG_POLL_INTERVAL):
+        self.interval = interval  # seconds between presence checks
+        self._monitor = None
+        try:
+            import pyudev
+            self._monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            self._monitor.filter_by('tty')
+            self._monitor.start()
+        except Exception:
+            # No pyudev, or no udev here (Windows, macOS, containers): poll
+            self._monitor = None
+
+    def wait(self, port, timeout, stopped):
+        """Block up to timeout seconds until `port` is present; False on timeout or once `stopped` is set"""
+        remaining = timeout
+        while not stopped.is_set():
+            if port_present(port):
+                return True
+            if remaining <= 0:
+                return False
+            if self._monitor is not None:
+                # Woken by any tty add/remove, so it can sleep longer than a poll;
+                # the presence check above decides
+                step = min(UDEV_STEP, remaining)
+                self._monitor.poll(timeout=step)
+            else:
+                step = min(self.interval, remaining)
+                if stopped.wait(step):
+                    return False
+            remaining -= step
+        return False
@@ -0,0 +1,124 @@
+# telemetry_history.py
+import numpy as np
+
+# Column name -> dtype; timestamps are float64 seconds since the epoch
+HISTORY_COLUMNS = (
+    ('timestamp', np.float64),
+    ('left_speed', np.int32),
+    ('right_speed', np.int32),
+    ('left_target', np.int32),
+    ('right_target', np.int32),
+    ('left_pulses', np.int64),
+    ('right_pulses', np.int64),
+    ('left_rpm', np.float32),
+    ('right_rpm', np.float32)
+)
+COLUMN_NAMES = tuple(name for name, _ in HISTORY_COLUMNS)
+
+
+def _as_list(values):
+    # float32 -> float would otherwise serialise as 12.300000190734863
+    if values.dtype == np.float32:
+        return values.astype(np.float64).round(3).tolist()
+    return values.tolist()
+
+
+class TelemetryHistory:
+    """Preallocated columnar ring buffer for MotorController's telemetry history
+
+    Every column is a fixed NumPy array of `capacity` samples, so append() is
+    O(1) with no reallocation or trimming and memory stays constant at about
+    48 bytes per sample (48 MB per million). `total` counts every sample ever
+    appended and serves as a monotonically increasing cursor.
+
+    window() returns read-only views into the buffer when the requested range
+    is contiguous, and a copy only when it wraps around the end.
+
+    A single thread appends; any number may read concurrently without a
+    lock. read() copies a range and then checks, seqlock style, that the
+    writer did not lap the oldest sample while it was copying, retrying if
+    it did. Bounding reads by a cursor taken after append() returned means a
+    reader never sees a half-written sample.
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+        self.capacity = int(capacity)
+        self.columns = {name: np.zeros(self.capacity, dtype=dtype) for name, dtype in HISTORY_COLUMNS}
+        self._column_list = [self.columns[name] for name in COLUMN_NAMES]
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, *values):
+        """Append one sample, values in COLUMN_NAMES order"""
+        index = self.total % self.capacity
+        for column, value in zip(self._column_list, values):
+            column[index] = value
+        self.total += 1
+
+    def clear(self):
+        self.total = 0
+
+    def window(self, count=None, stop=None):
+        """Return the newest `count` samples before cursor `stop` (default: all) as a dict of arrays"""
+        stop = self.total if stop is None else stop
+        start = stop - self.capacity if count is None else stop - max(0, int(count))
+        return self.range(start, stop)
+
+    def range(self, start, stop):
+        """Return samples with cursor positions [start, stop) as a dict of arrays
+
+        start is clamped to the oldest retained sample. Views are only valid
+        until the writer laps them; use read() for data that must stay put.
+        """
+        return self._range(start, stop)[1]
+
+    def _range(self, start, stop):
+        total = self.total
+        start = max(start, total - self.capacity, 0)
+        stop = min(stop, total)
+        count = max(0, stop - start)
+        first = start % self.capacity
+        result = {}
+        for name, column in self.columns.items():
+            if first + count <= self.capacity:
+                view = column[first:first + count]
+                view.flags.writeable = False
+            else:
+                split = self.capacity - first
+                view = np.concatenate((column[first:], column[:count - split]))
+            result[name] = view
+        return start, result
+
+    def read(self, start, stop):
+        """Copy samples [start, stop) into arrays the writer can no longer touch"""
+        return self._read(start, stop)[1]
+
+    def _read(self, start, stop):
+        while True:
+            first, columns = self._range(start, stop)
+            result = {name: np.array(values) for name, values in columns.items()}
+            # Sample `first` is rewritten while the writer fills index first + capacity
+            if self.total - first < self.capacity:
+                return first, result
+            start = self.total - self.capacity + 1  # lapped mid-copy, skip the overwritten part
+
+    def to_lists(self, count=None, stop=None):
+        """Newest `count` samples before cursor `stop` as plain lists, for JSON responses and exports"""
+        stop = self.total if stop is None else stop
+        start = stop - self.capacity if count is None else stop - max(0, int(count))
+        return {name: _as_list(values) for name, values in self.read(start, stop).items()}
+
+    def since(self, cursor, stop=None):
+        """Samples appended after `cursor` up to `stop`, as (start, lists)
+
+        start is the cursor of the first returned sample; it is greater than
+        `cursor` when the caller fell more than `capacity` samples behind and
+        the gap has been overwritten.
+        """
+        stop = self.total if stop is None else stop
+        start, columns = self._read(max(0, cursor), stop)
+        return start, {name: _as_list(values) for name, values in columns.items()}
@@ -0,0 +1,129 @@
+# telemetry_parser.py
+"""Single-pass parser for the Arduino's serial telemetry
+
+Each line is dispatched on the text before its first ':' through a lookup
+table to a handler with precompiled patterns, and comes back as a typed
+record. update_motor_data() applies a record to the motor_data dict used by
+MotorController.
+"""
+import re
+from collections import namedtuple
+
+# Fields of a side missing from the line are None
+SpeedRecord = namedtuple('SpeedRecord', ['left_rpm', 'left_mph', 'left_kph', 'right_rpm', 'right_mph', 'right_kph'])
+StatusRecord = namedtuple('StatusRecord', ['motor', 'direction', 'speed'])
+PulsesRecord = namedtuple('PulsesRecord', ['left', 'right'])
+AckRecord = namedtuple('AckRecord', ['command', 'value'])
+DiagRecord = namedtuple('DiagRecord', ['text'])
+TextRecord = namedtuple('TextRecord', ['text'])  # banners, help text and anything unrecognised
+# Decoded binary telemetry frame (binary_protocol.py), full state of both motors
+TelemetryRecord = namedtuple('TelemetryRecord', [
+    'sequence', 'millis', 'emergency_stop', 'soft_brake', 'hard_brake',
+    'left_speed', 'left_target', 'left_direction', 'left_braking', 'left_pulses', 'left_rpm', 'left_mph', 'left_kph',
+    'right_speed', 'right_target', 'right_direction', 'right_braking', 'right_pulses', 'right_rpm', 'right_mph', 'right_kph'
+])
+
+# Short names of the record types, e.g. for per-type metrics labels
+RECORD_NAMES = {
+    SpeedRecord: 'speed', StatusRecord: 'status', PulsesRecord: 'pulses', AckRecord: 'ack',
+    DiagRecord: 'diag', TextRecord: 'text', TelemetryRecord: 'telemetry'
+}
+
+# Building records through tuple.__new__ skips namedtuple's Python-level __new__
+_new = tuple.__new__
+
+# writeToSerial(): "Left - RPM:12.00 MPH:0.80 KPH:1.28 | Right - RPM:11.00 MPH:0.73 KPH:1.17"
+_COMBINED_SPEED_RE = re.compile(
+    r'Left - RPM:(\S+) MPH:(\S+) KPH:(\S+) \| Right - RPM:(\S+) MPH:(\S+) KPH:(\S+)')
+# Either side on its own, as the simulator emits it
+_SIDE_SPEED_RE = re.compile(r'(Left|Right) - RPM:(\S+) MPH:(\S+) KPH:(\S+)')
+
+
+def _parse_speed(line, rest):
+    match = _COMBINED_SPEED_RE.match(line)
+    if match is not None:
+        return _new(SpeedRecord, map(float, match.groups()))
+    values = [None] * 6
+    for side, rpm, mph, kph in _SIDE_SPEED_RE.findall(line):
+        offset = 0 if side == 'Left' else 3
+        values[offset:offset + 3] = float(rpm), float(mph), float(kph)
+    return _new(SpeedRecord, values)
+
+
+def _parse_status(line, rest):
+    # STATUS:ML:FORWARD:120[:rpm]
+    parts = rest.split(':')
+    if len(parts) < 3:
+        return _new(TextRecord, (line,))
+    motor = 'left' if parts[0] == 'ML' else 'right'
+    return _new(StatusRecord, (motor, parts[1], int(parts[2])))
+
+
+def _parse_pulses(line, rest):
+    # PULSES:<left>:<right>
+    left, sep, right = rest.partition(':')
+    if not sep:
+        return _new(TextRecord, (line,))
+    return _new(PulsesRecord, (int(left), int(right.partition(':')[0])))
+
+
+def _parse_ack(line, rest):
+    # ACK:ML:120 / ACK:FORWARD
+    command, _, value = rest.partition(':')
+    return _new(AckRecord, (command, value or None))
+
+
+def _parse_diag(line, rest):
+    return _new(DiagRecord, (rest,))
+
+
+# Keyed by everything before the first ':'
+_DISPATCH = {
+    'Left - RPM': _parse_speed,
+    'Right - RPM': _parse_speed,
+    'STATUS': _parse_status,
+    'PULSES': _parse_pulses,
+    'ACK': _parse_ack,
+    'DIAG': _parse_diag
+}
+
+
+# Periodic telemetry lines, the items ingest may shed under overload
+_TELEMETRY_HEADS = frozenset(('Left - RPM', 'Right - RPM', 'STATUS', 'PULSES'))
+
+
+def is_telemetry(item):
+    """Whether an ingested item (line or decoded frame) is periodic telemetry, not an ACK, DIAG or reply line"""
+    if type(item) is str:
+        return item.partition(':')[0] in _TELEMETRY_HEADS
+    return type(item) is TelemetryRecord
+
+
+def parse_line(line):
+    """Turn one telemetry line into a record; raises ValueError on malformed numbers"""
+    head, _, rest = line.partition(':')
+    handler = _DISPATCH.get(head)
+    if handler is None:
+        return _new(TextRecord, (line,))
+    return handler(line, rest)
+
+
+def update_motor_data(motor_data, record):
+    """Apply a parsed record to a MotorController-style motor_data dict"""
+    record_type = type(record)
+    if record_type is SpeedRecord:
+        if record[0] is not None:
+            left = motor_data['left']
+            left['rpm'], left['mph'], left['kph'] = record[0:3]
+        if record[3] is not None:
+            right = motor_data['right']
+            right['rpm'], right['mph'], right['kph'] = record[3:6]
+    elif record_type is PulsesRecord:
+        motor_data['left']['pulses'], motor_data['right']['pulses'] = record
+    elif record_type is StatusRecord:
+        data = motor_data[record[0]]
+        data['direction'], data['speed'] = record[1], record[2]
+    elif record_type is TelemetryRecord:
+        for data, offset in ((motor_data['left'], 5), (motor_data['right'], 13)):
+            (data['speed'], data['target'], data['direction'], _, data['pulses'],
+             data['rpm'], data['mph'], data['kph']) = record[offset:offset + 8]
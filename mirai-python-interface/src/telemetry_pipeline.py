@@ -0,0 +1,306 @@
+# telemetry_pipeline.py
+"""Telemetry as a pipeline of stages: ingest -> parse -> store -> fan-out
+
+- ingest: the read loop (or a shared I/O loop) hands every read's lines
+  and decoded frames to an IngestBuffer as one batch: one lock and one
+  notify per read, not per line
+- parse: MotorController takes everything buffered in one swap and turns
+  it into records outside its state lock
+- store: the records update motor_data, the history ring and the command
+  tracer under the state lock, and one snapshot is published per batch
+- fan-out: each batch is handed to the registered sinks (the recorder,
+  anything added with MotorController.add_sink())
+
+Every stage counts items and batches into mirai_pipeline_items_total and
+mirai_pipeline_batches_total{stage}, so a stage that falls behind shows up
+as a gap between neighbouring stages.
+
+Backpressure and drops:
+- IngestBuffer holds at most `limit` items. Data sources (simulate,
+  replay) use the 'block' policy: they stop reading while it is full, so a
+  fast source waits for the consumer. A serial port cannot be paused, so
+  when the update stage stalls (a reconnect, a slow print) the buffer sheds
+  telemetry instead of growing: 'drop_oldest' (the default) discards the
+  oldest buffered telemetry, 'drop_newest' the incoming. Only items the
+  `droppable` test accepts are shed (telemetry_parser.is_telemetry: never
+  ACK, DIAG or command replies, which the command tracer waits for), and
+  every shed item is counted in `dropped`.
+- inline sinks run on the store thread and must only hand the batch on
+  (TelemetryRecorder.record() queues it for its own writer thread)
+- threaded sinks get their own thread behind a queue of at most
+  `max_items`; when the sink is slower than the telemetry, 'drop_oldest'
+  discards the oldest queued batches (live views want the newest data)
+  and 'drop_newest' refuses the incoming one (consumers that prefer a
+  contiguous prefix). Either way the store stage never waits for a sink,
+  and the dropped items are counted per sink.
+"""
+import threading
+from collections import deque, namedtuple
+from metrics import Counter
+
+STAGES = ('ingest', 'parse', 'store', 'fanout')
+POLICIES = ('drop_oldest', 'drop_newest')
+INGEST_POLICIES = ('block',) + POLICIES
+
+# What a sink receives: the raw items (lines, decoded frames), their records
+# (None where parsing failed), the history cursors [first, cursor) of the
+# samples they added and when the store stage finished with them
+PipelineBatch = namedtuple('PipelineBatch', ['items', 'records', 'first', 'cursor', 'stored_at'])
+
+
+class IngestBuffer:
+    """Bounded batch handoff from the reader to the update stage
+
+    The reader put_batch()es each read; get_batch() swaps out everything
+    buffered as one list. put_batch() never blocks: with 'block' the
+    producer checks full() and holds back, with the drop policies the
+    buffer sheds droppable items beyond `limit` itself.
+    """
+
+    def __init__(self, limit=10000, policy='block', droppable=None):
+        if policy not in INGEST_POLICIES:
+            raise ValueError(f"Unknown ingest policy: {policy} (expected one of {', '.join(INGEST_POLICIES)})")
+        self.limit = limit
+        self.policy = policy
+        self.droppable = droppable or (lambda item: True)
+        self._batches = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self.items = Counter()  # items and batches put, the pipeline's ingest stage
+        self.batches = Counter()
+        self.dropped = Counter()  # items shed by the drop policies
+
+    def put_batch(self, items):
+        if not items:
+            return
+        with self._condition:
+            self.items.value += len(items)
+            self.batches.value += 1
+            excess = self._size + len(items) - self.limit
+            if excess > 0 and self.policy == 'drop_newest':
+                items = self._shed(items, excess)
+                if not items:
+                    return
+            self._batches.append(items)
+            self._size += len(items)
+            if excess > 0 and self.policy == 'drop_oldest':
+                self._shed_oldest(excess)
+            self._condition.notify()
+
+    def _shed(self, batch, excess):
+        """batch without its first `excess` droppable items, counting them as dropped"""
+        droppable = self.droppable
+        kept = []
+        dropped = 0
+        for item in batch:
+            if dropped < excess and droppable(item):
+                dropped += 1
+            else:
+                kept.append(item)
+        self.dropped.value += dropped
+        return kept if dropped else batch
+
+    def _shed_oldest(self, excess):
+        """Drop `excess` droppable items from the oldest batches; protected items stay in order"""
+        batches = self._batches
+        kept = []
+        while excess > 0 and batches:
+            batch = batches.popleft()
+            shed = self._shed(batch, excess)
+            excess -= len(batch) - len(shed)
+            self._size -= len(batch) - len(shed)
+            if shed:
+                kept.append(shed)
+        batches.extendleft(reversed(kept))
+
+    def put(self, item):
+        self.put_batch([item])
+
+    def get_batch(self, timeout=0):
+        """Everything buffered, oldest first; waits up to timeout seconds for the first batch"""
+        with self._condition:
+            if not self._batches:
+                if not timeout:
+                    return []
+                self._condition.wait(timeout)
+                if not self._batches:
+                    return []
+            batches, self._batches = self._batches, deque()
+            self._size = 0
+        if len(batches) == 1:
+            return batches[0]
+        return [item for batch in batches for item in batch]
+
+    def get(self):
+        """The oldest item alone, or None; get_batch() is the fast path"""
+        with self._condition:
+            if not self._batches:
+                return None
+            batch = self._batches[0]
+            if len(batch) == 1:
+                self._batches.popleft()
+            else:
+                self._batches[0] = batch[1:]
+            self._size -= 1
+            return batch[0]
+
+    def qsize(self):
+        return self._size
+
+    def empty(self):
+        return not self._size
+
+    def full(self):
+        return self._size >= self.limit
+
+
+class _SinkWorker:
+    """A sink on its own thread behind a bounded queue of batches"""
+
+    def __init__(self, name, consume, max_items, policy, errors):
+        self.name = name
+        self.consume = consume
+        self.max_items = max_items
+        self.policy = policy
+        self._batches = deque()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._running = True
+        self.dropped = Counter()
+        self.errors = errors
+        self.thread = threading.Thread(target=self._run, name=f'sink-{name}', daemon=True)
+        self.thread.start()
+
+    def put(self, batch):
+        count = len(batch.items)
+        with self._condition:
+            if self._pending + count > self.max_items:
+                if self.policy == 'drop_newest' or count > self.max_items:
+                    self.dropped.value += count
+                    return
+                while self._pending + count > self.max_items:
+                    self._pending -= len(self._batches[0].items)
+                    self.dropped.value += len(self._batches.popleft().items)
+            self._batches.append(batch)
+            self._pending += count
+            self._condition.notify()
+
+    def qsize(self):
+        return self._pending
+
+    def stop(self, timeout=1.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._batches:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                batch = self._batches.popleft()
+                self._pending -= len(batch.items)
+            try:
+                self.consume(batch)
+            except Exception as e:
+                self.errors.value += 1
+                print(f"Error in pipeline sink {self.name}: {e}")
+
+
+class TelemetryPipeline:
+    """Stage counters and the fan-out sinks of one MotorController"""
+
+    def __init__(self, metrics, ingest, max_items=10000, policy='drop_oldest'):
+        self.ingest = ingest
+        self.max_items = max_items
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown sink policy: {policy} (expected one of {', '.join(POLICIES)})")
+        self.policy = policy
+        self.sinks = {}  # name -> consume function (inline) or _SinkWorker (threaded)
+        items = metrics.counter('mirai_pipeline_items_total', 'Items through each telemetry pipeline stage', 'stage')
+        batches = metrics.counter('mirai_pipeline_batches_total', 'Batches through each telemetry pipeline stage', 'stage')
+        # The ingest stage counts in the buffer, under its lock, as the reader puts
+        items.children['ingest'] = ingest.items
+        batches.children['ingest'] = ingest.batches
+        self._counters = {stage: (items.child(stage), batches.child(stage)) for stage in STAGES[1:]}
+        self._dropped = metrics.collect('mirai_pipeline_sink_dropped_total', 'counter',
+                                        'Items a threaded sink dropped because it fell behind', label='sink')
+        self._depth = metrics.collect('mirai_pipeline_sink_queue_depth', 'gauge',
+                                      'Items queued for a threaded sink', label='sink')
+        self._errors = metrics.counter('mirai_pipeline_sink_errors_total', 'Exceptions raised by a sink', 'sink')
+
+    def count(self, stage, items):
+        """One batch of `items` items done by `stage`"""
+        counter, batches = self._counters[stage]
+        counter.value += items
+        batches.value += 1
+
+    def add_sink(self, name, consume, threaded=False, max_items=None, policy=None):
+        """Call consume(PipelineBatch) for every stored batch
+
+        Inline sinks run on the store thread and must return quickly;
+        threaded ones get their own thread and drop per `policy` once
+        `max_items` are queued (defaults from the pipeline config).
+        """
+        if name in self.sinks:
+            raise ValueError(f"Sink already registered: {name}")
+        if threaded:
+            policy = policy or self.policy
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown sink policy: {policy} (expected one of {', '.join(POLICIES)})")
+            worker = _SinkWorker(name, consume, max_items or self.max_items, policy, self._errors.child(name))
+            self._dropped.children[name] = lambda: worker.dropped.value
+            self._depth.children[name] = worker.qsize
+            self.sinks[name] = worker
+        else:
+            self._errors.child(name)
+            self.sinks[name] = consume
+
+    def remove_sink(self, name):
+        sink = self.sinks.pop(name, None)
+        if isinstance(sink, _SinkWorker):
+            sink.stop()
+
+    def sink_dropped(self):
+        """Items dropped by all threaded sinks"""
+        return sum(sink.dropped.value for sink in list(self.sinks.values()) if isinstance(sink, _SinkWorker))
+
+    def dispatch(self, batch):
+        """Fan-out stage: hand a stored batch to every sink"""
+        for name, sink in list(self.sinks.items()):
+            if isinstance(sink, _SinkWorker):
+                sink.put(batch)
+                continue
+            try:
+                sink(batch)
+            except Exception as e:
+                self._errors[name].value += 1
+                print(f"Error in pipeline sink {name}: {e}")
+        self.count('fanout', len(batch.items))
+
+    def stop(self):
+        for sink in self.sinks.values():
+            if isinstance(sink, _SinkWorker):
+                sink.stop()
+
+    def get_stats(self):
+        """Items and batches per stage, and each sink's backlog and drops"""
+        stages = {'ingest': {'items': self.ingest.items.value, 'batches': self.ingest.batches.value,
+                             'dropped': self.ingest.dropped.value}}
+        for stage, (items, batches) in self._counters.items():
+            stages[stage] = {'items': items.value, 'batches': batches.value}
+        sinks = {}
+        for name, sink in list(self.sinks.items()):
+            threaded = isinstance(sink, _SinkWorker)
+            sinks[name] = {
+                'threaded': threaded,
+                'queued': sink.qsize() if threaded else 0,
+                'dropped': sink.dropped.value if threaded else 0,
+                'errors': self._errors[name].value,
+                'policy': sink.policy if threaded else None
+            }
+        return {'stages': stages, 'queued': self.ingest.qsize(), 'sinks': sinks}
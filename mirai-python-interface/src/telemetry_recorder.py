@@ -0,0 +1,224 @@
+# telemetry_recorder.py
+"""Always-on background recording of telemetry into rotating segments
+
+Each segment is a pair of files sharing a name stem:
+
+- <stem>.mrec      parsed samples (telemetry_recording format)
+- <stem>.lines.gz  raw input, one "<epoch seconds>\\t<line>" per item; binary
+                   frames are stored as "BIN:<hex>" of the frame bytes
+
+MotorController hands every ingested batch to record(), which only appends
+to an in-memory queue. A writer thread does all file I/O, so a slow or
+stalled disk never holds up the update loop. The queue is bounded: when
+the writer falls that far behind, new batches are dropped and counted
+instead of growing memory or blocking the producer.
+"""
+import gzip
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from binary_protocol import encode_telemetry
+from telemetry_recording import RecordingWriter, EXTENSION
+
+LINES_EXTENSION = '.lines.gz'
+SEGMENT_PREFIX = 'telemetry_'
+
+
+def _raw_line(timestamp, item):
+    if isinstance(item, str):
+        return f"{timestamp:.6f}\t{item}\n"
+    return f"{timestamp:.6f}\tBIN:{encode_telemetry(item, item.sequence, item.millis).hex()}\n"
+
+
+class TelemetryRecorder:
+    """Write ingested lines and history samples to size/time rotated segment files"""
+
+    def __init__(self, directory='recordings', segment_seconds=900, segment_max_bytes=64 * 2 ** 20,
+                 retention_hours=72, max_total_bytes=2 * 2 ** 30, buffer_items=100000,
+                 chunk_rows=4096, compression_level=6, metadata=None):
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.segment_max_bytes = segment_max_bytes
+        self.retention_hours = retention_hours
+        self.max_total_bytes = max_total_bytes
+        self.buffer_items = buffer_items
+        self.chunk_rows = chunk_rows
+        self.compression_level = compression_level
+        self.metadata = dict(metadata or {})
+
+        self._batches = deque()
+        self._condition = threading.Condition()
+        self._pending = 0  # items queued for the writer
+        self._running = False
+        self._thread = None
+        self._samples = None
+        self._lines = None
+        self._lines_file = None
+        self._segment_started = 0.0
+        self._flushed_at = 0.0
+
+        self.recorded = 0
+        self.dropped = 0
+        self.segments = 0
+        self.write_errors = 0
+        self.current_segment = None
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Write out what is queued, close the segment and stop the writer thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def record(self, items, samples):
+        """Queue one ingested batch; never blocks and never touches the disk
+
+        items are the raw lines (str) and decoded binary records, samples
+        the dict of history columns they produced. Returns False if the
+        batch was dropped because the writer is too far behind.
+        """
+        count = len(items)
+        with self._condition:
+            if not self._running or self._pending + count > self.buffer_items:
+                self.dropped += count
+                return False
+            self._batches.append((items, samples))
+            self._pending += count
+            self._condition.notify()
+        return True
+
+    def get_stats(self):
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'queued': self._pending,
+            'segments': self.segments,
+            'write_errors': self.write_errors,
+            'current_segment': self.current_segment
+        }
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                while self._running and not self._batches:
+                    self._condition.wait(1.0)
+                    if not self._batches:
+                        break
+                batches = list(self._batches)
+                self._batches.clear()
+                running = self._running
+            try:
+                if batches:
+                    self._write(batches)
+                elif self._lines is not None:
+                    self._lines.flush()  # idle: push buffered raw lines to the OS
+                if self._lines is not None and time.time() - self._segment_started >= self.segment_seconds:
+                    self._close_segment()
+            except OSError as e:
+                self.write_errors += 1
+                print(f"Telemetry recorder write failed: {e}")
+                self._close_segment()
+                time.sleep(1)
+            finally:
+                with self._condition:
+                    self._pending -= sum(len(items) for items, _ in batches)
+            if not running:
+                self._close_segment()
+                return
+
+    def _write(self, batches):
+        if self._lines is None:
+            self._open_segment()
+        lines = []
+        for items, samples in batches:
+            timestamps = samples['timestamp']
+            fallback = float(timestamps[-1]) if len(timestamps) else time.time()
+            for index, item in enumerate(items):
+                # One history sample per item unless an item failed to process
+                timestamp = float(timestamps[index]) if len(timestamps) == len(items) else fallback
+                lines.append(_raw_line(timestamp, item))
+            self._samples.append_columns(samples)
+            self.recorded += len(items)
+        self._lines.write(''.join(lines).encode())
+        if time.time() - self._flushed_at >= 1.0:
+            self._lines.flush()  # bounds the raw input lost to a crash to about a second
+            self._flushed_at = time.time()
+        if self._segment_bytes() >= self.segment_max_bytes:
+            self._close_segment()
+
+    def _segment_bytes(self):
+        return self._samples.bytes_written + self._lines_file.tell()
+
+    def _open_segment(self):
+        stem = os.path.join(self.directory, SEGMENT_PREFIX + datetime.now().strftime('%Y%m%d_%H%M%S_%f'))
+        metadata = dict(self.metadata, segment=self.segments)
+        self._samples = RecordingWriter(stem + EXTENSION, metadata, chunk_rows=self.chunk_rows,
+                                        compression_level=self.compression_level)
+        self._lines_file = open(stem + LINES_EXTENSION, 'xb')
+        self._lines = gzip.GzipFile(fileobj=self._lines_file, mode='wb', compresslevel=self.compression_level)
+        self._segment_started = time.time()
+        self.current_segment = stem
+        self.segments += 1
+
+    def _close_segment(self):
+        if self._lines is None:
+            return
+        try:
+            self._samples.close()
+            self._lines.close()
+            self._lines_file.close()
+            self.current_segment = None
+            self._apply_retention()
+        except OSError as e:
+            self.write_errors += 1
+            print(f"Telemetry recorder close failed: {e}")
+        self._samples = self._lines = self._lines_file = None
+        self.current_segment = None
+
+    def _apply_retention(self):
+        """Delete the oldest closed segments beyond retention_hours or max_total_bytes"""
+        stems = {}
+        for name in os.listdir(self.directory):
+            if not name.startswith(SEGMENT_PREFIX):
+                continue
+            for extension in (EXTENSION, LINES_EXTENSION):
+                if name.endswith(extension):
+                    path = os.path.join(self.directory, name)
+                    stems.setdefault(path[:-len(extension)], []).append(path)
+        total = sum(os.path.getsize(path) for paths in stems.values() for path in paths)
+        cutoff = time.time() - self.retention_hours * 3600
+        for stem in sorted(stems):  # names sort by start time
+            if stem == self.current_segment:
+                continue
+            paths = stems[stem]
+            if total <= self.max_total_bytes and max(os.path.getmtime(path) for path in paths) >= cutoff:
+                break
+            for path in paths:
+                total -= os.path.getsize(path)
+                os.remove(path)
+
+
+def read_lines(path):
+    """Yield (timestamp, item) from a .lines.gz segment; binary frames come back as bytes"""
+    with gzip.open(path, 'rt', encoding='utf-8', errors='replace') as f:
+        try:
+            for line in f:
+                timestamp, _, item = line.rstrip('\n').partition('\t')
+                if item.startswith('BIN:'):
+                    yield float(timestamp), bytes.fromhex(item[4:])
+                else:
+                    yield float(timestamp), item
+        except EOFError:
+            return  # segment still being written or cut short by a crash
@@ -0,0 +1,303 @@
+# telemetry_recording.py
+"""Append-only, chunked, columnar telemetry recordings (.mrec)
+
+Layout, all integers little-endian:
+
+    header   MAGIC | version u8 | metadata length u32 | metadata (JSON)
+    chunk    b'CHNK' | rows u32 | payload length u32 | crc32 u32 |
+             first timestamp f64 | last timestamp f64 | payload
+    index    b'INDX' | count u32 | (offset u64, rows u32, first f64, last f64) * count
+    trailer  index offset u64 | b'XDNI'
+
+A chunk's payload is the zlib-compressed concatenation of its columns in
+the metadata's column order, each column byte-shuffled (all first bytes of
+the values, then all second bytes, ...) so that slowly changing values
+compress well. Chunks are written as soon as they fill, so a writer holds
+at most one chunk in memory however long it records. The index and trailer
+are only written by close(); a file cut short by a crash is still readable
+by scanning chunk headers, and a torn last chunk is dropped by its CRC.
+"""
+import json
+import os
+import struct
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+from telemetry_history import HISTORY_COLUMNS
+
+MAGIC = b'MIRAIREC'
+VERSION = 1
+EXTENSION = '.mrec'
+
+_HEADER = struct.Struct('<8sBI')
+_CHUNK = struct.Struct('<4sIIIdd')
+_INDEX = struct.Struct('<4sI')
+_INDEX_ENTRY = struct.Struct('<QIdd')
+_TRAILER = struct.Struct('<Q4s')
+CHUNK_MAGIC = b'CHNK'
+INDEX_MAGIC = b'INDX'
+TRAILER_MAGIC = b'XDNI'
+
+
+class RecordingError(Exception):
+    """Raised for files that are not recordings or use an unknown version"""
+
+
+def _shuffle(values):
+    return values.view(np.uint8).reshape(-1, values.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, rows):
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, rows).T.copy().view(dtype).ravel()
+
+
+class RecordingWriter:
+    """Stream telemetry samples into a new recording file
+
+    append() takes one sample in the same column order as
+    TelemetryHistory.append(); append_columns() takes whole arrays. Samples
+    are buffered in preallocated NumPy columns and written out as a
+    compressed chunk every `chunk_rows` samples.
+    """
+
+    def __init__(self, path, metadata=None, chunk_rows=4096, compression_level=6, columns=HISTORY_COLUMNS):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be at least 1")
+        self.path = path
+        self.chunk_rows = int(chunk_rows)
+        self.compression_level = compression_level
+        self.columns = [(name, np.dtype(dtype)) for name, dtype in columns]
+        self._buffers = [np.zeros(self.chunk_rows, dtype=dtype) for _, dtype in self.columns]
+        self._pending = 0
+        self.index = []  # (offset, rows, first timestamp, last timestamp)
+        self.rows = 0
+        self.metadata = dict(metadata or {})
+        self.metadata.setdefault('created', datetime.now().isoformat())
+        self.metadata['columns'] = [[name, dtype.str] for name, dtype in self.columns]
+        self.metadata['chunk_rows'] = self.chunk_rows
+
+        self._file = open(path, 'xb')  # never overwrite a recording
+        header = json.dumps(self.metadata, separators=(',', ':')).encode()
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(header)) + header)
+        self.bytes_written = self._file.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def append(self, *values):
+        """Append one sample, values in column order"""
+        index = self._pending
+        for column, value in zip(self._buffers, values):
+            column[index] = value
+        self._pending = index + 1
+        if self._pending == self.chunk_rows:
+            self._write_chunk()
+
+    def append_columns(self, columns):
+        """Append many samples from a dict of equal-length sequences keyed by column name"""
+        arrays = [np.asarray(columns[name], dtype=dtype) for name, dtype in self.columns]
+        total = len(arrays[0])
+        position = 0
+        while position < total:
+            count = min(self.chunk_rows - self._pending, total - position)
+            for buffer, values in zip(self._buffers, arrays):
+                buffer[self._pending:self._pending + count] = values[position:position + count]
+            self._pending += count
+            position += count
+            if self._pending == self.chunk_rows:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        rows = self._pending
+        if not rows:
+            return
+        raw = b''.join(_shuffle(buffer[:rows]) for buffer in self._buffers)
+        payload = zlib.compress(raw, self.compression_level)
+        timestamps = self._buffers[0]
+        offset = self._file.tell()
+        self._file.write(_CHUNK.pack(CHUNK_MAGIC, rows, len(payload), zlib.crc32(payload),
+                                     float(timestamps[0]), float(timestamps[rows - 1])) + payload)
+        self.index.append((offset, rows, float(timestamps[0]), float(timestamps[rows - 1])))
+        self.rows += rows
+        self._pending = 0
+        self.bytes_written = self._file.tell()
+
+    def flush(self):
+        """Write buffered samples as a (short) chunk and push them to the OS"""
+        self._write_chunk()
+        self._file.flush()
+
+    def close(self):
+        """Write the last chunk, the index and the trailer"""
+        if self._file.closed:
+            return
+        self._write_chunk()
+        index_offset = self._file.tell()
+        self._file.write(_INDEX.pack(INDEX_MAGIC, len(self.index)))
+        self._file.write(b''.join(_INDEX_ENTRY.pack(*entry) for entry in self.index))
+        self._file.write(_TRAILER.pack(index_offset, TRAILER_MAGIC))
+        self.bytes_written = self._file.tell()
+        self._file.close()
+
+
+class RecordingReader:
+    """Read a recording chunk by chunk, or a time range as one dict of arrays"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        magic, version, length = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC:
+            self._file.close()
+            raise RecordingError(f"{path} is not a telemetry recording")
+        if version != VERSION:
+            self._file.close()
+            raise RecordingError(f"{path} uses recording format version {version}, expected {VERSION}")
+        self.metadata = json.loads(self._file.read(length))
+        self.columns = [(name, np.dtype(dtype)) for name, dtype in self.metadata['columns']]
+        self._data_start = self._file.tell()
+        self.complete = True
+        self.index = self._read_index()
+        if self.index is None:
+            self.complete = False  # not closed cleanly
+            self.index = self._scan_chunks()
+        self.rows = sum(rows for _, rows, _, _ in self.index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.rows
+
+    def close(self):
+        self._file.close()
+
+    def _read_index(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if size < self._data_start + _TRAILER.size:
+            return None
+        self._file.seek(size - _TRAILER.size)
+        index_offset, magic = _TRAILER.unpack(self._file.read(_TRAILER.size))
+        if magic != TRAILER_MAGIC or not self._data_start <= index_offset < size:
+            return None
+        self._file.seek(index_offset)
+        magic, count = _INDEX.unpack(self._file.read(_INDEX.size))
+        if magic != INDEX_MAGIC:
+            return None
+        data = self._file.read(count * _INDEX_ENTRY.size)
+        return [_INDEX_ENTRY.unpack_from(data, position * _INDEX_ENTRY.size) for position in range(count)]
+
+    def _scan_chunks(self):
+        """Rebuild the index from chunk headers, stopping at the first torn or corrupt chunk"""
+        index = []
+        offset = self._data_start
+        self._file.seek(offset)
+        while True:
+            header = self._file.read(_CHUNK.size)
+            if len(header) < _CHUNK.size:
+                break
+            magic, rows, length, crc, first, last = _CHUNK.unpack(header)
+            if magic != CHUNK_MAGIC:
+                break
+            payload = self._file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            index.append((offset, rows, first, last))
+            offset += _CHUNK.size + length
+        return index
+
+    def read_chunk(self, entry):
+        """Decode one index entry into a dict of column arrays"""
+        offset = entry[0]
+        self._file.seek(offset)
+        magic, rows, length, crc, _, _ = _CHUNK.unpack(self._file.read(_CHUNK.size))
+        payload = self._file.read(length)
+        if magic != CHUNK_MAGIC or zlib.crc32(payload) != crc:
+            raise RecordingError(f"Corrupt chunk at offset {offset} in {self.path}")
+        raw = zlib.decompress(payload)
+        columns = {}
+        position = 0
+        for name, dtype in self.columns:
+            size = rows * dtype.itemsize
+            columns[name] = _unshuffle(raw[position:position + size], dtype, rows)
+            position += size
+        return columns
+
+    def chunks(self, start_time=None, end_time=None):
+        """Yield the chunks overlapping [start_time, end_time] in recording order"""
+        for entry in self.index:
+            _, _, first, last = entry
+            if (start_time is not None and last < start_time) or (end_time is not None and first > end_time):
+                continue
+            yield self.read_chunk(entry)
+
+    def read(self, start_time=None, end_time=None):
+        """All samples with start_time <= timestamp <= end_time (default: everything) as a dict of arrays"""
+        parts = list(self.chunks(start_time, end_time))
+        if not parts:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in self.columns}
+        columns = {name: np.concatenate([part[name] for part in parts]) for name, _ in self.columns}
+        if start_time is not None or end_time is not None:
+            timestamps = columns['timestamp']
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_time is not None:
+                mask &= timestamps >= start_time
+            if end_time is not None:
+                mask &= timestamps <= end_time
+            columns = {name: values[mask] for name, values in columns.items()}
+        return columns
+
+
+def convert_json(json_path, output_path=None, chunk_rows=4096):
+    """Convert a MotorController.save_data JSON export to a recording; returns the output path"""
+    if output_path is None:
+        output_path = os.path.splitext(json_path)[0] + EXTENSION
+    with open(json_path) as f:
+        export = json.load(f)
+    data = export['data']
+    columns = dict(data)
+    columns['timestamp'] = [datetime.fromisoformat(str(value)).timestamp() for value in data['timestamp']]
+    metadata = dict(export.get('metadata', {}))
+    metadata['source'] = os.path.basename(json_path)
+    with RecordingWriter(output_path, metadata, chunk_rows=chunk_rows) as writer:
+        writer.append_columns(columns)
+    return output_path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Telemetry recording tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='Convert save_data JSON exports to recordings')
+    convert.add_argument('files', nargs='+', help='JSON exports')
+    info = commands.add_parser('info', help='Show metadata and size of recordings')
+    info.add_argument('files', nargs='+', help='Recordings')
+    args = parser.parse_args()
+
+    for path in args.files:
+        if args.command == 'convert':
+            output = convert_json(path)
+            print(f"{path} ({os.path.getsize(path)} bytes) -> {output} ({os.path.getsize(output)} bytes)")
+        else:
+            with RecordingReader(path) as reader:
+                span = (reader.index[-1][3] - reader.index[0][2]) if reader.index else 0
+                print(f"{path}: {reader.rows} samples in {len(reader.index)} chunks, {span:.1f} s, "
+                      f"{os.path.getsize(path)} bytes{'' if reader.complete else ' (no index, recovered by scan)'}")
+                print(f"  metadata: {json.dumps(reader.metadata)}")
+
+
+if __name__ == '__main__':
+    main()
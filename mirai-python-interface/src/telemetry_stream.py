@@ -0,0 +1,128 @@
+# telemetry_stream.py
+import asyncio
+import threading
+import time
+from collections import deque
+
+KEEPALIVE = b': keepalive\n\n'
+
+
+class TelemetryBroadcaster:
+    """Fan-out of encoded telemetry frames to Server-Sent Events clients
+
+    The producer encodes each frame once with publish(); every subscriber is
+    handed the same bytes object from a short ring of recent frames, so the
+    cost per extra client is a wake-up and a socket write, not a copy.
+
+    Each subscriber is rate limited: it wakes at most max_rate times per
+    second and then sends every frame it has not seen yet. A client that
+    falls further behind than the ring resumes at the oldest frame still in
+    it; frames carry history cursors so it can tell something was skipped.
+    """
+
+    def __init__(self, ring_size=64, max_rate=20.0, keepalive=15.0):
+        self._condition = threading.Condition()
+        self._frames = deque(maxlen=ring_size)  # (sequence, bytes)
+        self._sequence = 0
+        self._closed = False
+        self.max_rate = max_rate
+        self.keepalive = keepalive
+        self.subscribers = 0
+        self._async_waiters = set()  # (event loop, asyncio.Event) of subscribe_async() clients
+
+    def publish(self, encode):
+        """Publish encode()'s bytes as the next frame; encode is skipped when nobody listens (returns False)"""
+        if not self.subscribers:
+            return False
+        frame = encode()
+        with self._condition:
+            self._sequence += 1
+            self._frames.append((self._sequence, frame))
+            self._condition.notify_all()
+        self._wake_async()
+        return True
+
+    def close(self):
+        """End every subscription, e.g. on shutdown"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._wake_async()
+
+    def _wake_async(self):
+        if not self._async_waiters:
+            return
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        for loop, event in list(self._async_waiters):
+            if loop is current:
+                event.set()  # publishing from the subscribers' own loop: no self-pipe write needed
+            else:
+                loop.call_soon_threadsafe(event.set)
+
+    def subscribe(self, max_rate=None):
+        """Generator of SSE chunks for one client, at most max_rate wake-ups per second"""
+        rate = self.max_rate if max_rate is None else min(max_rate, self.max_rate)
+        interval = 1.0 / rate if rate > 0 else 0.0
+        with self._condition:
+            self.subscribers += 1
+            seen = self._sequence
+        try:
+            yield KEEPALIVE  # flush headers so the browser's EventSource opens at once
+            while True:
+                woke_at = time.monotonic()
+                with self._condition:
+                    self._condition.wait_for(lambda: self._sequence != seen or self._closed, self.keepalive)
+                    if self._closed:
+                        return
+                    pending = [frame for sequence, frame in self._frames if sequence > seen]
+                    seen = self._sequence
+                if pending:
+                    yield from pending
+                else:
+                    yield KEEPALIVE
+                remaining = interval - (time.monotonic() - woke_at)
+                if remaining > 0:
+                    time.sleep(remaining)
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+    async def subscribe_async(self, max_rate=None):
+        """subscribe() for asyncio servers: the same chunks, awaiting frames instead of blocking a thread"""
+        rate = self.max_rate if max_rate is None else min(max_rate, self.max_rate)
+        interval = 1.0 / rate if rate > 0 else 0.0
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            self.subscribers += 1
+            seen = self._sequence
+        self._async_waiters.add(waiter)
+        try:
+            yield KEEPALIVE
+            while True:
+                woke_at = time.monotonic()
+                if self._sequence == seen and not self._closed:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), self.keepalive)
+                    except asyncio.TimeoutError:
+                        pass
+                waiter[1].clear()
+                if self._closed:
+                    return
+                with self._condition:
+                    pending = [frame for sequence, frame in self._frames if sequence > seen]
+                    seen = self._sequence
+                if pending:
+                    for frame in pending:
+                        yield frame
+                else:
+                    yield KEEPALIVE
+                remaining = interval - (time.monotonic() - woke_at)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+        finally:
+            self._async_waiters.discard(waiter)
+            with self._condition:
+                self.subscribers -= 1